@@ -0,0 +1,141 @@
+"""
+Бенчмарк загрузки и синхронизации с Cloudinary на локальном поддельном сервере
+Создает синтетические папки images/, icons/ и alisa/ из заданного числа файлов,
+загружает их UploadEngine в fake_cloudinary и измеряет скорость (файлов/с, MB/с),
+повторную загрузку без изменений (манифест), полную синхронизацию инвентаря
+последовательно и параллельно, инкрементальную синхронизацию и построение карты имен.
+Реальный аккаунт и лимит API не используются; все служебные файлы создаются во временной папке
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+
+import cloudinary
+
+from cloudinary_budget import HIGH
+from cloudinary_inventory import CloudinaryInventory
+from cloudinary_upload import UploadEngine, UploadManifest, collect_tasks
+from fake_cloudinary import FakeCloudinaryServer
+from sync_cloudinary_names import add_to_file_map
+
+FOLDERS = (('images', 0.7), ('icons', 0.2), ('alisa', 0.1))
+VIDEO_SHARE = 0.1
+
+
+def make_tree(root, n_files, min_bytes=512, max_bytes=4096, seed=0):
+    """Создает синтетические медиафайлы; возвращает их общий объем в байтах"""
+    rnd = random.Random(seed)
+    total = 0
+    number = 0
+    for folder, share in FOLDERS:
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+        for _ in range(max(1, int(n_files * share))):
+            number += 1
+            extension = '.mp4' if folder == 'images' and rnd.random() < VIDEO_SHARE else '.png'
+            # Часть файлов уже переименована Cloudinary в формат НОМЕР_суффикс
+            name = f'{number}_{rnd.randrange(36 ** 6):06x}' if rnd.random() < 0.3 else str(number)
+            size = rnd.randint(min_bytes, max_bytes)
+            with open(os.path.join(root, folder, name + extension), 'wb') as f:
+                f.write(rnd.randbytes(size))
+            total += size
+    return total
+
+
+def bench_upload(root, workers):
+    tasks = [task for folder, _ in FOLDERS for task in collect_tasks(os.path.join(root, folder), folder)]
+    manifest = UploadManifest(os.path.join(root, '.upload_manifest.json'))
+    engine = UploadEngine(workers=workers, upload_options={'overwrite': True}, manifest=manifest)
+
+    start = time.perf_counter()
+    stats = engine.run(tasks)
+    elapsed = time.perf_counter() - start
+    megabytes = stats.bytes / 1024 / 1024
+    print(f"  загрузка ({workers} потоков): {stats.files} файлов, ошибок {stats.failed}, "
+          f"повторов {stats.retries}, {elapsed:.2f} с, {stats.files / elapsed:.0f} файлов/с, "
+          f"{megabytes / elapsed:.2f} MB/с")
+
+    start = time.perf_counter()
+    stats = engine.run(tasks)
+    print(f"  повторная загрузка без изменений: пропущено {stats.skipped}, "
+          f"{time.perf_counter() - start:.2f} с")
+
+
+def bench_sync(root, workers):
+    folders = [folder for folder, _ in FOLDERS]
+    resource_types = ('image', 'video')
+    for pool in sorted({1, workers}):
+        path = os.path.join(root, f'inventory-{pool}.sqlite')
+        inventory = CloudinaryInventory.open(path, priority=HIGH)
+        start = time.perf_counter()
+        inventory.refresh(folders, resource_types, full=True, workers=pool)
+        full_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        inventory.refresh(folders, resource_types, workers=pool)
+        incremental_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        file_map = defaultdict(dict)
+        for folder in folders:
+            for resource_type in resource_types:
+                for resource in inventory.resources(folder, resource_type):
+                    add_to_file_map(file_map, folder, resource['public_id'])
+        map_time = time.perf_counter() - start
+        inventory.close()
+        print(f"  синхронизация ({pool} потоков): полная {full_time:.2f} с, "
+              f"инкрементальная {incremental_time:.2f} с, карта имен "
+              f"({sum(len(files) for files in file_map.values())} номеров) {map_time:.2f} с")
+
+
+def run(n_files, args):
+    root = tempfile.mkdtemp(prefix='cloudinary-bench-')
+    cwd = os.getcwd()
+    # Бюджет API, манифесты и инвентарь создаются во временной папке, а не в проекте
+    os.chdir(root)
+    try:
+        total = make_tree(root, n_files)
+        print(f"{n_files} файлов ({total / 1024 / 1024:.1f} MB), задержка сервера {args.latency * 1000:.0f} мс:")
+        if args.server:
+            # Внешний сервер (python fake_cloudinary.py) не делит GIL с клиентом
+            cloudinary.config(cloud_name='fake', api_key='fake-key', api_secret='fake-secret',
+                              upload_prefix=args.server)
+            bench_upload(root, args.workers)
+            bench_sync(root, args.list_workers)
+            return
+        with FakeCloudinaryServer(latency=args.latency, error_rate=args.error_rate,
+                                  rate_limit_rate=args.rate_limit_rate, admin_limit=args.admin_limit,
+                                  seed=0) as server:
+            server.configure()
+            bench_upload(root, args.workers)
+            bench_sync(root, args.list_workers)
+            print(f"  запросов к серверу: {server.state.requests}")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк загрузки и синхронизации с поддельным Cloudinary')
+    parser.add_argument('sizes', nargs='*', type=int, default=[1_000, 10_000, 50_000],
+                        help='количество файлов в синтетических папках')
+    parser.add_argument('--workers', type=int, default=8, help='потоков загрузки')
+    parser.add_argument('--list-workers', type=int, default=6, help='потоков загрузки списков при синхронизации')
+    parser.add_argument('--latency', type=float, default=0.0, help='средняя задержка ответа сервера, секунды')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='доля ответов 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='доля случайных ответов 420')
+    parser.add_argument('--admin-limit', type=int, default=100_000, help='часовой лимит Admin API сервера')
+    parser.add_argument('--server', default=None,
+                        help='адрес уже запущенного fake_cloudinary.py (иначе сервер запускается в этом процессе; '
+                             'каждый запуск бенчмарка должен получать новый сервер)')
+    args = parser.parse_args()
+
+    for n_files in args.sizes:
+        run(n_files, args)
+
+
+if __name__ == "__main__":
+    main()
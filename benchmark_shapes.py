@@ -0,0 +1,172 @@
+"""
+Бенчмарк обработки координат фигур из CSV
+Создает синтетические облака точек (sphere.csv, star.csv, art.csv, pattern1.csv), обрабатывает их
+прежним построчным вариантом (df.iterrows) и колоночным process_csv_shapes
+и проверяет, что shapes_coordinates.json получается байт-в-байт одинаковым.
+В данных есть пропущенные и нечисловые значения, дробные и повторяющиеся index
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from process_shapes_csv import FILE_MAPPING, process_csv_shapes
+
+
+def make_csvs(root, n_points, seed=0):
+    """Создает CSV всех фигур по n_points точек в разных вариантах колонок"""
+    rng = np.random.default_rng(seed)
+
+    def cloud(dimensions):
+        # Точки на сфере радиуса 1, index перемешан и иногда повторяется
+        points = rng.normal(size=(n_points, dimensions))
+        points /= np.linalg.norm(points, axis=1, keepdims=True)
+        index = rng.permutation(n_points).astype(np.float64)
+        index[rng.random(n_points) < 0.01] = 7
+        return index, points
+
+    def holes(values, share):
+        values = values.astype(object)
+        values[rng.random(len(values)) < share] = np.nan
+        return values
+
+    # Вариант P(0), P(1), P(2): пропуски в index и Z, дробные index
+    index, points = cloud(3)
+    index[rng.random(n_points) < 0.01] += 0.5
+    pd.DataFrame({'index': holes(index, 0.005), 'P(0)': points[:, 0], 'P(1)': points[:, 1],
+                  'P(2)': holes(points[:, 2], 0.02)}).to_csv(os.path.join(root, 'sphere.csv'), index=False)
+
+    # Вариант x, y без Z, пропуски в x сохраняются как NaN
+    index, points = cloud(2)
+    pd.DataFrame({'Index': index.astype(np.int64), 'x': holes(points[:, 0], 0.01),
+                  'y': points[:, 1]}).to_csv(os.path.join(root, 'star.csv'), index=False)
+
+    # Вариант "колонки после index"
+    index, points = cloud(2)
+    pd.DataFrame({'point_index': index.astype(np.int64), 'a': points[:, 0],
+                  'b': points[:, 1]}).to_csv(os.path.join(root, 'art.csv'), index=False)
+
+    # Текстовые значения: колонки читаются как object, такие строки пропускаются
+    index, points = cloud(3)
+    x = points[:, 0].astype(object)
+    x[rng.random(n_points) < 0.01] = 'n/a'
+    pd.DataFrame({'index': index.astype(np.int64), 'P(0)': x, 'P(1)': points[:, 1],
+                  'P(2)': points[:, 2]}).to_csv(os.path.join(root, 'pattern1.csv'), index=False)
+
+
+def process_csv_shapes_iterrows(csv_dir, output_path):
+    """Прежняя построчная реализация (эталон для сравнения)"""
+    shapes_data = {'star': [], 'sphere': [], 'pattern': [], 'text': []}
+    for csv_file in glob.glob(os.path.join(csv_dir, '*.csv')):
+        shape_name = FILE_MAPPING.get(os.path.basename(csv_file))
+        if not shape_name:
+            continue
+        df = pd.read_csv(csv_file)
+        index_col = x_col = y_col = z_col = None
+        for col in df.columns:
+            if 'index' in col.lower():
+                index_col = col
+                break
+        if 'P(0)' in df.columns:
+            x_col, y_col = 'P(0)', 'P(1)'
+            if 'P(2)' in df.columns:
+                z_col = 'P(2)'
+        elif 'x' in df.columns:
+            x_col, y_col = 'x', 'y'
+            if 'z' in df.columns:
+                z_col = 'z'
+        else:
+            cols = [c for c in df.columns if c != index_col]
+            if len(cols) >= 1:
+                x_col = cols[0]
+            if len(cols) >= 2:
+                y_col = cols[1]
+            if len(cols) >= 3:
+                z_col = cols[2]
+        if not index_col or not x_col or not y_col:
+            continue
+
+        coordinates = []
+        scale_factor = 10 if shape_name in ['sphere', 'star', 'text'] else 1
+        for _, row in df.iterrows():
+            try:
+                coord = {
+                    'index': int(row[index_col]),
+                    'x': float(row[x_col]) * scale_factor,
+                    'y': float(row[y_col]) * scale_factor
+                }
+                if z_col and z_col in df.columns:
+                    z_val = row[z_col]
+                    coord['z'] = float(z_val) if pd.notna(z_val) else 0.5
+                else:
+                    coord['z'] = 0.5
+                coordinates.append(coord)
+            except Exception:
+                continue
+        coordinates.sort(key=lambda c: c['index'])
+        shapes_data[shape_name] = coordinates
+
+    if shapes_data['sphere']:
+        z_values = [c['z'] for c in shapes_data['sphere']]
+        min_z, max_z = min(z_values), max(z_values)
+        z_range = max_z - min_z if max_z != min_z else 1
+        for coord in shapes_data['sphere']:
+            coord['z'] = (coord['z'] - min_z) / z_range
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(shapes_data, f, ensure_ascii=False, indent=2)
+
+
+def run(n_points, skip_reference):
+    root = tempfile.mkdtemp(prefix='shapes-bench-')
+    try:
+        make_csvs(root, n_points)
+        expected_path = os.path.join(root, 'expected.json')
+        actual_path = os.path.join(root, 'actual.json')
+
+        legacy_time = None
+        if not skip_reference:
+            start = time.perf_counter()
+            process_csv_shapes_iterrows(root, expected_path)
+            legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            process_csv_shapes(root, actual_path)
+        columnar_time = time.perf_counter() - start
+
+        line = f"{n_points:>8} точек на фигуру: колоночная обработка {columnar_time:7.3f} с"
+        if legacy_time is None:
+            print(line)
+            return True
+        with open(expected_path, 'rb') as f_expected, open(actual_path, 'rb') as f_actual:
+            identical = f_expected.read() == f_actual.read()
+        print(f"{line}, iterrows {legacy_time:7.3f} с, ускорение x{legacy_time / columnar_time:5.1f}, "
+              f"{'вывод идентичен' if identical else 'ВЫВОД ОТЛИЧАЕТСЯ'}")
+        return identical
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк обработки координат фигур из CSV')
+    parser.add_argument('sizes', nargs='*', type=int, default=[10_000, 100_000, 250_000],
+                        help='количество точек в каждой синтетической фигуре')
+    parser.add_argument('--skip-reference', action='store_true',
+                        help='не запускать медленную построчную реализацию (без проверки вывода)')
+    args = parser.parse_args()
+
+    if not all([run(n_points, args.skip_reference) for n_points in args.sizes]):
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Бенчмарк преобразования строк таблицы в элементы портфолио
+Сравнивает прежний обход через df.iterrows() с колоночным transform_rows
+на синтетических таблицах (с текстом и только с числами) и проверяет,
+что JSON получается байт-в-байт одинаковым
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from portfolio_build import transform_rows
+
+WORDS = ['LED', 'инсталляция', 'Generative graphics', 'генеративная', 'графика', 'видео',
+         'Interactive installation', 'проекция', 'TouchDesigner', 'свет', 'звук', 'mapping']
+
+
+def make_sheet(n_rows, n_cols=6, seed=0, numeric=False):
+    """
+    Создает синтетическую таблицу, похожую на сайт_портфолио.xlsx
+    numeric=True - только числа и пропуски: целые колонки вместе с дробными iterrows приводит к float
+    """
+    rnd = random.Random(seed)
+    columns = []
+    for col_idx in range(n_cols):
+        column = []
+        for _ in range(n_rows):
+            roll = rnd.random()
+            if numeric:
+                # Четные колонки целые (int64), нечетные - дробные с пропусками (float64)
+                if col_idx % 2 == 0:
+                    column.append(rnd.randint(0, 500))
+                else:
+                    column.append(np.nan if roll < 0.3 else round(rnd.uniform(-100, 100), rnd.randint(0, 3)))
+            elif roll < 0.3:
+                column.append(np.nan)
+            elif roll < 0.35:
+                column.append('   ')
+            elif roll < 0.4:
+                column.append(rnd.randint(1, 500))
+            else:
+                length = rnd.randint(1, 30 if col_idx != 1 else 60)
+                column.append(' '.join(rnd.choice(WORDS) for _ in range(length)))
+        columns.append(column)
+    return pd.DataFrame(dict(enumerate(columns)))
+
+
+def transform_iterrows(df):
+    """Прежняя построчная реализация (эталон для сравнения)"""
+    results = []
+    for idx, row in df.iterrows():
+        additional = {}
+        title = ''
+        description = ''
+        texts = []
+        for col_idx, col in enumerate(df.columns):
+            value = row[col]
+            if pd.notna(value):
+                value_str = str(value).strip()
+                if value_str:
+                    texts.append(value_str)
+                    additional[f'col_{col_idx}'] = value_str
+        if len(texts) > 0:
+            sorted_texts = sorted(texts, key=len)
+            title = sorted_texts[0] if sorted_texts else ''
+            description = sorted_texts[-1] if sorted_texts else ''
+            if title == description:
+                first_col_key = 'col_0' if 'col_0' in additional else None
+                if first_col_key:
+                    title = additional[first_col_key]
+                    desc_parts = []
+                    for col_idx in range(1, len(df.columns)):
+                        col_key = f'col_{col_idx}'
+                        if col_key in additional:
+                            desc_parts.append(additional[col_key])
+                    if desc_parts:
+                        description = '\n\n'.join(desc_parts)
+                    elif len(texts) > 1:
+                        description = '\n\n'.join(texts[1:])
+            if len(description) < 50 and len(texts) > 1:
+                description = '\n\n'.join([t for t in texts if t != title])
+        results.append((additional, title, description))
+    return results
+
+
+def run(n_rows, numeric=False):
+    df = make_sheet(n_rows, numeric=numeric)
+
+    start = time.perf_counter()
+    expected = transform_iterrows(df)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = transform_rows(df, range(len(df)))
+    columnar_time = time.perf_counter() - start
+
+    identical = (json.dumps(expected, ensure_ascii=False, indent=2) ==
+                 json.dumps(actual, ensure_ascii=False, indent=2))
+    print(f"{n_rows:>8} строк{' (числа)' if numeric else ''}: iterrows {legacy_time:8.3f} с, "
+          f"transform_rows {columnar_time:8.3f} с, "
+          f"ускорение x{legacy_time / columnar_time:5.1f}, "
+          f"{'вывод идентичен' if identical else 'ВЫВОД ОТЛИЧАЕТСЯ'}")
+    return identical
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк преобразования строк таблицы')
+    parser.add_argument('sizes', nargs='*', type=int, default=[10_000, 100_000],
+                        help='количество строк синтетических таблиц')
+    args = parser.parse_args()
+
+    if not all([run(n_rows, numeric) for n_rows in args.sizes for numeric in (False, True)]):
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Манифест инкрементальной сборки portfolio_data.json
+Хранит хэши строк таблицы и медиафайлов, чтобы пересобирать только изменившиеся элементы
+"""
+import hashlib
+import json
+import os
+
+MANIFEST_VERSION = 1
+DEFAULT_MANIFEST_PATH = '.build_manifest.json'
+
+# Размер блока при чтении файлов для хэширования
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_text(text):
+    """Возвращает sha256 от строки"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def hash_file(path):
+    """Считает sha256 содержимого файла, читая его блоками"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def row_hashes(df):
+    """
+    Возвращает хэш содержимого для каждой строки DataFrame
+    Используется векторизованный pd.util.hash_pandas_object, без обхода строк в Python
+    """
+    import pandas as pd
+    hashes = pd.util.hash_pandas_object(df, index=False)
+    return [format(int(h), '016x') for h in hashes.to_numpy()]
+
+
+class BuildManifest:
+    """
+    Манифест сборки: хэши строк, медиафайлов и входные ключи элементов
+
+    Структура файла:
+    - rows: номер строки -> хэш содержимого строки
+    - files: относительный путь -> {size, mtime, sha256}
+    - items: id элемента -> ключ всех входных данных, из которых он был собран
+    - output: файл, в который были записаны элементы (манифест действителен только для него)
+    """
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH, output=None):
+        self.path = path
+        self.output = output
+        self.rows = {}
+        self.files = {}
+        self.items = {}
+        self._previous_files = {}
+        self._previous_items = {}
+
+    @classmethod
+    def load(cls, path=DEFAULT_MANIFEST_PATH, output=None, items=True):
+        """
+        Загружает манифест с диска (пустой манифест, если файла нет или он устарел)
+        items=False - только хэши файлов: полная сборка не берет элементы из прошлой,
+        но не перечитывает файлы, у которых не изменились размер и mtime
+        """
+        manifest = cls(path, output)
+        if not os.path.exists(path):
+            return manifest
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠ Не удалось прочитать манифест {path}: {e}")
+            return manifest
+        if data.get('version') != MANIFEST_VERSION:
+            return manifest
+        manifest._previous_files = data.get('files', {})
+        if items and data.get('output') == output:
+            manifest._previous_items = data.get('items', {})
+        return manifest
+
+    def save(self):
+        """Сохраняет манифест на диск"""
+        data = {
+            'version': MANIFEST_VERSION,
+            'output': self.output,
+            'rows': self.rows,
+            'files': self.files,
+            'items': self.items
+        }
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+    def file_hash(self, path, key=None, stat=None):
+        """
+        Возвращает хэш файла, пересчитывая его только при изменении размера или mtime
+        key - ключ файла в манифесте (по умолчанию путь)
+        """
+        key = key or str(path).replace('\\', '/')
+        if stat is None:
+            stat = os.stat(path)
+        size, mtime = stat.st_size, stat.st_mtime_ns
+        previous = self._previous_files.get(key)
+        if previous and previous['size'] == size and previous['mtime'] == mtime:
+            sha = previous['sha256']
+        else:
+            sha = hash_file(path)
+        self.files[key] = {'size': size, 'mtime': mtime, 'sha256': sha}
+        return sha
+
+    def is_fresh(self, item_id, input_key):
+        """Проверяет, что элемент был собран из тех же входных данных"""
+        return self._previous_items.get(str(item_id)) == input_key
+
+    def record(self, item_id, row_hash, input_key):
+        """Запоминает входные данные собранного элемента"""
+        self.rows[str(item_id)] = row_hash
+        self.items[str(item_id)] = input_key
@@ -1,11 +1,28 @@
 """
 Скрипт для проверки структуры файлов в Cloudinary
+Без флагов показывает первые файлы папок и ищет файл 250.
+С --audit сверяет все: локальные папки images/, icons/, alisa/, список ресурсов Cloudinary
+(локальный инвентарь, см. cloudinary_inventory.py) и URL в portfolio_data.json,
+и сохраняет отчет в JSON: каких файлов нет в Cloudinary, какие лишние,
+у каких не совпадает размер и какие URL сайта ведут в никуда
 """
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
 import cloudinary
 import cloudinary.api
-import os
 from dotenv import load_dotenv
 
+from cloudinary_budget import LOW, NORMAL, ApiBudget, BudgetExhausted, api_call
+from cloudinary_inventory import CloudinaryInventory
+from cloudinary_upload import collect_tasks
+from cloudinary_urls import parse_url
+from portfolio_store import PortfolioStore
+
 load_dotenv()
 
 CLOUD_NAME = os.getenv('CLOUDINARY_CLOUD_NAME')
@@ -18,66 +35,258 @@ cloudinary.config(
     api_secret=API_SECRET
 )
 
-print("Checking Cloudinary structure...\n")
-
-# Проверяем папку images
-print("=== Images folder ===")
-try:
-    result = cloudinary.api.resources(
-        type='upload',
-        prefix='images/',
-        resource_type='image',
-        max_results=10
-    )
-    print(f"Found {len(result.get('resources', []))} image files (showing first 10):")
-    for resource in result.get('resources', [])[:10]:
-        print(f"  - {resource.get('public_id')}")
-except Exception as e:
-    print(f"Error: {e}")
-
-print("\n=== Icons folder ===")
-try:
-    result = cloudinary.api.resources(
-        type='upload',
-        prefix='icons/',
-        resource_type='image',
-        max_results=10
-    )
-    print(f"Found {len(result.get('resources', []))} icon files (showing first 10):")
-    for resource in result.get('resources', [])[:10]:
-        print(f"  - {resource.get('public_id')}")
-except Exception as e:
-    print(f"Error: {e}")
-
-print("\n=== Videos in images folder ===")
-try:
-    result = cloudinary.api.resources(
-        type='upload',
-        prefix='images/',
-        resource_type='video',
-        max_results=10
-    )
-    print(f"Found {len(result.get('resources', []))} video files (showing first 10):")
-    for resource in result.get('resources', [])[:10]:
-        print(f"  - {resource.get('public_id')}")
-except Exception as e:
-    print(f"Error: {e}")
-
-print("\n=== Checking specific file (250) ===")
-# Проверяем конкретный файл
-for folder in ['images', 'icons']:
-    for resource_type in ['image', 'video']:
-        try:
-            result = cloudinary.api.resources(
-                type='upload',
-                prefix=f"{folder}/250",
-                resource_type=resource_type,
-                max_results=5
-            )
-            if result.get('resources'):
-                print(f"Found in {folder}/{resource_type}:")
-                for r in result.get('resources', []):
-                    print(f"  - {r.get('public_id')}")
-        except:
-            pass
+FOLDERS = ['images', 'icons', 'alisa']
+DEFAULT_REPORT_PATH = 'cloudinary_audit.json'
+
+# Поля media с одним URL и со списками версий [{url, ...}]
+URL_FIELDS = ('path', 'thumbnail', 'poster')
+SRCSET_FIELDS = ('srcset', 'thumbnail_srcset')
+
+
+def quick_check():
+    """Первые файлы каждой папки и поиск файла 250 (фоновые запросы с низким приоритетом)"""
+    print("Checking Cloudinary structure...\n")
+
+    # Проверяем папку images
+    print("=== Images folder ===")
+    try:
+        result = api_call(
+            cloudinary.api.resources,
+            priority=LOW,
+            type='upload',
+            prefix='images/',
+            resource_type='image',
+            max_results=10
+        )
+        print(f"Found {len(result.get('resources', []))} image files (showing first 10):")
+        for resource in result.get('resources', [])[:10]:
+            print(f"  - {resource.get('public_id')}")
+    except Exception as e:
+        print(f"Error: {e}")
+
+    print("\n=== Icons folder ===")
+    try:
+        result = api_call(
+            cloudinary.api.resources,
+            priority=LOW,
+            type='upload',
+            prefix='icons/',
+            resource_type='image',
+            max_results=10
+        )
+        print(f"Found {len(result.get('resources', []))} icon files (showing first 10):")
+        for resource in result.get('resources', [])[:10]:
+            print(f"  - {resource.get('public_id')}")
+    except Exception as e:
+        print(f"Error: {e}")
+
+    print("\n=== Videos in images folder ===")
+    try:
+        result = api_call(
+            cloudinary.api.resources,
+            priority=LOW,
+            type='upload',
+            prefix='images/',
+            resource_type='video',
+            max_results=10
+        )
+        print(f"Found {len(result.get('resources', []))} video files (showing first 10):")
+        for resource in result.get('resources', [])[:10]:
+            print(f"  - {resource.get('public_id')}")
+    except Exception as e:
+        print(f"Error: {e}")
+
+    print("\n=== Checking specific file (250) ===")
+    # Проверяем конкретный файл
+    for folder in ['images', 'icons']:
+        for resource_type in ['image', 'video']:
+            try:
+                result = api_call(
+                    cloudinary.api.resources,
+                    priority=LOW,
+                    type='upload',
+                    prefix=f"{folder}/250",
+                    resource_type=resource_type,
+                    max_results=5
+                )
+                if result.get('resources'):
+                    print(f"Found in {folder}/{resource_type}:")
+                    for r in result.get('resources', []):
+                        print(f"  - {r.get('public_id')}")
+            except BudgetExhausted as e:
+                print(f"Skipped {folder}/{resource_type}: {e}")
+            except:
+                pass
+
+
+def number_key(public_id):
+    """"images/26_egl2kh" -> "images/26": Cloudinary добавляет к имени случайный суффикс"""
+    match = re.match(r'^(.*/)?(\d+)[_-][^/]*$', public_id)
+    return f'{match.group(1) or ""}{match.group(2)}' if match else None
+
+
+def iter_portfolio_urls(items):
+    """Перебирает (id работы, поле, URL) всех медиа-ссылок portfolio_data.json"""
+    for item in items:
+        media = item.get('media') or {}
+        for field in URL_FIELDS:
+            if media.get(field):
+                yield item.get('id'), field, media[field]
+        for field in SRCSET_FIELDS:
+            for rendition in media.get(field) or []:
+                if rendition.get('url'):
+                    yield item.get('id'), field, rendition['url']
+
+
+def audit(inventory, folders, items):
+    """
+    Сверяет локальные файлы, ресурсы Cloudinary и URL сайта за один проход по каждому источнику
+    Все соединения - по хэш-таблицам (тип ресурса, public_id), поэтому время линейно
+    Локальный файл images/26.png совпадает с ресурсом images/26 или, если такого нет,
+    с переименованным Cloudinary ресурсом images/26_xxx
+    """
+    # Локальные файлы: (тип, public_id) -> задание загрузки (путь, размер)
+    local = {}
+    for folder in folders:
+        for task in collect_tasks(folder, folder):
+            local[(task.resource_type, task.public_id)] = task
+
+    remote = set()
+    matched = set()
+    renamed = {}
+    extra_candidates = []
+    size_mismatch = []
+
+    def compare(task, resource):
+        if resource['bytes'] is not None and resource['bytes'] != task.size:
+            size_mismatch.append({
+                'resource_type': task.resource_type,
+                'public_id': resource['public_id'],
+                'path': task.path.as_posix(),
+                'local_bytes': task.size,
+                'remote_bytes': resource['bytes']
+            })
+
+    # Ресурсы Cloudinary читаются из инвентаря курсором, без загрузки всего списка в память
+    for resource in inventory.iter_resources(folders):
+        key = (resource['resource_type'], resource['public_id'])
+        remote.add(key)
+        task = local.get(key)
+        if task is not None:
+            matched.add(key)
+            compare(task, resource)
+        else:
+            extra_candidates.append(resource)
+
+    # Переименованные Cloudinary файлы (26 -> 26_xxx) сопоставляются с еще не найденными локальными
+    extra = []
+    for resource in extra_candidates:
+        alias = number_key(resource['public_id'])
+        key = (resource['resource_type'], alias)
+        if alias and key in local and key not in matched and key not in renamed:
+            renamed[key] = resource['public_id']
+            compare(local[key], resource)
+        else:
+            extra.append({field: resource[field] for field in ('resource_type', 'public_id', 'bytes', 'created_at')})
+
+    missing = [{'resource_type': resource_type, 'public_id': public_id,
+                'path': task.path.as_posix(), 'bytes': task.size}
+               for (resource_type, public_id), task in local.items()
+               if (resource_type, public_id) not in matched and (resource_type, public_id) not in renamed]
+
+    broken_urls = []
+    url_count = 0
+    for item_id, field, url in iter_portfolio_urls(items):
+        url_count += 1
+        parsed = parse_url(url)
+        if parsed is None:
+            if not re.match(r'^https?://', url) and not os.path.exists(url):
+                broken_urls.append({'id': item_id, 'field': field, 'url': url, 'reason': 'local file not found'})
+            continue
+        if parsed.doubled:
+            broken_urls.append({'id': item_id, 'field': field, 'url': url, 'reason': 'doubled Cloudinary host'})
+        elif (parsed.public_id.split('/', 1)[0] in folders
+              and (parsed.resource_type, parsed.public_id) not in remote):
+            broken_urls.append({'id': item_id, 'field': field, 'url': url, 'reason': 'resource not in Cloudinary'})
+
+    return {
+        'counts': {
+            'local_files': len(local),
+            'remote_resources': len(remote),
+            'portfolio_urls': url_count,
+            'matched': len(matched) + len(renamed),
+            'renamed': len(renamed),
+            'missing': len(missing),
+            'extra': len(extra),
+            'size_mismatch': len(size_mismatch),
+            'broken_urls': len(broken_urls)
+        },
+        'missing': sorted(missing, key=lambda r: (r['resource_type'], r['public_id'])),
+        'extra': sorted(extra, key=lambda r: (r['resource_type'], r['public_id'])),
+        'size_mismatch': sorted(size_mismatch, key=lambda r: (r['resource_type'], r['public_id'])),
+        'broken_urls': broken_urls
+    }
+
+
+def run_audit(report_path=DEFAULT_REPORT_PATH, full_refresh=False, portfolio_path='portfolio_data.json'):
+    """Обновляет инвентарь, сверяет и сохраняет отчет; возвращает отчет"""
+    print("Refreshing Cloudinary inventory...")
+    inventory = CloudinaryInventory.open(priority=NORMAL)
+    complete = inventory.refresh(FOLDERS, full=full_refresh)
+    if not complete:
+        print("⚠ Inventory refresh did not finish, the report uses the files stored so far")
+
+    store = PortfolioStore.load_if_exists(portfolio_path)
+    items = store.items if store is not None else []
+
+    started = time.perf_counter()
+    report = audit(inventory, FOLDERS, items)
+    inventory.close()
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'cloud_name': CLOUD_NAME,
+        'inventory': 'full' if full_refresh else 'incremental',
+        'inventory_complete': complete,
+        **report
+    }
+
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    counts = report['counts']
+    print(f"\nAudit finished in {time.perf_counter() - started:.2f} s:")
+    print(f"  Local files: {counts['local_files']}, Cloudinary resources: {counts['remote_resources']}, "
+          f"portfolio URLs: {counts['portfolio_urls']}")
+    print(f"  Matched: {counts['matched']} (renamed by Cloudinary: {counts['renamed']})")
+    print(f"  Missing in Cloudinary: {counts['missing']}")
+    print(f"  Extra in Cloudinary: {counts['extra']}")
+    print(f"  Size mismatch: {counts['size_mismatch']}")
+    print(f"  Broken portfolio URLs: {counts['broken_urls']}")
+    print(f"Report saved to {report_path}")
+    if not full_refresh:
+        print("Note: files deleted or renamed in Cloudinary are only noticed with --full-refresh "
+              "(or the automatic full sync every few runs)")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check files in Cloudinary')
+    parser.add_argument('--audit', action='store_true',
+                        help='reconcile local folders, Cloudinary and portfolio_data.json and write a JSON report')
+    parser.add_argument('--report', default=DEFAULT_REPORT_PATH, help='where to write the audit report')
+    parser.add_argument('--full-refresh', action='store_true',
+                        help='reload the whole Cloudinary file list before the audit (notices deleted and renamed files)')
+    args = parser.parse_args()
+
+    if args.audit:
+        report = run_audit(args.report, args.full_refresh)
+        counts = report['counts']
+        # Ненулевой код выхода, если сайт ссылается на отсутствующие файлы или что-то не загружено
+        sys.exit(1 if counts['missing'] or counts['broken_urls'] else 0)
+
+    quick_check()
+    print(f"\n{ApiBudget.shared().summary()}")
+
 
+if __name__ == "__main__":
+    main()
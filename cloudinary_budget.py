@@ -0,0 +1,221 @@
+"""
+Общий бюджет запросов к Admin API Cloudinary
+Admin API (списки ресурсов, rename, delete) ограничен часовым лимитом (обычно 500 запросов),
+а скрипты синхронизации, проверки и загрузки тратят его независимо друг от друга.
+ApiBudget - ведро токенов, общее для всех процессов: остаток и время сброса хранятся
+в .cloudinary_api_budget.json, каждый запрос забирает токен, а заголовки ответа
+(X-FeatureRateLimit-Remaining/Reset) исправляют остаток на фактический.
+У запросов есть приоритет: фоновые (LOW) не могут израсходовать резерв, оставленный
+для синхронизации сайта (HIGH). Если токенов нет, запрос откладывается до сброса лимита
+(не дольше max_wait секунд) или завершается ошибкой BudgetExhausted.
+Запросы Upload API (загрузка файлов) в часовой лимит Admin API не входят и через бюджет не идут
+"""
+import argparse
+import calendar
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import cloudinary.exceptions
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка только внутри процесса
+    fcntl = None
+
+BUDGET_VERSION = 1
+DEFAULT_BUDGET_PATH = '.cloudinary_api_budget.json'
+
+# Лимит бесплатного тарифа; уточняется по заголовку X-FeatureRateLimit-Limit
+DEFAULT_LIMIT = 500
+# Лимит Admin API сбрасывается каждый час
+RESET_PERIOD = 3600
+
+HIGH = 0
+NORMAL = 1
+LOW = 2
+PRIORITY_NAMES = {HIGH: 'high', NORMAL: 'normal', LOW: 'low'}
+
+# Доля лимита, которую запрос данного приоритета должен оставить нетронутой
+RESERVE = {HIGH: 0.0, NORMAL: 0.05, LOW: 0.2}
+
+
+class BudgetExhausted(cloudinary.exceptions.RateLimited):
+    """Токенов для запроса нет, а до сброса лимита дольше, чем можно ждать"""
+
+    def __init__(self, message, reset_at):
+        super().__init__(message)
+        self.reset_at = reset_at
+
+
+def next_reset(now):
+    """Начало следующего часа - время сброса, если Cloudinary его не сообщил"""
+    return (int(now) // RESET_PERIOD + 1) * RESET_PERIOD
+
+
+def response_limits(result):
+    """
+    Достает (limit, remaining, reset_at) из ответа cloudinary.api
+    Ответ Admin API - объект Response с полями rate_limit_*; у других ответов их нет
+    """
+    limit = getattr(result, 'rate_limit_allowed', None)
+    remaining = getattr(result, 'rate_limit_remaining', None)
+    reset_at = getattr(result, 'rate_limit_reset_at', None)
+    if reset_at is not None:
+        # email.utils.parsedate возвращает кортеж времени в GMT
+        reset_at = float(calendar.timegm(tuple(reset_at)[:6]))
+    return limit, remaining, reset_at
+
+
+class ApiBudget:
+    """Ведро токенов Admin API, состояние которого разделяют все процессы"""
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path=DEFAULT_BUDGET_PATH, max_wait=0.0, clock=time.time, sleep=time.sleep):
+        self.path = path
+        self.max_wait = max_wait
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    @classmethod
+    def shared(cls):
+        """Бюджет по умолчанию для всех скриптов процесса"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @contextmanager
+    def _locked(self):
+        """Блокировка состояния внутри процесса (потоки) и между процессами (файл .lock)"""
+        with self.lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.path + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self):
+        state = {'limit': DEFAULT_LIMIT, 'remaining': DEFAULT_LIMIT, 'reset_at': None, 'updated_at': None}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == BUDGET_VERSION:
+                    state.update(data.get('admin', {}))
+            except (OSError, ValueError) as e:
+                print(f"⚠ Не удалось прочитать бюджет API {self.path}: {e}")
+        # Лимит уже сброшен - ведро снова полное
+        now = self.clock()
+        if state['reset_at'] is None or now >= state['reset_at']:
+            state['remaining'] = state['limit']
+            state['reset_at'] = next_reset(now)
+        return state
+
+    def _write(self, state):
+        state['updated_at'] = self.clock()
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'version': BUDGET_VERSION, 'admin': state}, f, indent=2)
+        os.replace(self.path + '.tmp', self.path)
+
+    def state(self):
+        with self._locked():
+            return self._read()
+
+    def _available(self, state, priority):
+        """Сколько токенов может взять запрос с этим приоритетом"""
+        return state['remaining'] - int(state['limit'] * RESERVE.get(priority, 0.0))
+
+    def acquire(self, priority=NORMAL, max_wait=None):
+        """
+        Забирает один токен; если его нет - ждет сброса лимита не дольше max_wait секунд,
+        иначе выбрасывает BudgetExhausted
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        while True:
+            with self._locked():
+                state = self._read()
+                if self._available(state, priority) > 0:
+                    state['remaining'] -= 1
+                    self._write(state)
+                    return
+                wait = state['reset_at'] - self.clock()
+            if wait > max_wait:
+                reset = time.strftime('%H:%M:%S UTC', time.gmtime(state['reset_at']))
+                raise BudgetExhausted(
+                    f"Бюджет Admin API для запросов с приоритетом {PRIORITY_NAMES.get(priority, priority)} "
+                    f"исчерпан (осталось {state['remaining']}/{state['limit']}), сброс в {reset}", state['reset_at'])
+            print(f"  ⏳ Бюджет Admin API исчерпан, ожидание сброса лимита {wait:.0f} с...")
+            self.sleep(max(wait, 0) + 1)
+
+    def observe(self, result):
+        """Исправляет остаток по заголовкам ответа Cloudinary"""
+        limit, remaining, reset_at = response_limits(result)
+        if remaining is None:
+            return
+        with self._locked():
+            state = self._read()
+            if limit:
+                state['limit'] = limit
+            state['remaining'] = remaining
+            if reset_at:
+                state['reset_at'] = reset_at
+            self._write(state)
+
+    def exhausted(self):
+        """Cloudinary ответил 420: до сброса лимита токенов нет ни у кого"""
+        with self._locked():
+            state = self._read()
+            state['remaining'] = 0
+            self._write(state)
+
+    def call(self, func, *args, priority=NORMAL, max_wait=None, **kwargs):
+        """Выполняет запрос Admin API func(*args, **kwargs) в рамках бюджета"""
+        self.acquire(priority, max_wait)
+        self.calls += 1
+        try:
+            result = func(*args, **kwargs)
+        except cloudinary.exceptions.RateLimited:
+            self.exhausted()
+            raise
+        self.observe(result)
+        return result
+
+    def summary(self):
+        state = self.state()
+        reset = time.strftime('%H:%M:%S UTC', time.gmtime(state['reset_at']))
+        return f"Admin API: осталось {state['remaining']}/{state['limit']} запросов, сброс в {reset}"
+
+
+def api_call(func, *args, priority=NORMAL, **kwargs):
+    """Запрос Admin API через общий бюджет: api_call(cloudinary.api.resources, prefix=...)"""
+    return ApiBudget.shared().call(func, *args, priority=priority, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Состояние бюджета запросов к Admin API Cloudinary')
+    parser.add_argument('--reset', action='store_true',
+                        help='забыть сохраненный остаток (например, после смены тарифа)')
+    args = parser.parse_args()
+    budget = ApiBudget.shared()
+    if args.reset and os.path.exists(budget.path):
+        os.remove(budget.path)
+    print(budget.summary())
+    state = budget.state()
+    for priority, share in sorted(RESERVE.items()):
+        print(f"  {PRIORITY_NAMES[priority]}: доступно {max(budget._available(state, priority), 0)} "
+              f"(резерв {share:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Локальная копия списка ресурсов Cloudinary (SQLite)
+Полный обход папок через Admin API стоит десятки запросов и упирается в часовой лимит.
+Инвентарь хранит public_id, папку, тип, размер, etag и дату создания каждого ресурса
+и обновляется инкрементально: запрашиваются только ресурсы, созданные после прошлой
+синхронизации. Admin API не поддерживает start_at вместе с prefix, поэтому инкрементальный
+запрос идет по всему аккаунту, а папки отбираются локально.
+Инкрементальное обновление видит только ресурсы с новой датой создания, поэтому не замечает
+удаленные и переименованные файлы: uploader.rename сохраняет created_at, и новый public_id
+(например, 26_egl2kh вместо 26) не попадает в инвентарь, а старый остается в нем. Их находит
+полная синхронизация (full=True, флаг --full-refresh); кроме того, каждый тип ресурса
+перечитывается полностью автоматически после FULL_REFRESH_EVERY инкрементальных обновлений
+"""
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cloudinary.api
+import cloudinary.exceptions
+
+from cloudinary_budget import NORMAL, api_call
+
+DEFAULT_INVENTORY_PATH = '.cloudinary_inventory.sqlite'
+PAGE_SIZE = 500
+# Сколько списков (папка x тип ресурса) загружать одновременно
+LIST_WORKERS = 6
+# После скольких инкрементальных обновлений тип ресурса перечитывается полностью
+# (замечает удаленные и переименованные файлы); 0 - только по --full-refresh
+FULL_REFRESH_EVERY = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    resource_type TEXT NOT NULL,
+    public_id TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    format TEXT,
+    bytes INTEGER,
+    etag TEXT,
+    version INTEGER,
+    created_at TEXT,
+    PRIMARY KEY (resource_type, public_id)
+);
+CREATE INDEX IF NOT EXISTS resources_folder ON resources (folder, resource_type);
+CREATE TABLE IF NOT EXISTS sync_state (
+    resource_type TEXT PRIMARY KEY,
+    last_created_at TEXT,
+    synced_at REAL
+);
+CREATE TABLE IF NOT EXISTS incremental_runs (
+    resource_type TEXT PRIMARY KEY,
+    runs INTEGER NOT NULL
+);
+"""
+
+
+def resource_folder(public_id):
+    """Папка верхнего уровня ресурса ("images" для "images/26_egl2kh")"""
+    return public_id.split('/', 1)[0] if '/' in public_id else ''
+
+
+class CloudinaryInventory:
+    """Инвентарь ресурсов Cloudinary в SQLite"""
+
+    def __init__(self, connection, priority=NORMAL):
+        self.db = connection
+        # Приоритет запросов Admin API в общем бюджете (cloudinary_budget)
+        self.priority = priority
+
+    @classmethod
+    def open(cls, path=DEFAULT_INVENTORY_PATH, priority=NORMAL):
+        connection = sqlite3.connect(path)
+        connection.row_factory = sqlite3.Row
+        connection.executescript(SCHEMA)
+        return cls(connection, priority)
+
+    def close(self):
+        self.db.close()
+
+    def upsert(self, resource_type, resources):
+        """Добавляет или обновляет ресурсы из ответа Admin API"""
+        self.db.executemany(
+            """INSERT INTO resources (resource_type, public_id, folder, format, bytes, etag, version, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (resource_type, public_id) DO UPDATE SET
+                   folder = excluded.folder, format = excluded.format, bytes = excluded.bytes,
+                   etag = excluded.etag, version = excluded.version, created_at = excluded.created_at""",
+            [(resource_type, r['public_id'], resource_folder(r['public_id']), r.get('format'),
+              r.get('bytes'), r.get('etag'), r.get('version'), r.get('created_at'))
+             for r in resources]
+        )
+
+    def last_created_at(self, resource_type):
+        row = self.db.execute('SELECT last_created_at FROM sync_state WHERE resource_type = ?',
+                              (resource_type,)).fetchone()
+        return row['last_created_at'] if row else None
+
+    def incremental_runs(self, resource_type):
+        """Сколько инкрементальных обновлений прошло с последнего полного"""
+        row = self.db.execute('SELECT runs FROM incremental_runs WHERE resource_type = ?',
+                              (resource_type,)).fetchone()
+        return row['runs'] if row else 0
+
+    def _count_run(self, resource_type, full):
+        runs = 0 if full else self.incremental_runs(resource_type) + 1
+        self.db.execute(
+            """INSERT INTO incremental_runs (resource_type, runs) VALUES (?, ?)
+               ON CONFLICT (resource_type) DO UPDATE SET runs = excluded.runs""",
+            (resource_type, runs)
+        )
+
+    def _save_state(self, resource_type, seen_latest=None):
+        # Новая отметка - самая поздняя дата создания среди известных ресурсов этого типа
+        # (и среди полученных ресурсов из других папок, чтобы не запрашивать их снова)
+        row = self.db.execute('SELECT MAX(created_at) AS latest FROM resources WHERE resource_type = ?',
+                              (resource_type,)).fetchone()
+        latest = max(filter(None, [row['latest'], seen_latest]), default=None)
+        self.db.execute(
+            """INSERT INTO sync_state (resource_type, last_created_at, synced_at) VALUES (?, ?, ?)
+               ON CONFLICT (resource_type) DO UPDATE SET
+                   last_created_at = excluded.last_created_at, synced_at = excluded.synced_at""",
+            (resource_type, latest, time.time())
+        )
+
+    def _fetch_pages(self, **params):
+        """Перебирает страницы cloudinary.api.resources и отдает списки ресурсов"""
+        next_cursor = None
+        while True:
+            if next_cursor:
+                params['next_cursor'] = next_cursor
+            result = api_call(cloudinary.api.resources, priority=self.priority,
+                              type='upload', max_results=PAGE_SIZE, **params)
+            yield result.get('resources', [])
+            next_cursor = result.get('next_cursor')
+            if not next_cursor:
+                return
+
+    def _fetch_all(self, **params):
+        """
+        Загружает все страницы одного списка (выполняется в потоке, к базе не обращается)
+        Возвращает (ресурсы, ошибка): при ошибке - ресурсы, полученные до нее
+        """
+        resources = []
+        try:
+            for page in self._fetch_pages(**params):
+                resources.extend(page)
+        except Exception as e:
+            return resources, e
+        return resources, None
+
+    def apply_full(self, folder, resource_type, resources, complete=True):
+        """
+        Сохраняет полный список папки; если список полный (complete), ресурсы,
+        которых больше нет в Cloudinary, удаляются. Возвращает количество ресурсов
+        """
+        self.upsert(resource_type, resources)
+        seen = {r['public_id'] for r in resources}
+        if complete:
+            stale = [row['public_id'] for row in self.db.execute(
+                'SELECT public_id FROM resources WHERE folder = ? AND resource_type = ?', (folder, resource_type))
+                if row['public_id'] not in seen]
+            self.db.executemany('DELETE FROM resources WHERE resource_type = ? AND public_id = ?',
+                                [(resource_type, public_id) for public_id in stale])
+        self.db.commit()
+        return len(seen)
+
+    def apply_since(self, resource_type, folders, resources):
+        """
+        Сохраняет ресурсы, созданные после прошлой синхронизации (список без prefix),
+        которые лежат в папках folders
+        Возвращает (количество новых или измененных ресурсов в этих папках,
+        самая поздняя дата создания среди всех полученных ресурсов)
+        """
+        relevant = [r for r in resources if resource_folder(r['public_id']) in folders]
+        self.upsert(resource_type, relevant)
+        self.db.commit()
+        latest = max(filter(None, [r.get('created_at') for r in resources]), default=None)
+        return len(relevant), latest
+
+    def refresh(self, folders, resource_types=('image', 'video'), full=False, workers=LIST_WORKERS,
+                full_every=FULL_REFRESH_EVERY):
+        """
+        Обновляет инвентарь
+        Тип ресурса без прошлой синхронизации, после full_every инкрементальных обновлений
+        (или при full=True) перечитывается полностью по папкам, остальные - инкрементально
+        (start_at, один список на тип; переименования и удаления так не видны). Все списки загружаются
+        параллельно пулом из workers потоков, а сохраняются в базу по очереди в исходном порядке.
+        Отметка синхронизации сохраняется только после успешного обновления всех списков типа,
+        поэтому прерванное (например, лимитом API) обновление повторится
+        Возвращает True, если все типы ресурсов обновлены
+        """
+        # (тип, папка или None для инкрементального списка, параметры запроса)
+        jobs = []
+        full_types = set()
+        for resource_type in resource_types:
+            if full or self.last_created_at(resource_type) is None:
+                full_types.add(resource_type)
+            elif full_every and self.incremental_runs(resource_type) >= full_every:
+                print(f"  {resource_type}: {full_every} incremental syncs since the last full one, "
+                      f"reloading all files to pick up renames and deletions")
+                full_types.add(resource_type)
+            if resource_type in full_types:
+                jobs += [(resource_type, folder, {'prefix': f'{folder}/'}) for folder in folders]
+            else:
+                jobs.append((resource_type, None, {'start_at': self.last_created_at(resource_type)}))
+
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as executor:
+            futures = [executor.submit(self._fetch_all, resource_type=resource_type, **params)
+                       for resource_type, _, params in jobs]
+            results = [future.result() for future in futures]
+
+        failed = {}
+        seen_latest = {}
+        for (resource_type, folder, _), (resources, error) in zip(jobs, results):
+            if folder is not None:
+                count = self.apply_full(folder, resource_type, resources, complete=error is None)
+                if error is None:
+                    print(f"  {folder}/{resource_type}: {count} files (full refresh)")
+            else:
+                changed, seen_latest[resource_type] = self.apply_since(resource_type, set(folders), resources)
+                if error is None:
+                    print(f"  {resource_type}: {changed} new or changed files since last sync")
+            if error is not None:
+                failed.setdefault(resource_type, error)
+
+        for resource_type in resource_types:
+            error = failed.get(resource_type)
+            if error is None:
+                self._save_state(resource_type, seen_latest.get(resource_type))
+                self._count_run(resource_type, resource_type in full_types)
+            elif isinstance(error, cloudinary.exceptions.RateLimited):
+                print(f"  API limit reached while loading {resource_type}: {error}")
+                print("  Using files stored so far; run again later to finish the sync.")
+            else:
+                print(f"  Error loading {resource_type}: {error}")
+        self.db.commit()
+        return not failed
+
+    def resources(self, folder, resource_type=None):
+        """
+        Ресурсы папки в порядке списка Admin API: от новых к старым по дате создания.
+        От порядка зависит, какой из файлов с одним номером выберет sync_cloudinary_names,
+        поэтому при одинаковой дате создания порядок задан явно - по public_id
+        """
+        query = 'SELECT * FROM resources WHERE folder = ?'
+        params = [folder]
+        if resource_type:
+            query += ' AND resource_type = ?'
+            params.append(resource_type)
+        query += ' ORDER BY resource_type, created_at DESC, public_id'
+        return [dict(row) for row in self.db.execute(query, params)]
+
+    def iter_resources(self, folders=None):
+        """Перебирает ресурсы (всех или только указанных папок) курсором, не загружая их в память"""
+        query = 'SELECT * FROM resources'
+        params = []
+        if folders is not None:
+            folders = list(folders)
+            query += f" WHERE folder IN ({', '.join('?' * len(folders))})"
+            params = folders
+        for row in self.db.execute(query, params):
+            yield dict(row)
@@ -0,0 +1,654 @@
+"""
+Параллельная загрузка файлов в Cloudinary
+Файлы отправляются пулом потоков (загрузка упирается в сеть, а не в процессор).
+Объем одновременно отправляемых данных ограничен, временные ошибки (сеть, 5xx,
+превышение лимита) повторяются с экспоненциальной задержкой и случайным разбросом.
+Во время работы выводится скорость в файлах/с и MB/с.
+Файлы больше LARGE_FILE_THRESHOLD (обычно видео) отправляются частями по CHUNK_SIZE байт
+через upload_large_part: в памяти держится одна часть, при ошибке повторяется только она.
+Манифест загрузок (.upload_manifest.json) хранит MD5 каждого загруженного файла и etag/bytes,
+которые вернул Cloudinary, поэтому повторная публикация отправляет только новые и измененные файлы
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import cloudinary.api
+import cloudinary.exceptions
+import cloudinary.uploader
+import cloudinary.utils
+
+from cloudinary_budget import NORMAL, api_call
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.webm')
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_INFLIGHT_BYTES = 256 * 1024 * 1024
+DEFAULT_RETRIES = 5
+
+# Файлы больше порога загружаются частями; Cloudinary требует части не меньше 5 MB
+LARGE_FILE_THRESHOLD = 20 * 1024 * 1024
+CHUNK_SIZE = 20 * 1024 * 1024
+MIN_CHUNK_SIZE = 5 * 1024 * 1024
+
+UPLOAD_MANIFEST_VERSION = 1
+DEFAULT_UPLOAD_MANIFEST_PATH = '.upload_manifest.json'
+DEFAULT_JOURNAL_PATH = '.upload_journal.jsonl'
+DEFAULT_INVALIDATION_QUEUE_PATH = '.cdn_invalidation_queue.json'
+
+# Как часто сохранять манифест во время загрузки (секунды): запись всего манифеста
+# после каждых N файлов на десятках тысяч файлов занимала больше времени, чем сама загрузка
+MANIFEST_SAVE_INTERVAL = 10.0
+
+# Задержка перед повтором: BASE_DELAY * 2^попытка, но не больше MAX_DELAY
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+
+# Как часто печатать промежуточную скорость (секунды)
+PROGRESS_INTERVAL = 10.0
+
+# Ошибки Cloudinary, которые не исчезнут при повторе (неверный запрос, нет прав и т.п.)
+PERMANENT_ERRORS = (
+    cloudinary.exceptions.BadRequest,
+    cloudinary.exceptions.NotFound,
+    cloudinary.exceptions.NotAllowed,
+    cloudinary.exceptions.AlreadyExists,
+    cloudinary.exceptions.AuthorizationRequired,
+)
+
+
+class UploadTask:
+    """Файл для загрузки: локальный путь, public_id, тип ресурса и размер"""
+
+    def __init__(self, path, public_id, resource_type, size):
+        self.path = Path(path)
+        self.public_id = public_id
+        self.resource_type = resource_type
+        self.size = size
+
+    def __repr__(self):
+        return f'UploadTask({self.public_id!r}, {self.resource_type}, {self.size})'
+
+
+def resource_type_for(path):
+    """Тип ресурса Cloudinary по расширению файла"""
+    return 'video' if Path(path).suffix.lower() in VIDEO_EXTENSIONS else 'image'
+
+
+def collect_tasks(folder_path, cloudinary_folder=''):
+    """
+    Собирает файлы папки (рекурсивно) в задания на загрузку
+    public_id - имя файла без расширения с учетом папки в Cloudinary ("images/250")
+    """
+    folder = Path(folder_path)
+    if not folder.exists():
+        return []
+    tasks = []
+    for file_path in sorted(folder.rglob('*')):
+        if not file_path.is_file():
+            continue
+        public_id = f'{cloudinary_folder}/{file_path.stem}' if cloudinary_folder else file_path.stem
+        tasks.append(UploadTask(file_path, public_id, resource_type_for(file_path), file_path.stat().st_size))
+    return tasks
+
+
+def file_md5(path):
+    """MD5 содержимого файла - Cloudinary возвращает его как etag загруженного ресурса"""
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def upload_record(task, result, md5=None):
+    """Запись об успешной загрузке: локальный файл (MD5, размер, mtime) и ответ Cloudinary"""
+    stat = task.path.stat()
+    return {
+        'md5': md5 or file_md5(task.path),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime_ns,
+        'etag': result.get('etag'),
+        'bytes': result.get('bytes'),
+        'version': result.get('version')
+    }
+
+
+class UploadManifest:
+    """
+    Что уже загружено в Cloudinary: "тип/public_id" -> MD5, размер и mtime локального файла
+    и etag/bytes/version из ответа Cloudinary
+    MD5 пересчитывается только при изменении размера или mtime файла
+    """
+
+    def __init__(self, path=DEFAULT_UPLOAD_MANIFEST_PATH):
+        self.path = path
+        self.resources = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=DEFAULT_UPLOAD_MANIFEST_PATH):
+        manifest = cls(path)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == UPLOAD_MANIFEST_VERSION:
+                    manifest.resources = data.get('resources', {})
+            except (OSError, ValueError) as e:
+                print(f"⚠ Не удалось прочитать манифест загрузок {path}: {e}")
+        return manifest
+
+    def save(self):
+        """Атомарно сохраняет манифест (прерванная запись не портит предыдущую версию)"""
+        with self.lock:
+            data = {'version': UPLOAD_MANIFEST_VERSION, 'resources': dict(self.resources)}
+        # Сериализация идет без блокировки, чтобы не задерживать потоки загрузки;
+        # json.dumps без отступов использует быстрый C-кодировщик
+        text = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(self.path + '.tmp', self.path)
+
+    @staticmethod
+    def key(task):
+        return f'{task.resource_type}/{task.public_id}'
+
+    def local_md5(self, task):
+        """MD5 файла задания (из манифеста, если размер и mtime не изменились)"""
+        stat = task.path.stat()
+        record = self.resources.get(self.key(task))
+        if record and record.get('size') == stat.st_size and record.get('mtime') == stat.st_mtime_ns:
+            return record['md5']
+        return file_md5(task.path)
+
+    def is_uploaded(self, task):
+        """Файл уже загружен и с тех пор не менялся"""
+        record = self.resources.get(self.key(task))
+        if not record or not record.get('etag'):
+            return False
+        md5 = self.local_md5(task)
+        if record.get('md5') != md5:
+            return False
+        # Размер и mtime могли измениться без изменения содержимого (копирование, checkout)
+        stat = task.path.stat()
+        record.update(size=stat.st_size, mtime=stat.st_mtime_ns)
+        return True
+
+    def record(self, task, result, md5=None):
+        """Запоминает успешную загрузку по ответу Cloudinary и возвращает запись"""
+        record = upload_record(task, result, md5)
+        with self.lock:
+            self.resources[self.key(task)] = record
+        return record
+
+    def reconcile_remote(self, tasks, remote):
+        """
+        Сверяет манифест с ресурсами в Cloudinary (remote: "тип/public_id" -> ресурс из Admin API)
+        Записи, которых нет в Cloudinary или у которых другой etag, удаляются (файл будет загружен);
+        файлы без записи, чей MD5 совпадает с etag в Cloudinary, отмечаются как загруженные
+        Возвращает (удалено записей, добавлено записей)
+        """
+        dropped = adopted = 0
+        for task in tasks:
+            key = self.key(task)
+            resource = remote.get(key)
+            record = self.resources.get(key)
+            if record and (not resource or resource.get('etag') != record.get('etag')):
+                del self.resources[key]
+                dropped += 1
+            elif not record and resource:
+                md5 = file_md5(task.path)
+                if resource.get('etag') == md5:
+                    self.record(task, resource, md5)
+                    adopted += 1
+        return dropped, adopted
+
+
+class UploadJournal:
+    """
+    Журнал текущего запуска загрузки (write-ahead log)
+    Каждая завершенная загрузка и каждая полностью загруженная папка дописываются
+    отдельной строкой JSON с fsync, поэтому после падения, Ctrl-C или исчерпания лимита
+    API журнал содержит все, что успело загрузиться. Незавершенная последняя строка
+    (запись прервана на середине) при чтении игнорируется.
+    После успешного завершения запуска журнал удаляется. Если запуск дошел до конца, но часть файлов
+    не загрузилась, журнал остается для --resume и заканчивается строкой end: по ней следующий
+    запуск отличает такой журнал от журнала прерванного запуска (finished)
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH):
+        self.path = path
+        self.done = {}
+        self.folders_done = set()
+        # Запуск дошел до конца (строка end); failed - сколько файлов не загрузилось
+        self.finished = False
+        self.failed = 0
+        self.file = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def read(path=DEFAULT_JOURNAL_PATH):
+        """Читает журнал прерванного запуска, если он есть"""
+        journal = UploadJournal(path)
+        if not os.path.exists(path):
+            return journal
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    break
+                if event.get('event') == 'done':
+                    journal.done[event['key']] = event['record']
+                elif event.get('event') == 'folder_done':
+                    journal.folders_done.add(event['folder'])
+                elif event.get('event') == 'end':
+                    journal.finished = True
+                    journal.failed = event.get('failed', 0)
+        return journal
+
+    @classmethod
+    def open(cls, path=DEFAULT_JOURNAL_PATH, resume=False):
+        """
+        Открывает журнал для записи
+        resume=True - продолжает журнал прерванного запуска, иначе начинает новый
+        """
+        journal = cls.read(path) if resume else cls(path)
+        # Журнал переписывается целиком: так отбрасывается возможная оборванная строка
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'event': 'start', 'time': time.time()}) + '\n')
+            for key, record in journal.done.items():
+                f.write(json.dumps({'event': 'done', 'key': key, 'record': record}) + '\n')
+            for folder in sorted(journal.folders_done):
+                f.write(json.dumps({'event': 'folder_done', 'folder': folder}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        journal.file = open(path, 'a', encoding='utf-8')
+        return journal
+
+    def _append(self, event):
+        with self.lock:
+            self.file.write(json.dumps(event, ensure_ascii=False) + '\n')
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def record(self, key, record):
+        """Записывает завершенную загрузку"""
+        self._append({'event': 'done', 'key': key, 'record': record})
+        self.done[key] = record
+
+    def folder_done(self, folder):
+        """Отмечает папку как полностью загруженную"""
+        self._append({'event': 'folder_done', 'folder': folder})
+        self.folders_done.add(folder)
+
+    def close(self, completed=False, failed=None):
+        """
+        Закрывает журнал; после успешного завершения запуска (completed) удаляет его
+        failed - запуск дошел до конца, но столько файлов не загрузилось: журнал остается
+        со строкой end. Без completed и failed (Ctrl-C, лимит API) запуск считается прерванным
+        """
+        if self.file:
+            if failed is not None and not completed:
+                self._append({'event': 'end', 'failed': failed, 'time': time.time()})
+                self.finished = True
+                self.failed = failed
+            self.file.close()
+            self.file = None
+        if completed and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class InvalidationQueue:
+    """
+    Отложенная инвалидация кэша CDN
+    Загрузка с invalidate=True сбрасывает кэш CDN на каждый файл и замедляет каждую загрузку,
+    хотя новому файлу сбрасывать нечего. Очередь запоминает только перезаписанные ресурсы
+    (Cloudinary возвращает overwritten=true) и сбрасывает их кэш в конце запуска (flush).
+    Группового сброса кэша в API Cloudinary нет (ни по папке, ни по тегу), поэтому flush
+    отправляет отдельный запрос explicit(invalidate=True) на каждый ресурс очереди - параллельно
+    и с повторами. Запросов столько же, сколько перезаписанных файлов: экономия только за счет
+    новых файлов и повторных перезаписей одного файла. Очередь сохраняется в файл, чтобы
+    прерванный запуск сбросил кэш при следующем
+    """
+
+    def __init__(self, path=DEFAULT_INVALIDATION_QUEUE_PATH, invalidate=None):
+        self.path = path
+        self.invalidate = invalidate or cloudinary.uploader.explicit
+        self.pending = set()
+        self.uploads = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=DEFAULT_INVALIDATION_QUEUE_PATH, invalidate=None):
+        queue = cls(path, invalidate)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    queue.pending = {tuple(key) for key in json.load(f).get('pending', [])}
+            except (OSError, ValueError) as e:
+                print(f"⚠ Не удалось прочитать очередь инвалидации {path}: {e}")
+        return queue
+
+    def save(self):
+        with self.lock:
+            pending = sorted(self.pending)
+        if not pending:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'pending': pending}, f, ensure_ascii=False)
+        os.replace(self.path + '.tmp', self.path)
+
+    def add(self, task, result):
+        """Учитывает успешную загрузку; перезаписанный ресурс ставится в очередь"""
+        with self.lock:
+            self.uploads += 1
+            if result and result.get('overwritten'):
+                self.pending.add((task.resource_type, task.public_id))
+
+    def flush(self, workers=DEFAULT_WORKERS, retries=DEFAULT_RETRIES):
+        """Сбрасывает кэш CDN для всех ресурсов очереди; возвращает (сброшено, ошибок)"""
+        with self.lock:
+            pending = sorted(self.pending)
+        if not pending:
+            return 0, 0
+
+        def purge(key):
+            resource_type, public_id = key
+            for attempt in range(retries + 1):
+                try:
+                    self.invalidate(public_id, type='upload', resource_type=resource_type, invalidate=True)
+                    return key, None
+                except Exception as e:
+                    if attempt == retries or not is_transient(e):
+                        return key, e
+                    time.sleep(backoff_delay(attempt))
+
+        print(f"🧹 Сброс кэша CDN для {len(pending)} перезаписанных файлов (запрос explicit на файл)...")
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for key, error in executor.map(purge, pending):
+                if error is None:
+                    done += 1
+                    with self.lock:
+                        self.pending.discard(key)
+                else:
+                    failed += 1
+                    print(f"  ✗ {key[1]}: {error}")
+        self.save()
+        return done, failed
+
+
+def list_remote_resources(folders, resource_types=('image', 'video'), priority=NORMAL):
+    """
+    Загружает список ресурсов Cloudinary в папках через Admin API (в рамках общего бюджета)
+    Возвращает карту: "тип/public_id" -> ресурс (etag, bytes, version, ...)
+    """
+    remote = {}
+    for folder in folders:
+        for resource_type in resource_types:
+            next_cursor = None
+            while True:
+                params = {'type': 'upload', 'prefix': f'{folder}/', 'resource_type': resource_type,
+                          'max_results': 500}
+                if next_cursor:
+                    params['next_cursor'] = next_cursor
+                result = api_call(cloudinary.api.resources, priority=priority, **params)
+                for resource in result.get('resources', []):
+                    remote[f"{resource_type}/{resource['public_id']}"] = resource
+                next_cursor = result.get('next_cursor')
+                if not next_cursor:
+                    break
+    return remote
+
+
+def is_transient(error):
+    """Проверяет, имеет ли смысл повторить запрос после ошибки"""
+    if isinstance(error, PERMANENT_ERRORS):
+        return False
+    # Сетевые ошибки и ответы 5xx/420 cloudinary оборачивает в Error, GeneralError и RateLimited
+    return isinstance(error, (cloudinary.exceptions.Error, OSError, TimeoutError))
+
+
+def backoff_delay(attempt, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+    """Экспоненциальная задержка с полным случайным разбросом (full jitter)"""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+class ByteBudget:
+    """
+    Ограничение объема данных, отправляемых одновременно
+    Файл больше лимита отправляется, когда других загрузок нет
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, size):
+        with self.condition:
+            while self.in_flight and self.in_flight + size > self.limit:
+                self.condition.wait()
+            self.in_flight += size
+
+    def release(self, size):
+        with self.condition:
+            self.in_flight -= size
+            self.condition.notify_all()
+
+
+class UploadStats:
+    """Счетчики загрузки и скорость (файлов/с, MB/с)"""
+
+    def __init__(self, total_files=0, total_bytes=0):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.files = 0
+        self.bytes = 0
+        self.failed = 0
+        self.skipped = 0
+        self.retries = 0
+        self.aborted = False
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add(self, size, ok):
+        with self.lock:
+            if ok:
+                self.files += 1
+                self.bytes += size
+            else:
+                self.failed += 1
+
+    def add_retry(self):
+        with self.lock:
+            self.retries += 1
+
+    def summary(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        skipped = f", без изменений: {self.skipped}" if self.skipped else ""
+        return (f"{self.files}/{self.total_files} файлов{skipped}, "
+                f"{self.bytes / 1024 / 1024:.1f}/{self.total_bytes / 1024 / 1024:.1f} MB за {elapsed:.1f} с "
+                f"({self.files / elapsed:.2f} файлов/с, {self.bytes / 1024 / 1024 / elapsed:.2f} MB/с)")
+
+
+class UploadEngine:
+    """
+    Загружает задания пулом из workers потоков
+    upload - функция загрузки одного файла (по умолчанию cloudinary.uploader.upload),
+    upload_options - общие параметры загрузки (overwrite, invalidate и т.п.),
+    manifest - UploadManifest: если задан, неизмененные файлы пропускаются,
+    а успешные загрузки записываются в него,
+    journal - UploadJournal: каждая успешная загрузка сразу записывается в журнал,
+    invalidations - InvalidationQueue: перезаписанные ресурсы ставятся в очередь сброса кэша CDN
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_inflight_bytes=DEFAULT_MAX_INFLIGHT_BYTES,
+                 retries=DEFAULT_RETRIES, upload=None, upload_options=None, manifest=None, journal=None,
+                 large_file_threshold=LARGE_FILE_THRESHOLD, chunk_size=CHUNK_SIZE, upload_part=None,
+                 invalidations=None):
+        self.workers = workers
+        self.budget = ByteBudget(max_inflight_bytes)
+        self.retries = retries
+        self.upload = upload or cloudinary.uploader.upload
+        self.upload_part = upload_part or cloudinary.uploader.upload_large_part
+        self.upload_options = upload_options or {}
+        self.manifest = manifest
+        self.journal = journal
+        self.invalidations = invalidations
+        self.large_file_threshold = large_file_threshold
+        self.chunk_size = max(chunk_size, MIN_CHUNK_SIZE)
+
+    def is_chunked(self, task):
+        return task.size > self.large_file_threshold
+
+    def inflight_cost(self, task):
+        """Сколько байт задание держит в памяти и в сети одновременно"""
+        return min(task.size, self.chunk_size) if self.is_chunked(task) else task.size
+
+    def call_with_retries(self, call, task, stats):
+        """Вызывает call() с повторами при временных ошибках; последняя ошибка пробрасывается"""
+        for attempt in range(self.retries + 1):
+            try:
+                return call()
+            except Exception as e:
+                if attempt == self.retries or not is_transient(e):
+                    raise
+                delay = backoff_delay(attempt)
+                stats.add_retry()
+                print(f"  ↻ {task.public_id}: {e} (повтор через {delay:.1f} с)")
+                time.sleep(delay)
+
+    def upload_chunked(self, task, stats):
+        """
+        Загружает большой файл частями с заголовками Content-Range и X-Unique-Upload-Id
+        При ошибке повторяется только текущая часть (с тем же X-Unique-Upload-Id)
+        """
+        upload_id = cloudinary.utils.random_public_id()
+        total_mb = task.size / 1024 / 1024
+        sent = 0
+        result = None
+        with open(task.path, 'rb') as f:
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                headers = {
+                    'Content-Range': f'bytes {sent}-{sent + len(chunk) - 1}/{task.size}',
+                    'X-Unique-Upload-Id': upload_id
+                }
+                result = self.call_with_retries(
+                    lambda: self.upload_part(
+                        (task.path.name, chunk),
+                        http_headers=headers,
+                        public_id=task.public_id,
+                        resource_type=task.resource_type,
+                        **self.upload_options
+                    ),
+                    task, stats
+                )
+                sent += len(chunk)
+                print(f"  ⇡ {task.public_id}: {sent / task.size:.0%} "
+                      f"({sent / 1024 / 1024:.1f}/{total_mb:.1f} MB)")
+        return result
+
+    def upload_one(self, task, stats):
+        """Загружает один файл (большие - частями) с повторами; возвращает (task, результат, ошибка)"""
+        try:
+            if self.is_chunked(task):
+                result = self.upload_chunked(task, stats)
+            else:
+                result = self.call_with_retries(
+                    lambda: self.upload(
+                        str(task.path),
+                        public_id=task.public_id,
+                        resource_type=task.resource_type,
+                        **self.upload_options
+                    ),
+                    task, stats
+                )
+        except Exception as e:
+            return task, None, e
+
+        if self.manifest is not None:
+            record = self.manifest.record(task, result)
+        elif self.journal is not None:
+            record = upload_record(task, result)
+        if self.journal is not None:
+            self.journal.record(UploadManifest.key(task), record)
+        return task, result, None
+
+    def run(self, tasks, on_result=None):
+        """
+        Загружает все задания и возвращает статистику
+        on_result(task, result, error) вызывается в основном потоке по мере завершения
+        """
+        tasks = list(tasks)
+        skipped = 0
+        if self.manifest is not None:
+            pending = [task for task in tasks if not self.manifest.is_uploaded(task)]
+            skipped = len(tasks) - len(pending)
+            tasks = pending
+        stats = UploadStats(len(tasks), sum(task.size for task in tasks))
+        stats.skipped = skipped
+        last_report = last_save = time.monotonic()
+
+        def work(task):
+            # Ждем, пока освободится место в лимите одновременно отправляемых байт
+            cost = self.inflight_cost(task)
+            self.budget.acquire(cost)
+            try:
+                return self.upload_one(task, stats)
+            finally:
+                self.budget.release(cost)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(work, task) for task in tasks]
+                try:
+                    for future in as_completed(futures):
+                        if future.cancelled():
+                            continue
+                        task, result, error = future.result()
+                        stats.add(task.size, error is None)
+                        if error is None and self.invalidations is not None:
+                            self.invalidations.add(task, result)
+                        if on_result:
+                            on_result(task, result, error)
+                        if isinstance(error, cloudinary.exceptions.RateLimited) and not stats.aborted:
+                            # Лимит не восстановился за все повторы: остальные загрузки тоже не пройдут
+                            print("  ⛔ Лимит запросов Cloudinary исчерпан, новые загрузки не начинаются")
+                            stats.aborted = True
+                            for pending in futures:
+                                pending.cancel()
+                        if time.monotonic() - last_save >= MANIFEST_SAVE_INTERVAL:
+                            self.save_state()
+                            last_save = time.monotonic()
+                        if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                            print(f"  … {stats.summary()}")
+                            last_report = time.monotonic()
+                except KeyboardInterrupt:
+                    # Не начинаем новые загрузки, дожидаемся только уже идущих
+                    for future in futures:
+                        future.cancel()
+                    raise
+        finally:
+            # Сохраняем после завершения всех потоков, чтобы не потерять их записи
+            self.save_state()
+        return stats
+
+    def save_state(self):
+        if self.manifest is not None:
+            self.manifest.save()
+        if self.invalidations is not None:
+            self.invalidations.save()
@@ -0,0 +1,192 @@
+"""
+Канонические URL доставки Cloudinary
+Все URL, которые скрипты пишут в portfolio_data.json, строятся через build_url: перед public_id
+добавляются трансформации доставки - автоматический формат (f_auto), автоматическое качество
+(q_auto), ограничение ширины thumbnail (c_limit,w_N) и кадр-постер для видео (so_N, .jpg).
+parse_url разбирает существующие URL, в том числе с задвоенным хостом
+(https://res.cloudinary.com/.../https://res.cloudinary.com/...), а normalize_url собирает их заново:
+прежние трансформации доставки (f_, q_, c_limit,w_N у thumbnail, so_ у постера) заменяются
+каноническими, поэтому повторный запуск их не накапливает. Остальные трансформации URL
+(обрезка, эффекты, w_N у основного файла) сохраняются в прежнем порядке перед трансформациями доставки.
+
+Настройки (.env):
+- CLOUDINARY_FORMAT - f_<значение>, по умолчанию auto; пусто - формат файла
+- CLOUDINARY_QUALITY - q_<значение>, по умолчанию auto (можно auto:eco, auto:best); пусто - без q_
+- CLOUDINARY_THUMBNAIL_WIDTH - максимальная ширина thumbnail, по умолчанию 400; 0 - без ограничения
+- CLOUDINARY_POSTER_OFFSET - секунда видео для постера, по умолчанию 0
+"""
+import os
+import re
+from collections import namedtuple
+
+from dotenv import load_dotenv
+
+from portfolio_rewrite import RewriteRule
+
+load_dotenv()
+
+IMAGE_URL = os.getenv('CLOUDINARY_IMAGE_URL', 'https://res.cloudinary.com/dwwyducge/image/upload/')
+VIDEO_URL = os.getenv('CLOUDINARY_VIDEO_URL', 'https://res.cloudinary.com/dwwyducge/video/upload/')
+
+# Назначение URL: основной файл, thumbnail галереи, постер видео
+MEDIA = 'media'
+THUMBNAIL = 'thumbnail'
+POSTER = 'poster'
+
+Delivery = namedtuple('Delivery', 'format quality thumbnail_width poster_offset')
+
+DEFAULT_DELIVERY = Delivery(
+    format=os.getenv('CLOUDINARY_FORMAT', 'auto'),
+    quality=os.getenv('CLOUDINARY_QUALITY', 'auto'),
+    thumbnail_width=int(os.getenv('CLOUDINARY_THUMBNAIL_WIDTH', '400') or 0),
+    poster_offset=os.getenv('CLOUDINARY_POSTER_OFFSET', '0')
+)
+
+HOST = 'cloudinary.com/'
+# <cloud>/<тип>/upload/[трансформации/][v123/]<public_id>[.расширение] - часть URL после хоста
+PATH_PATTERN = re.compile(r'^([^/]+)/(image|video|raw)/upload/(.+)$')
+# Параметры трансформаций Cloudinary (w_400, c_fill, e_grayscale, $var_...): по ним сегмент
+# трансформаций отличается от папки public_id вроде my_folder. Тот же список - в script.js
+TRANSFORMATION_PARAM = re.compile(r'^(?:a|ac|af|ar|b|bo|br|c|co|cs|d|dl|dn|dpr|du|e|eo|f|fl|fn|fps|g|h|if|'
+                                  r'ki|l|o|p|pg|q|r|so|sp|t|u|vc|vs|w|x|y|z|\$\w+)_[^/]*$')
+VERSION_SEGMENT = re.compile(r'^v\d+$')
+
+# doubled - хост был задвоен: такой URL не открывается, пока его не пересобрать
+CloudinaryUrl = namedtuple('CloudinaryUrl',
+                           'cloud_name resource_type transformations version public_id extension doubled')
+
+
+def is_transformation(segment):
+    """Сегмент пути целиком состоит из параметров трансформаций"""
+    return all(TRANSFORMATION_PARAM.match(component) for component in segment.split(','))
+
+
+def parse_url(url):
+    """Разбирает URL Cloudinary; для других строк возвращает None"""
+    if not isinstance(url, str) or not url.startswith('http'):
+        return None
+    # При задвоенном хосте значима часть после последнего вхождения
+    position = url.rfind(HOST)
+    if position < 0:
+        return None
+    match = PATH_PATTERN.match(url[position + len(HOST):])
+    if not match:
+        return None
+
+    segments = match.group(3).split('/')
+    transformations = []
+    version = None
+    # Трансформации (w_400,c_fill) и версия (v1712345) идут перед public_id
+    while len(segments) > 1:
+        if VERSION_SEGMENT.match(segments[0]):
+            version = segments.pop(0)
+        elif is_transformation(segments[0]):
+            transformations.append(segments.pop(0))
+        else:
+            break
+
+    public_id = '/'.join(segments)
+    extension = None
+    if '.' in segments[-1]:
+        public_id, extension = public_id.rsplit('.', 1)
+    return CloudinaryUrl(match.group(1), match.group(2), tuple(transformations), version,
+                         public_id, extension, url.count(HOST) > 1)
+
+
+def delivery_transformation(kind=MEDIA, delivery=DEFAULT_DELIVERY):
+    """Строка трансформаций для назначения URL, например c_limit,w_400,f_auto,q_auto"""
+    params = []
+    if kind == POSTER:
+        params.append(f'so_{delivery.poster_offset}')
+    if kind == THUMBNAIL and delivery.thumbnail_width:
+        params += ['c_limit', f'w_{delivery.thumbnail_width}']
+    if delivery.format:
+        params.append(f'f_{delivery.format}')
+    if delivery.quality:
+        params.append(f'q_{delivery.quality}')
+    return ','.join(params)
+
+
+def delivery_component(component, kind=MEDIA, segment=()):
+    """
+    Параметр трансформации задается доставкой для этого назначения URL
+    segment - все параметры сегмента: ширина thumbnail - это w_N только рядом с c_limit
+    """
+    if component.startswith(('f_', 'q_')):
+        return True
+    if kind == THUMBNAIL and 'c_limit' in segment:
+        return component == 'c_limit' or component.startswith('w_')
+    if kind == POSTER:
+        return component.startswith('so_')
+    return False
+
+
+def custom_transformations(transformations, kind=MEDIA):
+    """Трансформации URL без параметров доставки; опустевшие сегменты отбрасываются"""
+    kept = []
+    for segment in transformations:
+        components = segment.split(',')
+        components = [component for component in components
+                      if not delivery_component(component, kind, components)]
+        if components:
+            kept.append(','.join(components))
+    return tuple(kept)
+
+
+def build_url(public_id, resource_type='image', kind=MEDIA, delivery=DEFAULT_DELIVERY,
+              base_url=None, version=None, extension=None, transformations=()):
+    """
+    URL доставки для public_id
+    base_url - https://res.cloudinary.com/<cloud>/<тип>/upload/, по умолчанию из .env.
+    transformations - дополнительные сегменты трансформаций перед трансформациями доставки.
+    Постер - кадр видео, поэтому он всегда строится от видео и отдается как изображение (.jpg)
+    """
+    if kind == POSTER:
+        resource_type = 'video'
+        extension = 'jpg'
+    if base_url is None:
+        base_url = VIDEO_URL if resource_type == 'video' else IMAGE_URL
+    parts = [part for part in (*transformations, delivery_transformation(kind, delivery), version) if part]
+    parts.append(f'{public_id}.{extension}' if extension else public_id)
+    return base_url.rstrip('/') + '/' + '/'.join(parts)
+
+
+def normalize_url(url, kind=MEDIA, delivery=DEFAULT_DELIVERY):
+    """
+    Пересобирает URL Cloudinary канонически: один хост, трансформации доставки вместо прежних,
+    остальные трансформации сохраняются (custom_transformations)
+    Другие строки (локальные пути) возвращаются без изменений
+    """
+    parsed = parse_url(url)
+    if parsed is None:
+        return url
+    base_url = f'https://res.cloudinary.com/{parsed.cloud_name}/{parsed.resource_type}/upload/'
+    if kind == POSTER:
+        base_url = f'https://res.cloudinary.com/{parsed.cloud_name}/video/upload/'
+    return build_url(parsed.public_id, parsed.resource_type, kind, delivery, base_url,
+                     parsed.version, parsed.extension, custom_transformations(parsed.transformations, kind))
+
+
+def poster_url(video_url, delivery=DEFAULT_DELIVERY):
+    """Постер для URL видео Cloudinary или None"""
+    parsed = parse_url(video_url)
+    if parsed is None or parsed.resource_type != 'video':
+        return None
+    return normalize_url(video_url, POSTER, delivery)
+
+
+def delivery_urls(media, stats):
+    """Правило delivery-urls: канонические path и thumbnail, постер для видео"""
+    changes = {}
+    for field, kind in (('path', MEDIA), ('thumbnail', THUMBNAIL)):
+        if parse_url(media.get(field)):
+            changes[field] = normalize_url(media[field], kind)
+    if media.get('type') == 'video':
+        poster = poster_url(media.get('path'))
+        if poster:
+            changes['poster'] = poster
+    return changes
+
+
+DELIVERY_URLS_RULE = RewriteRule('delivery-urls', delivery_urls,
+                                 'f_auto/q_auto delivery URLs, width-capped thumbnails, video posters')
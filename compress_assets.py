@@ -0,0 +1,148 @@
+"""
+Предварительное сжатие статических файлов сайта для хостинга
+Рядом с каждым файлом создаются .gz и .br версии (brotli - если установлен пакет brotli)
+и выводится отчет о размерах до и после сжатия. Сжимаются и шарды portfolio_details/
+с полными данными работ, которые сайт загружает при открытии проекта.
+Без пакета brotli старые .br файлы удаляются: иначе сервер отдавал бы устаревшее содержимое
+"""
+import argparse
+import gzip
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from portfolio_artifacts import DETAILS_DIR, SHARD_NAME_RE
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Файлы, которые браузер загружает при открытии сайта
+ASSETS = [
+    'portfolio_data.json',
+    'portfolio_data.ndjson',  # при сборке с --format ndjson
+    'portfolio_index.json',
+    'portfolio_tags.json',
+    'shapes_coordinates.json',
+    'alisa1.csv',
+    'script.js',
+    'p5_3d_shapes.js',
+    'styles.css'
+]
+
+COMPRESSED_SUFFIXES = ('.gz', '.br')
+
+
+def shard_paths(details_dir=DETAILS_DIR):
+    """Шарды с полными данными работ (portfolio_details/<start>-<end>.json)"""
+    if not os.path.isdir(details_dir):
+        return []
+    return [os.path.join(details_dir, name) for name in sorted(os.listdir(details_dir))
+            if SHARD_NAME_RE.match(name)]
+
+
+def remove_stale(paths, details_dir=DETAILS_DIR, sources=ASSETS):
+    """
+    Удаляет сжатые версии, которые больше не соответствуют исходным файлам:
+    .br файлов из paths, если brotli не установлен, .gz/.br файлов из sources, которых больше нет
+    (например, portfolio_data.ndjson после перехода на json), и .gz/.br удаленных шардов.
+    Возвращает количество удаленных файлов
+    """
+    stale = [path + '.br' for path in paths if brotli is None and os.path.exists(path + '.br')]
+    stale += [path + suffix for path in sources for suffix in COMPRESSED_SUFFIXES
+              if not os.path.exists(path) and os.path.exists(path + suffix)]
+    if os.path.isdir(details_dir):
+        for name in os.listdir(details_dir):
+            source, suffix = os.path.splitext(name)
+            if (suffix in COMPRESSED_SUFFIXES and SHARD_NAME_RE.match(source)
+                    and not os.path.exists(os.path.join(details_dir, source))):
+                stale.append(os.path.join(details_dir, name))
+    for path in stale:
+        os.remove(path)
+    return len(stale)
+
+
+def compress_file(path):
+    """Создает .gz и .br версии файла и возвращает их размеры"""
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    # mtime=0 - одинаковый результат для одинакового содержимого
+    gz_data = gzip.compress(data, compresslevel=9, mtime=0)
+    with open(path + '.gz', 'wb') as f:
+        f.write(gz_data)
+
+    br_size = None
+    if brotli is not None:
+        br_data = brotli.compress(data, quality=11)
+        with open(path + '.br', 'wb') as f:
+            f.write(br_data)
+        br_size = len(br_data)
+
+    return path, len(data), len(gz_data), br_size
+
+
+def format_size(size):
+    return '-' if size is None else f'{size:,}'.replace(',', ' ')
+
+
+def print_report(results):
+    """Печатает отчет о размерах файлов до и после сжатия"""
+    print(f"\n{'Файл':<26} {'Исходный':>10} {'gzip':>10} {'brotli':>10} {'Экономия':>9}")
+    print("-" * 69)
+    total_raw = total_gz = total_br = 0
+    for path, raw, gz, br in results:
+        best = min(size for size in (gz, br) if size is not None)
+        saving = 100 * (1 - best / raw) if raw else 0
+        print(f"{path:<26} {format_size(raw):>10} {format_size(gz):>10} {format_size(br):>10} {saving:>8.1f}%")
+        total_raw += raw
+        total_gz += gz
+        total_br += br if br is not None else gz
+    print("-" * 69)
+    best_total = min(total_gz, total_br)
+    saving = 100 * (1 - best_total / total_raw) if total_raw else 0
+    print(f"{'Всего':<26} {format_size(total_raw):>10} {format_size(total_gz):>10} "
+          f"{format_size(total_br if brotli else None):>10} {saving:>8.1f}%")
+
+
+def summarize_shards(results, details_dir=DETAILS_DIR):
+    """Объединяет строки отчета для шардов в одну строку, чтобы отчет не растягивался на сотни строк"""
+    prefix = os.path.join(details_dir, '')
+    shards = [result for result in results if result[0].startswith(prefix)]
+    if not shards:
+        return results
+    total = (f"{details_dir}/*.json", sum(r[1] for r in shards), sum(r[2] for r in shards),
+             sum(r[3] for r in shards) if brotli is not None else None)
+    return [result for result in results if not result[0].startswith(prefix)] + [total]
+
+
+def compress_assets(paths=None, workers=None):
+    """Сжимает файлы (по умолчанию ASSETS и шарды portfolio_details/) параллельно и печатает отчет"""
+    paths = [path for path in (paths or ASSETS + shard_paths()) if os.path.exists(path)]
+    removed = remove_stale(paths)
+    if not paths:
+        print("Нет файлов для сжатия")
+        return []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(compress_file, paths))
+
+    print_report(summarize_shards(results))
+    if brotli is None:
+        print("\n⚠ Пакет brotli не установлен, созданы только .gz файлы (pip install brotli)")
+    if removed:
+        print(f"Удалено устаревших сжатых файлов: {removed}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Создание .gz и .br версий статических файлов')
+    parser.add_argument('paths', nargs='*',
+                        help=f"файлы для сжатия (по умолчанию: {', '.join(ASSETS)} и {DETAILS_DIR}/*.json)")
+    parser.add_argument('--workers', type=int, default=None, help='количество процессов (по умолчанию - все ядра)')
+    args = parser.parse_args()
+    compress_assets(args.paths, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+"""
+Локальный сервер, имитирующий Cloudinary, для проверки и бенчмарков без реального аккаунта
+Поддерживает то, чем пользуются скрипты проекта:
+  POST /v1_1/<cloud>/<тип>/upload   - загрузка (в том числе частями: Content-Range, X-Unique-Upload-Id)
+  POST /v1_1/<cloud>/<тип>/rename   - переименование (from_public_id -> to_public_id)
+  POST /v1_1/<cloud>/<тип>/destroy  - удаление одного файла
+  POST /v1_1/<cloud>/<тип>/explicit - обновление ресурса (сброс кэша CDN, invalidate=true)
+  GET  /v1_1/<cloud>/resources/<тип>[/upload] - список с prefix, start_at, max_results, next_cursor
+  DELETE /v1_1/<cloud>/resources/<тип>/upload  - удаление списка public_ids
+Ответы Admin API содержат заголовки X-FeatureRateLimit-*, а после исчерпания лимита
+сервер отвечает 420, как настоящий Cloudinary. Задержка ответа, доля ошибок 500
+и доля случайных ответов 420 настраиваются.
+Скрипты направляются на сервер переменными окружения (SDK читает upload_prefix
+из окружения, только если там же задан CLOUDINARY_CLOUD_NAME):
+  python fake_cloudinary.py --port 8899
+  CLOUDINARY_CLOUD_NAME=fake CLOUDINARY_API_KEY=fake CLOUDINARY_API_SECRET=fake \
+      CLOUDINARY_UPLOAD_PREFIX=http://127.0.0.1:8899 python upload_to_cloudinary.py
+Подписи запросов не проверяются, файлы хранятся только в памяти (размер и MD5)
+"""
+import argparse
+import email.parser
+import email.utils
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_ADMIN_LIMIT = 500
+ADMIN_RESET_PERIOD = 3600
+
+UPLOAD_PATH = re.compile(r'^/v1_1/[^/]+/(image|video|raw|auto)/(upload|rename|destroy|explicit)$')
+RESOURCES_PATH = re.compile(r'^/v1_1/[^/]+/resources/(image|video|raw)(?:/(\w+))?$')
+
+VIDEO_FORMATS = {'mp4', 'mov', 'avi', 'webm'}
+
+
+def parse_multipart(content_type, body):
+    """Разбирает multipart/form-data: возвращает поля (списки значений) и содержимое файла"""
+    message = email.parser.BytesParser().parsebytes(
+        f'Content-Type: {content_type}\r\n\r\n'.encode() + body)
+    fields = {}
+    file_data = file_name = None
+    for part in message.get_payload():
+        name = part.get_param('name', header='content-disposition')
+        data = part.get_payload(decode=True)
+        if name == 'file':
+            file_data = data
+            file_name = part.get_filename()
+        else:
+            fields.setdefault(name, []).append(data.decode('utf-8'))
+    return fields, file_data, file_name
+
+
+class FakeCloudinary:
+    """
+    Состояние поддельного аккаунта: ресурсы, незавершенные загрузки частями и лимит Admin API
+    latency - задержка каждого ответа (секунды), error_rate - доля ответов 500,
+    rate_limit_rate - доля случайных ответов 420, admin_limit - часовой лимит Admin API
+    """
+
+    def __init__(self, cloud_name='fake', latency=0.0, error_rate=0.0, rate_limit_rate=0.0,
+                 admin_limit=DEFAULT_ADMIN_LIMIT, seed=None):
+        self.cloud_name = cloud_name
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.admin_limit = admin_limit
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.resources = {}
+        self.partial_uploads = {}
+        self.admin_remaining = admin_limit
+        self.admin_reset_at = time.time() + ADMIN_RESET_PERIOD
+        # Время создания растет с каждым ресурсом, чтобы start_at работал предсказуемо
+        self.clock = int(time.time())
+        self.requests = {}
+        # Сколько раз сбрасывался кэш CDN (upload с invalidate=true и explicit)
+        self.invalidations = 0
+        # Номер версии набора ресурсов и кэш отсортированных списков для list_resources
+        self.generation = 0
+        self.listings = {}
+        self.listings_generation = 0
+
+    def count(self, action):
+        with self.lock:
+            self.requests[action] = self.requests.get(action, 0) + 1
+
+    def inject_failure(self):
+        """Возвращает (код, сообщение) случайной ошибки или None"""
+        with self.lock:
+            roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            return 420, 'Rate Limit Exceeded (injected)'
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500, 'Internal Server Error (injected)'
+        return None
+
+    def take_admin_call(self):
+        """Расходует один запрос Admin API; False, если лимит исчерпан"""
+        with self.lock:
+            now = time.time()
+            if now >= self.admin_reset_at:
+                self.admin_remaining = self.admin_limit
+                self.admin_reset_at = now + ADMIN_RESET_PERIOD
+            if self.admin_remaining <= 0:
+                return False
+            self.admin_remaining -= 1
+            return True
+
+    def admin_headers(self):
+        return {
+            'X-FeatureRateLimit-Limit': str(self.admin_limit),
+            'X-FeatureRateLimit-Remaining': str(self.admin_remaining),
+            'X-FeatureRateLimit-Reset': email.utils.formatdate(self.admin_reset_at, usegmt=True),
+        }
+
+    def _created_at(self):
+        self.clock += 1
+        return datetime.fromtimestamp(self.clock, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    def store(self, resource_type, public_id, data, file_name, overwrite=True, invalidate=False):
+        """Сохраняет загруженный файл и возвращает ответ upload"""
+        extension = (file_name or '').rsplit('.', 1)[-1].lower() if file_name and '.' in file_name else ''
+        if resource_type == 'auto':
+            resource_type = 'video' if extension in VIDEO_FORMATS else 'image'
+        if not public_id:
+            public_id = f'{hashlib.md5(data).hexdigest()[:20]}'
+        key = (resource_type, public_id)
+        with self.lock:
+            if invalidate:
+                self.invalidations += 1
+            existing = self.resources.get(key)
+            if existing and not overwrite:
+                return dict(existing, existing=True)
+            resource = {
+                'public_id': public_id,
+                'resource_type': resource_type,
+                'type': 'upload',
+                'format': extension,
+                'bytes': len(data),
+                'etag': hashlib.md5(data).hexdigest(),
+                'version': int(time.time()) + len(self.resources),
+                'created_at': existing['created_at'] if existing else self._created_at(),
+                'secure_url': f'https://res.cloudinary.com/{self.cloud_name}/{resource_type}/upload/{public_id}',
+            }
+            self.resources[key] = resource
+            self.generation += 1
+        return dict(resource, overwritten=True) if existing else dict(resource)
+
+    def upload_part(self, resource_type, fields, data, file_name, headers):
+        """Принимает часть большого файла; последняя часть создает ресурс"""
+        content_range = re.match(r'bytes (\d+)-(\d+)/(\d+)', headers.get('Content-Range', ''))
+        upload_id = headers.get('X-Unique-Upload-Id')
+        start, end, total = map(int, content_range.groups())
+        with self.lock:
+            parts = self.partial_uploads.setdefault(upload_id, {})
+            # Повтор той же части заменяет ее, а не дописывает
+            parts[start] = data
+            received = sum(len(part) for part in parts.values())
+        if end + 1 < total or received < total:
+            return {'done': False, 'bytes': received}
+        with self.lock:
+            parts = self.partial_uploads.pop(upload_id)
+        content = b''.join(parts[offset] for offset in sorted(parts))
+        return self.store(resource_type, fields.get('public_id', [None])[0], content, file_name,
+                          fields.get('overwrite', ['true'])[0] != 'false',
+                          fields.get('invalidate', [''])[0] in ('true', '1'))
+
+    def rename(self, resource_type, from_public_id, to_public_id, overwrite=False):
+        with self.lock:
+            resource = self.resources.get((resource_type, from_public_id))
+            if resource is None:
+                return 404, {'error': {'message': f'Resource not found - {from_public_id}'}}
+            if (resource_type, to_public_id) in self.resources and not overwrite:
+                return 400, {'error': {'message': f'Resource already exists - {to_public_id}'}}
+            del self.resources[(resource_type, from_public_id)]
+            resource = dict(resource, public_id=to_public_id)
+            self.resources[(resource_type, to_public_id)] = resource
+            self.generation += 1
+            return 200, dict(resource)
+
+    def explicit(self, resource_type, public_id, invalidate=False):
+        """Возвращает ресурс (или None); invalidate считается в счетчике invalidations"""
+        with self.lock:
+            resource = self.resources.get((resource_type, public_id))
+            if resource is not None and invalidate:
+                self.invalidations += 1
+        return dict(resource) if resource is not None else None
+
+    def destroy(self, resource_type, public_ids):
+        deleted = {}
+        with self.lock:
+            for public_id in public_ids:
+                found = self.resources.pop((resource_type, public_id), None)
+                deleted[public_id] = 'deleted' if found else 'not_found'
+            self.generation += 1
+        return deleted
+
+    def list_resources(self, resource_type, params):
+        """Список ресурсов в порядке убывания даты создания, страницами по max_results"""
+        prefix = params.get('prefix', [''])[0]
+        start_at = params.get('start_at', [None])[0]
+        max_results = min(int(params.get('max_results', ['10'])[0]), 500)
+        offset = int(params.get('next_cursor', ['0'])[0] or 0)
+        query = (resource_type, prefix, start_at)
+        with self.lock:
+            # Отсортированный список запоминается до следующего изменения ресурсов,
+            # иначе каждая страница заново перебирает весь аккаунт
+            if self.listings_generation != self.generation:
+                self.listings = {}
+                self.listings_generation = self.generation
+            matching = self.listings.get(query)
+            if matching is None:
+                matching = [r for (rt, public_id), r in self.resources.items()
+                            if rt == resource_type and public_id.startswith(prefix)
+                            and (not start_at or r['created_at'] >= start_at.replace(' ', 'T'))]
+                matching.sort(key=lambda r: (r['created_at'], r['public_id']), reverse=True)
+                self.listings[query] = matching
+            result = {'resources': [dict(r) for r in matching[offset:offset + max_results]]}
+        if offset + max_results < len(matching):
+            result['next_cursor'] = str(offset + max_results)
+        return result
+
+
+class FakeCloudinaryHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakeCloudinary/1.0'
+    # Заголовки и тело ответа уходят отдельными пакетами: без TCP_NODELAY каждый ответ
+    # ждет задержанного ACK (~40 мс), и сервер, а не клиент, становится узким местом
+    disable_nagle_algorithm = True
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def prepare(self, action, admin=False):
+        """Задержка, лимит и случайные ошибки; возвращает False, если ответ уже отправлен"""
+        self.state.count(action)
+        if self.state.latency:
+            time.sleep(self.state.latency * (0.5 + self.state.random.random()))
+        headers = self.state.admin_headers() if admin else {}
+        if admin and not self.state.take_admin_call():
+            self.send_json(420, {'error': {'message': 'Rate Limit Exceeded'}}, self.state.admin_headers())
+            return False
+        failure = self.state.inject_failure()
+        if failure:
+            status, message = failure
+            self.send_json(status, {'error': {'message': message}}, headers)
+            return False
+        return True
+
+    def do_POST(self):
+        match = UPLOAD_PATH.match(urlparse(self.path).path)
+        body = self.read_body()
+        if not match:
+            self.send_json(404, {'error': {'message': f'Unknown endpoint {self.path}'}})
+            return
+        resource_type, action = match.groups()
+        if not self.prepare(action):
+            return
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('multipart/form-data'):
+            fields, data, file_name = parse_multipart(content_type, body)
+        else:
+            fields, data, file_name = parse_qs(body.decode('utf-8')), None, None
+
+        def field(name, default=None):
+            return fields.get(name, [default])[0]
+
+        if action == 'upload':
+            if data is None:
+                self.send_json(400, {'error': {'message': 'Missing required parameter - file'}})
+            elif self.headers.get('Content-Range'):
+                self.send_json(200, self.state.upload_part(resource_type, fields, data, file_name, self.headers))
+            else:
+                self.send_json(200, self.state.store(resource_type, field('public_id'), data, file_name,
+                                                     field('overwrite', 'true') != 'false',
+                                                     field('invalidate') in ('true', '1')))
+        elif action == 'rename':
+            status, payload = self.state.rename(resource_type, field('from_public_id'), field('to_public_id'),
+                                                field('overwrite') in ('true', '1'))
+            self.send_json(status, payload)
+        elif action == 'explicit':
+            resource = self.state.explicit(resource_type, field('public_id'), field('invalidate') in ('true', '1'))
+            if resource is None:
+                self.send_json(404, {'error': {'message': f"Resource not found - {field('public_id')}"}})
+            else:
+                self.send_json(200, resource)
+        else:
+            deleted = self.state.destroy(resource_type, [field('public_id')])
+            self.send_json(200, {'result': 'ok' if 'deleted' in deleted.values() else 'not found'})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        match = RESOURCES_PATH.match(url.path)
+        if not match:
+            self.send_json(404, {'error': {'message': f'Unknown endpoint {self.path}'}})
+            return
+        if not self.prepare('resources', admin=True):
+            return
+        result = self.state.list_resources(match.group(1), parse_qs(url.query))
+        self.send_json(200, result, self.state.admin_headers())
+
+    def do_DELETE(self):
+        url = urlparse(self.path)
+        match = RESOURCES_PATH.match(url.path)
+        body = self.read_body()
+        if not match:
+            self.send_json(404, {'error': {'message': f'Unknown endpoint {self.path}'}})
+            return
+        if not self.prepare('delete_resources', admin=True):
+            return
+        # Новые версии SDK передают параметры в JSON-теле, старые - в строке запроса
+        params = parse_qs(url.query)
+        public_ids = params.get('public_ids[]', []) + params.get('public_ids', [])
+        if body and self.headers.get('Content-Type', '').startswith('application/json'):
+            public_ids += json.loads(body.decode('utf-8')).get('public_ids', [])
+        self.send_json(200, {'deleted': self.state.destroy(match.group(1), public_ids)},
+                       self.state.admin_headers())
+
+
+class FakeCloudinaryServer:
+    """ThreadingHTTPServer с FakeCloudinary в фоновом потоке"""
+
+    def __init__(self, host='127.0.0.1', port=0, verbose=False, **options):
+        self.state = FakeCloudinary(**options)
+        self.httpd = ThreadingHTTPServer((host, port), FakeCloudinaryHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = self.state
+        self.httpd.verbose = verbose
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def configure(self):
+        """Направляет cloudinary SDK текущего процесса на этот сервер"""
+        import cloudinary
+        cloudinary.config(cloud_name=self.state.cloud_name, api_key='fake-key', api_secret='fake-secret',
+                          upload_prefix=self.url)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Локальный сервер, имитирующий Cloudinary')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8899)
+    parser.add_argument('--latency', type=float, default=0.0, help='средняя задержка ответа, секунды')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='доля ответов 500 (0..1)')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='доля случайных ответов 420 (0..1)')
+    parser.add_argument('--admin-limit', type=int, default=DEFAULT_ADMIN_LIMIT,
+                        help='часовой лимит запросов Admin API')
+    parser.add_argument('--seed', type=int, default=None, help='зерно для случайных ошибок')
+    parser.add_argument('--verbose', action='store_true', help='печатать каждый запрос')
+    args = parser.parse_args()
+
+    server = FakeCloudinaryServer(args.host, args.port, verbose=args.verbose, latency=args.latency,
+                                  error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                                  admin_limit=args.admin_limit, seed=args.seed)
+    print(f"Поддельный Cloudinary: {server.url}")
+    print(f"Запуск скриптов: CLOUDINARY_CLOUD_NAME=fake CLOUDINARY_API_KEY=fake CLOUDINARY_API_SECRET=fake "
+          f"CLOUDINARY_UPLOAD_PREFIX={server.url} python upload_to_cloudinary.py")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"\nЗапросов: {server.state.requests}, ресурсов: {len(server.state.resources)}, "
+              f"сбросов кэша CDN: {server.state.invalidations}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 """
 Исправляет дублирование URL в thumbnail полях
+Правило thumbnail-hosts движка portfolio_rewrite.py
 """
-import json
-import re
+from cloudinary_urls import THUMBNAIL, normalize_url, parse_url
+from portfolio_rewrite import RewriteRule, rewrite_portfolio
 
 def fix_thumbnail_url(thumbnail):
     """Исправляет дублирование Cloudinary URL"""
@@ -15,6 +16,10 @@ def fix_thumbnail_url(thumbnail):
     
     # Проверяем на дублирование cloudinary.com
     if thumbnail.count('cloudinary.com') > 1:
+        # После последнего хоста полный путь <cloud>/<тип>/upload/... - URL пересобирается канонически,
+        # прежние трансформации заменяются, а не накапливаются
+        if parse_url(thumbnail):
+            return normalize_url(thumbnail, THUMBNAIL)
         # Находим последнее вхождение cloudinary.com
         parts = thumbnail.split('cloudinary.com')
         if len(parts) > 2:
@@ -50,38 +55,21 @@ def fix_thumbnail_url(thumbnail):
     
     return thumbnail
 
+def thumbnail_hosts(media, stats):
+    """Правило: thumbnail без дублирования cloudinary.com"""
+    if 'thumbnail' not in media:
+        return {}
+    return {'thumbnail': fix_thumbnail_url(media['thumbnail'])}
+
+THUMBNAIL_HOSTS_RULE = RewriteRule('thumbnail-hosts', thumbnail_hosts, 'repair doubled Cloudinary hosts in thumbnails')
+
 def fix_all_thumbnails():
     """Исправляет все thumbnail в portfolio_data.json"""
-    if not os.path.exists('portfolio_data.json'):
-        print("ERROR: portfolio_data.json not found!")
+    engine = rewrite_portfolio([THUMBNAIL_HOSTS_RULE])
+    if engine is None:
         return
     
-    print("Reading portfolio_data.json...")
-    with open('portfolio_data.json', 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    fixed_count = 0
-    
-    for item in data:
-        if 'media' not in item or 'thumbnail' not in item['media']:
-            continue
-        
-        original_thumbnail = item['media']['thumbnail']
-        fixed_thumbnail = fix_thumbnail_url(original_thumbnail)
-        
-        if fixed_thumbnail != original_thumbnail:
-            item['media']['thumbnail'] = fixed_thumbnail
-            fixed_count += 1
-            print(f"Fixed: {original_thumbnail[:80]}... -> {fixed_thumbnail[:80]}...")
-    
-    # Сохраняем
-    print(f"\nSaving fixed portfolio_data.json...")
-    with open('portfolio_data.json', 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    
-    print(f"SUCCESS! Fixed {fixed_count} thumbnail URLs")
+    print(f"SUCCESS! Fixed {len(engine.changes)} thumbnail URLs")
 
 if __name__ == "__main__":
-    import os
     fix_all_thumbnails()
-
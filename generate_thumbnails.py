@@ -0,0 +1,213 @@
+"""
+Генерация thumbnails для работ без иконки в icons/
+Без иконки галерея загружает оригинал из images/ (а для видео - весь ролик).
+Для каждого номера без иконки создается icons/<номер>.jpg: уменьшенное изображение
+или кадр-постер видео. Обработка идет параллельно на всех ядрах.
+Сгенерированные иконки запоминаются в манифесте вместе с хэшем исходника,
+поэтому повторный запуск пропускает неизмененные файлы, а иконки, сделанные
+вручную, никогда не перезаписываются
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+from build_manifest import hash_file
+from media_index import MediaIndex
+
+THUMBNAILS_VERSION = 1
+DEFAULT_MANIFEST_PATH = '.thumbnail_manifest.json'
+
+# Максимальная сторона иконки (в галерее иконки до 120px, запас для экранов с высокой плотностью)
+THUMBNAIL_SIZE = 400
+JPEG_QUALITY = 85
+
+# С какой секунды брать кадр-постер видео (первый кадр часто черный)
+POSTER_OFFSET = 1.0
+
+
+def _pillow_thumbnail(source, target, size):
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return False
+    try:
+        with Image.open(source) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((size, size), Image.LANCZOS)
+            image.convert('RGB').save(target, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+def _ffmpeg_thumbnail(source, target, size, offset=None):
+    if not shutil.which('ffmpeg'):
+        return False
+    # Уменьшаем, сохраняя пропорции; маленькие исходники не увеличиваем
+    scale = (f"scale='min({size},iw)':'min({size},ih)'"
+             f":force_original_aspect_ratio=decrease")
+    command = ['ffmpeg', '-v', 'error', '-y']
+    if offset:
+        command += ['-ss', str(offset)]
+    command += ['-i', source, '-frames:v', '1', '-vf', scale, '-q:v', '3', target]
+    try:
+        subprocess.run(command, capture_output=True, timeout=120, check=True)
+    except subprocess.SubprocessError:
+        return False
+    return os.path.exists(target) and os.path.getsize(target) > 0
+
+
+def make_thumbnail(task):
+    """
+    Создает одну иконку. task - (номер, исходный файл, файл иконки, тип, размер)
+    Возвращает (номер, True/False)
+    """
+    number, source, target, media_type, size = task
+    if media_type == 'video':
+        # Ролик короче POSTER_OFFSET - берем первый кадр
+        ok = (_ffmpeg_thumbnail(source, target, size, POSTER_OFFSET) or
+              _ffmpeg_thumbnail(source, target, size))
+    else:
+        ok = _pillow_thumbnail(source, target, size) or _ffmpeg_thumbnail(source, target, size)
+    if not ok and os.path.exists(target):
+        os.remove(target)
+    return number, ok
+
+
+class ThumbnailManifest:
+    """Сгенерированные иконки: номер -> исходный файл, его размер, mtime, sha256 и имя иконки"""
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH):
+        self.path = path
+        self.icons = {}
+
+    @classmethod
+    def load(cls, path=DEFAULT_MANIFEST_PATH):
+        manifest = cls(path)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == THUMBNAILS_VERSION:
+                    manifest.icons = data.get('icons', {})
+            except (OSError, ValueError) as e:
+                print(f"⚠ Не удалось прочитать манифест thumbnails {path}: {e}")
+        return manifest
+
+    def save(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'version': THUMBNAILS_VERSION, 'icons': self.icons},
+                      f, ensure_ascii=False, indent=2)
+
+
+def plan_thumbnails(images_dir, icons_dir, manifest, media_index, size=THUMBNAIL_SIZE):
+    """
+    Возвращает задания для make_thumbnail (номера без иконки и номера, у которых
+    изменился исходник сгенерированной иконки) и записи об их исходниках по номеру
+    """
+    icon_files = {}
+    for entry in media_index.entries(icons_dir):
+        if entry['number'] is not None:
+            icon_files.setdefault(entry['number'], []).append(entry['filename'])
+
+    tasks = []
+    for number, entry in sorted(media_index.by_number(images_dir).items()):
+        key = str(number)
+        record = manifest.icons.get(key)
+        generated = record['icon'] if record else None
+        existing = icon_files.get(number, [])
+
+        # Иконка, сделанная вручную, важнее сгенерированной
+        manual = [name for name in existing if name != generated]
+        if manual:
+            if generated in existing:
+                os.remove(os.path.join(icons_dir, generated))
+                print(f"  Удалена сгенерированная иконка {generated}: есть {manual[0]}")
+            manifest.icons.pop(key, None)
+            continue
+
+        # Размер и mtime берутся с диска: индекс папки не замечает перезаписи файла
+        source = os.path.join(images_dir, entry['filename'])
+        stat = os.stat(source)
+        if generated in existing and record['source'] == entry['filename']:
+            if record['size'] == stat.st_size and record['mtime'] == stat.st_mtime_ns:
+                continue
+            if hash_file(source) == record['sha256']:
+                record.update(size=stat.st_size, mtime=stat.st_mtime_ns)
+                continue
+
+        tasks.append((number, dict(entry, size=stat.st_size, mtime=stat.st_mtime_ns)))
+
+    return [
+        (number, os.path.join(images_dir, entry['filename']),
+         os.path.join(icons_dir, f'{number}.jpg'), entry['type'], size)
+        for number, entry in tasks
+    ], {number: entry for number, entry in tasks}
+
+
+def generate_thumbnails(images_dir='images', icons_dir='icons', workers=None, size=THUMBNAIL_SIZE,
+                        manifest_path=DEFAULT_MANIFEST_PATH, media_index=None):
+    """Создает недостающие и устаревшие иконки, возвращает количество созданных"""
+    if media_index is None:
+        media_index = MediaIndex.load()
+    manifest = ThumbnailManifest.load(manifest_path)
+    os.makedirs(icons_dir, exist_ok=True)
+
+    tasks, sources = plan_thumbnails(images_dir, icons_dir, manifest, media_index, size)
+    if not tasks:
+        manifest.save()
+        media_index.save()
+        print("Thumbnails: все иконки актуальны")
+        return 0
+
+    print(f"Создание {len(tasks)} thumbnails...")
+    if len(tasks) == 1:
+        results = [make_thumbnail(tasks[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(make_thumbnail, tasks))
+
+    created = 0
+    failed = []
+    for number, ok in results:
+        entry = sources[number]
+        if not ok:
+            failed.append(entry['filename'])
+            continue
+        manifest.icons[str(number)] = {
+            'source': entry['filename'],
+            'size': entry['size'],
+            'mtime': entry['mtime'],
+            'sha256': hash_file(os.path.join(images_dir, entry['filename'])),
+            'icon': f'{number}.jpg'
+        }
+        created += 1
+
+    manifest.save()
+    # Список файлов icons/ изменился - индекс пересканирует папку по ее mtime
+    media_index.entries(icons_dir)
+    media_index.save()
+
+    print(f"Thumbnails: создано {created} из {len(tasks)}")
+    if failed:
+        print(f"⚠ Не удалось создать {len(failed)} thumbnails: {', '.join(failed[:10])}"
+              f"{' ...' if len(failed) > 10 else ''}")
+        print("  Для изображений нужен Pillow (pip install Pillow), для видео - ffmpeg")
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Генерация thumbnails для работ без иконки')
+    parser.add_argument('--images', default='images', help='папка с медиафайлами')
+    parser.add_argument('--icons', default='icons', help='папка с иконками')
+    parser.add_argument('--size', type=int, default=THUMBNAIL_SIZE, help='максимальная сторона иконки')
+    parser.add_argument('--workers', type=int, default=None, help='количество процессов (по умолчанию - все ядра)')
+    args = parser.parse_args()
+    generate_thumbnails(args.images, args.icons, args.workers, args.size)
+
+
+if __name__ == "__main__":
+    main()
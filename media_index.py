@@ -0,0 +1,110 @@
+"""
+Индекс медиафайлов для папок images/ и icons/
+Сканирует папку за один проход os.scandir, запоминает расширение, тип, размер и mtime
+каждого файла и кэширует результат на диске. Кэш папки сбрасывается при изменении
+mtime самой папки (файл добавлен, удален или переименован)
+"""
+import json
+import os
+import re
+
+INDEX_VERSION = 1
+DEFAULT_CACHE_PATH = '.media_index.json'
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov')
+
+# Номер медиафайла - первое число в имени файла ("12.png", "12_final.mp4")
+NUMBER_RE = re.compile(r'(\d+)')
+
+
+def scan_directory(directory):
+    """Сканирует папку одним проходом и возвращает список записей о файлах"""
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if not entry.is_file():
+                continue
+            match = NUMBER_RE.search(entry.name)
+            extension = os.path.splitext(entry.name)[1].lower()
+            stat = entry.stat()
+            entries.append({
+                'filename': entry.name,
+                'number': int(match.group(1)) if match else None,
+                'extension': extension,
+                'type': 'video' if extension in VIDEO_EXTENSIONS else 'image',
+                'size': stat.st_size,
+                'mtime': stat.st_mtime_ns
+            })
+    entries.sort(key=lambda e: e['filename'])
+    return entries
+
+
+class MediaIndex:
+    """Кэш сканирования папок с медиафайлами"""
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH):
+        self.cache_path = cache_path
+        self.directories = {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, cache_path=DEFAULT_CACHE_PATH):
+        """Загружает индекс с диска (пустой, если кэша нет или он другой версии)"""
+        index = cls(cache_path)
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == INDEX_VERSION:
+                    index.directories = data.get('directories', {})
+            except (OSError, ValueError) as e:
+                print(f"⚠ Не удалось прочитать индекс медиафайлов {cache_path}: {e}")
+        return index
+
+    def save(self):
+        """Сохраняет индекс на диск, если он изменился"""
+        if not self.cache_path or not self.dirty:
+            return
+        with open(self.cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'directories': self.directories},
+                      f, ensure_ascii=False, separators=(',', ':'))
+        self.dirty = False
+
+    def entries(self, directory):
+        """
+        Возвращает записи о файлах папки
+        Папка пересканируется только если изменился ее mtime
+        """
+        directory = str(directory)
+        if not os.path.isdir(directory):
+            return []
+        key = os.path.abspath(directory)
+        mtime = os.stat(directory).st_mtime_ns
+        cached = self.directories.get(key)
+        if cached and cached['mtime'] == mtime:
+            return cached['entries']
+        entries = scan_directory(directory)
+        self.directories[key] = {'mtime': mtime, 'entries': entries}
+        self.dirty = True
+        return entries
+
+    def by_number(self, directory):
+        """
+        Возвращает карту: номер -> запись о файле
+        При нескольких файлах с одним номером (12.png и 12.mp4) выбирается первый
+        по имени, а о конфликте выводится предупреждение
+        """
+        numbered = {}
+        collisions = {}
+        for entry in self.entries(directory):
+            number = entry['number']
+            if number is None:
+                continue
+            if number in numbered:
+                collisions.setdefault(number, [numbered[number]['filename']]).append(entry['filename'])
+                continue
+            numbered[number] = entry
+        for number, filenames in sorted(collisions.items()):
+            print(f"⚠ Несколько файлов с номером {number} в {directory}: {', '.join(filenames)} "
+                  f"(используется {filenames[0]})")
+        return numbered
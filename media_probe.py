@@ -0,0 +1,374 @@
+"""
+Извлечение метаданных медиафайлов: ширина, высота, размер в байтах и длительность видео
+Заголовки PNG, JPEG, GIF, WebP, HEIC и MP4/MOV разбираются без сторонних библиотек;
+для остальных форматов используется Pillow или ffprobe, если они установлены.
+Размеры даются в том виде, в котором файл показывается: поворот из матрицы tkhd видео,
+EXIF Orientation у JPEG и irot у HEIC меняют местами ширину и высоту (портретные снимки с телефона).
+Результаты кэшируются по хэшу содержимого файла, поэтому повторный запуск ничего не читает
+"""
+import argparse
+import json
+import os
+import shutil
+import struct
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+from build_manifest import hash_file
+from media_index import VIDEO_EXTENSIONS
+
+PROBE_VERSION = 2
+DEFAULT_CACHE_PATH = '.media_probe_cache.json'
+MEDIA_DIRS = ['images', 'icons', 'alisa']
+
+# Сколько байт начала файла читать для поиска размеров изображения
+HEADER_SIZE = 256 * 1024
+
+# Контейнеры ISO BMFF, внутри которых ищутся mvhd и tkhd
+MP4_CONTAINERS = {b'moov', b'trak', b'mdia', b'edts'}
+
+# Значения EXIF Orientation, при которых изображение показывается повернутым на 90 или 270 градусов
+EXIF_ORIENTATION_TAG = 0x0112
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def _png_size(data):
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and data[12:16] == b'IHDR':
+        return struct.unpack('>II', data[16:24])
+    return None
+
+
+def _gif_size(data):
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return struct.unpack('<HH', data[6:10])
+    return None
+
+
+def _exif_orientation(exif):
+    """Orientation из блока EXIF (TIFF-заголовок и IFD0) или None"""
+    if exif[:2] == b'II':
+        order = '<'
+    elif exif[:2] == b'MM':
+        order = '>'
+    else:
+        return None
+    ifd = struct.unpack(order + 'I', exif[4:8])[0]
+    count = struct.unpack(order + 'H', exif[ifd:ifd + 2])[0]
+    for entry in range(ifd + 2, ifd + 2 + count * 12, 12):
+        tag = struct.unpack(order + 'H', exif[entry:entry + 2])[0]
+        if tag == EXIF_ORIENTATION_TAG:
+            return struct.unpack(order + 'H', exif[entry + 8:entry + 10])[0]
+    return None
+
+
+def _jpeg_size(data):
+    if data[:2] != b'\xff\xd8':
+        return None
+    orientation = None
+    pos = 2
+    while pos + 9 < len(data):
+        if data[pos] != 0xFF:
+            pos += 1
+            continue
+        marker = data[pos + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+            pos += 1 if marker == 0xFF else 2
+            continue
+        length = struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        # APP1 с EXIF идет до SOF
+        if marker == 0xE1 and data[pos + 4:pos + 10] == b'Exif\x00\x00' and orientation is None:
+            try:
+                orientation = _exif_orientation(data[pos + 10:pos + 2 + length])
+            except struct.error:
+                # Поврежденный EXIF не мешает прочитать размеры
+                orientation = None
+        # SOF0-SOF15, кроме DHT (C4), JPG (C8) и DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>HH', data[pos + 5:pos + 9])
+            if orientation in ROTATED_ORIENTATIONS:
+                return height, width
+            return width, height
+        pos += 2 + length
+    return None
+
+
+def _webp_size(data):
+    if data[:4] != b'RIFF' or data[8:12] != b'WEBP':
+        return None
+    chunk = data[12:16]
+    if chunk == b'VP8 ' and len(data) >= 30:
+        width, height = struct.unpack('<HH', data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L' and len(data) >= 25:
+        bits = int.from_bytes(data[21:25], 'little')
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X' and len(data) >= 30:
+        return int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+    return None
+
+
+def _heic_size(data):
+    # Свойство ispe хранит размеры изображений; основное изображение - самое большое
+    sizes = []
+    pos = data.find(b'ispe')
+    while pos != -1 and pos + 16 <= len(data):
+        sizes.append(struct.unpack('>II', data[pos + 8:pos + 16]))
+        pos = data.find(b'ispe', pos + 4)
+    if not sizes:
+        return None
+    width, height = max(sizes, key=lambda s: s[0] * s[1])
+    # irot: поворот против часовой стрелки на angle * 90 градусов
+    pos = data.find(b'irot')
+    if pos != -1 and pos + 4 < len(data) and data[pos + 4] & 0x03 in (1, 3):
+        return height, width
+    return width, height
+
+
+def _iter_boxes(f, start, end):
+    """Перебирает боксы ISO BMFF (MP4/MOV) в диапазоне [start, end)"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size:
+            return
+        yield box_type, pos + header_size, pos + size
+        pos += size
+
+
+def _mp4_info(path):
+    """Возвращает (ширина, высота, длительность) из боксов mvhd и tkhd"""
+    width = height = duration = None
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        stack = [(0, file_size)]
+        while stack:
+            start, end = stack.pop()
+            for box_type, body, box_end in _iter_boxes(f, start, end):
+                if box_type in MP4_CONTAINERS:
+                    stack.append((body, box_end))
+                elif box_type == b'mvhd':
+                    f.seek(body)
+                    version = f.read(1)[0]
+                    f.read(3)
+                    if version == 1:
+                        _, _, timescale, length = struct.unpack('>QQIQ', f.read(28))
+                    else:
+                        _, _, timescale, length = struct.unpack('>IIII', f.read(16))
+                    if timescale:
+                        duration = round(length / timescale, 3)
+                elif box_type == b'tkhd':
+                    # Последние 44 байта tkhd: матрица 3x3 (a, b, u, c, d, v, x, y, w),
+                    # затем ширина и высота в формате 16.16
+                    f.seek(box_end - 44)
+                    matrix = struct.unpack('>9i', f.read(36))
+                    track_width, track_height = struct.unpack('>II', f.read(8))
+                    if track_width and track_height and not width:
+                        width, height = track_width >> 16, track_height >> 16
+                        # Поворот на 90 или 270 градусов: a = d = 0 (телефоны пишут так портретное видео)
+                        if matrix[0] == 0 and matrix[4] == 0 and matrix[1] and matrix[3]:
+                            width, height = height, width
+    return width, height, duration
+
+
+def _pillow_size(path):
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            if image.getexif().get(EXIF_ORIENTATION_TAG) in ROTATED_ORIENTATIONS:
+                return height, width
+            return width, height
+    except Exception:
+        return None
+
+
+def _ffprobe_info(path):
+    if not shutil.which('ffprobe'):
+        return None
+    try:
+        output = subprocess.run(
+            ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+             '-show_entries', 'stream=width,height:stream_tags=rotate:stream_side_data=rotation:format=duration',
+             '-of', 'json', path],
+            capture_output=True, text=True, timeout=60, check=True
+        ).stdout
+        info = json.loads(output)
+    except (subprocess.SubprocessError, ValueError):
+        return None
+    stream = (info.get('streams') or [{}])[0]
+    duration = info.get('format', {}).get('duration')
+    width, height = stream.get('width'), stream.get('height')
+    # Поворот: тег rotate (старые версии ffprobe) или side data Display Matrix
+    rotation = stream.get('tags', {}).get('rotate')
+    for side_data in stream.get('side_data_list', []):
+        rotation = side_data.get('rotation', rotation)
+    try:
+        if rotation is not None and abs(int(float(rotation))) % 180 == 90:
+            width, height = height, width
+    except ValueError:
+        pass
+    return width, height, round(float(duration), 3) if duration else None
+
+
+def probe_file(path):
+    """Возвращает метаданные файла: width, height, bytes и duration (для видео)"""
+    path = str(path)
+    info = {'width': None, 'height': None, 'bytes': os.path.getsize(path)}
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension in VIDEO_EXTENSIONS:
+        try:
+            width, height, duration = _mp4_info(path)
+        except (OSError, struct.error, IndexError):
+            width = height = duration = None
+        if not (width and duration):
+            width, height, duration = _ffprobe_info(path) or (width, height, duration)
+        info.update(width=width, height=height, duration=duration)
+        return info
+
+    with open(path, 'rb') as f:
+        data = f.read(HEADER_SIZE)
+    size = None
+    for parser in (_png_size, _jpeg_size, _gif_size, _webp_size):
+        try:
+            size = parser(data)
+        except struct.error:
+            size = None
+        if size:
+            break
+    if not size and extension in ('.heic', '.heif', '.avif'):
+        size = _heic_size(data)
+    if not size:
+        size = _pillow_size(path)
+    if size:
+        info['width'], info['height'] = size
+    return info
+
+
+def probe_file_safe(path):
+    """
+    probe_file, который не выбрасывает исключений: возвращает (метаданные, None)
+    или (None, текст ошибки), чтобы один нечитаемый файл не прерывал всю сборку
+    """
+    try:
+        return probe_file(path), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+class MediaProbeCache:
+    """
+    Кэш метаданных: sha256 файла -> результат probe_file
+    Для файлов также запоминаются размер и mtime, чтобы не пересчитывать хэш без изменений
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        self.files = {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path=DEFAULT_CACHE_PATH):
+        cache = cls(path)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == PROBE_VERSION:
+                    cache.entries = data.get('entries', {})
+                    cache.files = data.get('files', {})
+            except (OSError, ValueError) as e:
+                print(f"⚠ Не удалось прочитать кэш метаданных {path}: {e}")
+        return cache
+
+    def save(self):
+        if not self.dirty:
+            return
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'version': PROBE_VERSION, 'entries': self.entries, 'files': self.files},
+                      f, separators=(',', ':'))
+        self.dirty = False
+
+    def file_hash(self, path):
+        """Хэш файла; пересчитывается только при изменении размера или mtime"""
+        key = str(path).replace('\\', '/')
+        stat = os.stat(path)
+        cached = self.files.get(key)
+        if cached and cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime_ns:
+            return cached['sha256']
+        sha = hash_file(path)
+        self.files[key] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha256': sha}
+        self.dirty = True
+        return sha
+
+    def probe(self, files, workers=None):
+        """
+        Возвращает метаданные для списка (путь, sha256)
+        Файлы, которых нет в кэше, обрабатываются параллельно в пуле процессов.
+        Для файлов, которые не удалось прочитать, размеры неизвестны (None); такие результаты
+        не кэшируются, поэтому следующий запуск попробует прочитать файл снова
+        """
+        failed = {}
+        missing = {}
+        for path, sha in files:
+            if sha not in self.entries and sha not in missing:
+                missing[sha] = str(path)
+
+        if missing:
+            print(f"Извлечение метаданных из {len(missing)} файлов...")
+            shas = list(missing)
+            if len(shas) == 1:
+                results = [probe_file_safe(missing[shas[0]])]
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(probe_file_safe, [missing[sha] for sha in shas], chunksize=8))
+            for sha, (info, error) in zip(shas, results):
+                if error is None:
+                    self.entries[sha] = info
+                    self.dirty = True
+                else:
+                    print(f"⚠ Не удалось прочитать метаданные {missing[sha]}: {error}")
+                    failed[sha] = {'width': None, 'height': None, 'bytes': None}
+
+        return {sha: self.entries[sha] if sha in self.entries else failed[sha] for _, sha in files}
+
+
+def main():
+    """Извлекает метаданные всех файлов из images/, icons/ и alisa/ в кэш"""
+    parser = argparse.ArgumentParser(description='Извлечение метаданных медиафайлов')
+    parser.add_argument('--workers', type=int, default=None, help='количество процессов')
+    args = parser.parse_args()
+
+    cache = MediaProbeCache.load()
+    files = []
+    for folder in MEDIA_DIRS:
+        if not os.path.isdir(folder):
+            continue
+        for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+            if entry.is_file():
+                files.append((entry.path, cache.file_hash(entry.path)))
+
+    results = cache.probe(files, args.workers)
+    cache.save()
+
+    videos = sum(1 for path, _ in files if os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS)
+    unknown = sum(1 for info in results.values() if not info.get('width'))
+    print(f"Метаданные: {len(files)} файлов, из них видео: {videos}, без размеров: {unknown}")
+
+
+if __name__ == "__main__":
+    main()
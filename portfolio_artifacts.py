@@ -0,0 +1,162 @@
+"""
+Артефакты портфолио для сайта
+Помимо полного portfolio_data.json пишутся:
+- portfolio_index.json - компактный индекс для первого экрана (id, тип медиа, thumbnail, название, теги)
+- portfolio_details/<start>-<end>.json - полные данные работ по диапазонам id,
+  которые script.js загружает только при открытии проекта
+- portfolio_tags.json - обратный индекс тегов (теги, id работ по тегу, количество)
+"""
+import json
+import os
+import re
+
+from portfolio_tags import TAG_INDEX_PATH, build_tag_index, item_tags
+from portfolio_writer import DEFAULT_FORMAT, read_portfolio, write_portfolio
+
+INDEX_VERSION = 1
+INDEX_PATH = 'portfolio_index.json'
+DETAILS_DIR = 'portfolio_details'
+SHARD_SIZE = 50
+
+SHARD_NAME_RE = re.compile(r'^\d+-\d+\.json$')
+
+
+def shard_range(item_id, shard_size=SHARD_SIZE):
+    """Возвращает диапазон id (start, end) шарда, в который попадает элемент"""
+    start = (item_id - 1) // shard_size * shard_size + 1
+    return start, start + shard_size - 1
+
+
+def index_entry(item):
+    """Компактная запись индекса: только то, что нужно для отрисовки галереи и тегов"""
+    media = item.get('media', {})
+    entry_media = {
+        'filename': media.get('filename', ''),
+        'type': media.get('type', 'image'),
+        'thumbnail': media.get('thumbnail') or media.get('path', '')
+    }
+    # Размеры позволяют резервировать место в галерее до загрузки thumbnail
+    if media.get('width') and media.get('height'):
+        entry_media['width'] = media['width']
+        entry_media['height'] = media['height']
+    if media.get('thumbnail_width') and media.get('thumbnail_height'):
+        entry_media['thumbnail_width'] = media['thumbnail_width']
+        entry_media['thumbnail_height'] = media['thumbnail_height']
+    if media.get('thumbnail_srcset'):
+        entry_media['thumbnail_srcset'] = media['thumbnail_srcset']
+    return {
+        'id': item['id'],
+        'media': entry_media,
+        'title': item.get('title', ''),
+        'tags': item_tags(item)
+    }
+
+
+def _write_json(data, path):
+    """Атомарно записывает минифицированный JSON"""
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(path + '.tmp', path)
+
+
+class SplitWriter:
+    """
+    Разбивает поток элементов на индекс и шарды с полными данными
+    Элементы приходят по возрастанию id, поэтому в памяти держится только текущий шард
+    """
+
+    def __init__(self, index_path=INDEX_PATH, details_dir=DETAILS_DIR, shard_size=SHARD_SIZE,
+                 tags_path=TAG_INDEX_PATH):
+        self.index_path = index_path
+        self.details_dir = details_dir
+        self.tags_path = tags_path
+        self.shard_size = shard_size
+        self.entries = []
+        self.shard = None
+        self.shard_items = []
+        self.written = set()
+
+    def _shard_path(self, shard):
+        return os.path.join(self.details_dir, f'{shard[0]}-{shard[1]}.json')
+
+    def _flush(self):
+        if self.shard is None:
+            return
+        os.makedirs(self.details_dir, exist_ok=True)
+        path = self._shard_path(self.shard)
+        if self.shard in self.written:
+            # Элементы пришли не по порядку: дописываем уже записанный шард
+            self.shard_items = read_portfolio(path) + self.shard_items
+            self.shard_items.sort(key=lambda item: item['id'])
+        write_portfolio(self.shard_items, path)
+        self.written.add(self.shard)
+        self.shard = None
+        self.shard_items = []
+
+    def add(self, item):
+        """Добавляет элемент в индекс и в его шард"""
+        shard = shard_range(item['id'], self.shard_size)
+        if shard != self.shard:
+            self._flush()
+            self.shard = shard
+        self.shard_items.append(item)
+        self.entries.append(index_entry(item))
+
+    def close(self):
+        """Дописывает последний шард, индекс, индекс тегов и удаляет шарды, которых больше нет"""
+        self._flush()
+        os.makedirs(self.details_dir, exist_ok=True)
+        current = {os.path.basename(self._shard_path(shard)) for shard in self.written}
+        for name in os.listdir(self.details_dir):
+            if SHARD_NAME_RE.match(name) and name not in current:
+                os.remove(os.path.join(self.details_dir, name))
+
+        tag_index = build_tag_index((entry['id'], entry['tags']) for entry in self.entries)
+        _write_json(tag_index, self.tags_path)
+
+        index = {
+            'version': INDEX_VERSION,
+            'shard_size': self.shard_size,
+            'details_dir': self.details_dir.replace('\\', '/'),
+            # Ревизия в URL индекса тегов сбрасывает кэш браузера при изменении тегов
+            'tags_path': os.path.basename(self.tags_path),
+            'tags_revision': tag_index['revision'],
+            'items': self.entries
+        }
+        _write_json(index, self.index_path)
+
+
+def write_artifacts(items, output_path='portfolio_data.json', fmt=DEFAULT_FORMAT,
+                    index_path=INDEX_PATH, details_dir=DETAILS_DIR):
+    """
+    Записывает полный файл портфолио и, в том же проходе, индекс с шардами
+    Возвращает количество элементов
+    """
+    splitter = SplitWriter(index_path, details_dir)
+
+    def tee():
+        for item in items:
+            splitter.add(item)
+            yield item
+
+    count = write_portfolio(tee(), output_path, fmt)
+    splitter.close()
+    return count
+
+
+def main():
+    """Пересобирает индекс и шарды из существующего portfolio_data.json"""
+    # portfolio_store сам использует write_artifacts, поэтому импортируется здесь
+    from portfolio_store import PortfolioStore
+
+    splitter = SplitWriter()
+    count = 0
+    for item in PortfolioStore.load():
+        splitter.add(item)
+        count += 1
+    splitter.close()
+    print(f"Индекс {INDEX_PATH}, {TAG_INDEX_PATH} и шарды в {DETAILS_DIR}/ созданы для {count} элементов")
+
+
+if __name__ == "__main__":
+    main()
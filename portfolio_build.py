@@ -0,0 +1,306 @@
+"""
+Общая логика сборки portfolio_data.json из Excel таблицы и папок с медиафайлами
+Используется в process_data.py и prepare_for_hosting.py
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from build_manifest import BuildManifest, DEFAULT_MANIFEST_PATH, hash_text, row_hashes
+from media_index import MediaIndex
+from media_probe import MediaProbeCache
+from portfolio_store import PortfolioStore
+from renditions import RENDITIONS_DIR
+
+# Сколько строк таблицы преобразуется за один пакет
+TRANSFORM_BATCH_SIZE = 10_000
+
+# Версия структуры элемента: входит в ключ инкрементальной сборки,
+# поэтому при добавлении новых полей все элементы пересобираются
+ITEM_FORMAT_VERSION = 3
+
+def scan_media_files(images_dir, media_index):
+    """Возвращает карту: номер -> информация о медиафайле из папки images"""
+    return {
+        number: {
+            'filename': entry['filename'],
+            'type': entry['type'],
+            'extension': entry['extension']
+        }
+        for number, entry in media_index.by_number(images_dir).items()
+    }
+
+
+def scan_thumbnails(icons_dir, media_index):
+    """Возвращает карту: номер -> имя файла thumbnail из папки icons"""
+    return {number: entry['filename'] for number, entry in media_index.by_number(icons_dir).items()}
+
+
+def local_media_url(filename, media_type):
+    """URL медиафайла для локальной разработки"""
+    return f'images/{filename}'
+
+
+def local_thumbnail_url(thumbnail_path):
+    """URL thumbnail для локальной разработки"""
+    return thumbnail_path
+
+
+def local_rendition_url(file):
+    """URL адаптивной версии изображения для локальной разработки"""
+    return f'{RENDITIONS_DIR}/{file}'
+
+
+def rendition_list(renditions, get_rendition_url):
+    """Список версий для элемента: URL, ширина, высота и MIME тип"""
+    return [
+        {'url': get_rendition_url(r['file']), 'width': r['width'], 'height': r['height'], 'type': r['type']}
+        for r in renditions
+    ]
+
+
+def transform_rows(df, positions):
+    """
+    Преобразует строки таблицы в тексты элементов портфолио
+    Возвращает список (additional, title, description) для строк с позициями positions
+
+    Обработка идет по колонкам целиком: pd.notna, str().strip() и длины текстов
+    считаются для всей колонки сразу, а выбор title/description (самый короткий
+    и самый длинный текст, как при сортировке по длине) - через argmin/argmax
+    по матрице длин. В цикле по строкам остается только сборка словарей
+    """
+    # Общий тип колонок, как у df.iterrows(): если все колонки числовые, целые приводятся к float
+    # ('1.0', а не '1'), поэтому массив не переводится в object заранее
+    values = df.iloc[np.asarray(positions, dtype=np.int64)].to_numpy()
+    n_rows, n_cols = values.shape
+    if n_rows == 0 or n_cols == 0:
+        return [({}, '', '') for _ in range(n_rows)]
+
+    # Очищенные тексты и их длины по колонкам (пустая строка = нет значения)
+    texts = np.full((n_rows, n_cols), '', dtype=object)
+    lengths = np.zeros((n_rows, n_cols), dtype=np.int64)
+    for col_idx in range(n_cols):
+        column = values[:, col_idx]
+        present = np.flatnonzero(pd.notna(column))
+        present_values = column[present]
+        if present_values.dtype.kind in 'mM':
+            # iterrows отдает даты как Timestamp/Timedelta, а не numpy datetime64
+            present_values = pd.array(present_values)
+        stripped = [str(value).strip() for value in present_values]
+        texts[present, col_idx] = stripped
+        lengths[present, col_idx] = [len(text) for text in stripped]
+
+    valid = lengths > 0
+    counts = valid.sum(axis=1)
+    rows = np.arange(n_rows)
+
+    # Самый короткий текст (первый из равных) - название,
+    # самый длинный (последний из равных) - описание, как у стабильной сортировки по длине
+    title_col = np.where(valid, lengths, np.iinfo(np.int64).max).argmin(axis=1)
+    desc_col = n_cols - 1 - np.where(valid, lengths, -1)[:, ::-1].argmax(axis=1)
+    titles = texts[rows, title_col]
+    descriptions = texts[rows, desc_col]
+
+    # Если название и описание одинаковые, название берется из первой колонки
+    use_first_col = (counts > 0) & (titles == descriptions) & valid[:, 0]
+
+    col_keys = [f'col_{col_idx}' for col_idx in range(n_cols)]
+    results = []
+    for row_texts, title, description, first_col, count in zip(
+            texts.tolist(), titles.tolist(), descriptions.tolist(),
+            use_first_col.tolist(), counts.tolist()):
+        additional = {key: text for key, text in zip(col_keys, row_texts) if text}
+        if count:
+            row_values = list(additional.values())
+            if first_col:
+                title = row_values[0]
+                # Остальные колонки как описание
+                if count > 1:
+                    description = '\n\n'.join(row_values[1:])
+            # Если описание слишком короткое, объединяем все тексты
+            if len(description) < 50 and count > 1:
+                description = '\n\n'.join([t for t in row_values if t != title])
+        results.append((additional, title, description))
+    return results
+
+
+def load_existing_items(output_path):
+    """Загружает ранее собранные элементы по id (для инкрементальной сборки)"""
+    if not os.path.exists(output_path):
+        return {}
+    try:
+        return PortfolioStore.load(output_path).by_id
+    except (OSError, ValueError) as e:
+        print(f"⚠ Не удалось прочитать {output_path}, выполняется полная сборка: {e}")
+        return {}
+
+
+class PortfolioBuild:
+    """
+    Результат build_portfolio: элементы (перебираются один раз, по мере сборки) и манифест сборки
+    Манифест сохраняется через save_manifest() только после успешной записи выходного файла:
+    если запись не удалась, следующая инкрементальная сборка не должна считать элементы актуальными
+    """
+
+    def __init__(self, items, manifest):
+        self._items = items
+        self.manifest = manifest
+        self.complete = False
+
+    def __iter__(self):
+        yield from self._items
+        self.complete = True
+
+    def save_manifest(self):
+        """Сохраняет манифест, если все элементы были собраны"""
+        if not self.complete:
+            print("⚠ Сборка не завершена, манифест не сохранен")
+            return
+        self.manifest.save()
+
+
+def build_portfolio(df, images_dir, icons_dir,
+                    get_media_url=local_media_url, get_thumbnail_url=local_thumbnail_url,
+                    get_poster_url=None, settings='', incremental=False,
+                    output_path='portfolio_data.json', manifest_path=DEFAULT_MANIFEST_PATH,
+                    media_index=None, renditions=None, get_rendition_url=local_rendition_url):
+    """
+    Собирает элементы портфолио по одному (для потоковой записи), возвращает PortfolioBuild
+
+    В инкрементальном режиме элемент пересобирается только если изменились
+    строка таблицы, медиафайл, thumbnail или настройки URL (settings).
+    Остальные элементы берутся из существующего output_path.
+    Манифест обновляется при каждой сборке, чтобы следующая могла быть инкрементальной;
+    вызывающий код сохраняет его (save_manifest) после записи output_path.
+    Списки файлов берутся из общего кэшированного индекса медиафайлов (media_index).
+    renditions - карта из renditions.load_renditions(): если для изображения или
+    thumbnail есть адаптивные версии, они записываются в media.srcset и media.thumbnail_srcset.
+    get_poster_url(url видео) - постер видео для media.poster (None - без постера)
+    Размеры медиафайла пишутся в media.width/height, размеры thumbnail (иконки из icons/ или
+    самого медиафайла) - в media.thumbnail_width/thumbnail_height
+    """
+    output_path = str(output_path)
+    # Хэши файлов из прошлого манифеста нужны и полной сборке: без них она заново читает все медиафайлы
+    manifest = BuildManifest.load(manifest_path, output_path, items=incremental)
+    items = _build_items(df, images_dir, icons_dir, get_media_url, get_thumbnail_url, get_poster_url,
+                         settings, incremental, output_path, manifest, media_index, renditions,
+                         get_rendition_url)
+    return PortfolioBuild(items, manifest)
+
+
+def _build_items(df, images_dir, icons_dir, get_media_url, get_thumbnail_url, get_poster_url,
+                 settings, incremental, output_path, manifest, media_index, renditions, get_rendition_url):
+    """Генератор элементов для build_portfolio"""
+    if media_index is None:
+        media_index = MediaIndex.load()
+    media_files = scan_media_files(images_dir, media_index)
+    thumbnails = scan_thumbnails(icons_dir, media_index)
+    media_index.save()
+
+    existing = load_existing_items(output_path) if incremental else {}
+    settings_hash = hash_text(settings)
+    renditions = renditions or {}
+    hashes = row_hashes(df)
+
+    # Строки таблицы: idx=0 соответствует медиафайлу "1.png", поэтому row_num = idx + 1
+    entries = []
+    for idx in range(len(df)):
+        row_num = idx + 1
+
+        # Получаем медиафайл для этой строки
+        media_info = media_files.get(row_num)
+        if not media_info:
+            continue
+
+        media_sha = manifest.file_hash(
+            os.path.join(images_dir, media_info['filename']),
+            key=f'images/{media_info["filename"]}'
+        )
+
+        # Определяем путь к thumbnail
+        if row_num in thumbnails:
+            thumbnail_path = f'icons/{thumbnails[row_num]}'
+            thumb_sha = manifest.file_hash(os.path.join(icons_dir, thumbnails[row_num]), key=thumbnail_path)
+        else:
+            # Если нет thumbnail, используем оригинальный файл (fallback)
+            thumbnail_path = f'images/{media_info["filename"]}'
+            thumb_sha = ''
+
+        # Список версий входит в ключ: новые версии пересобирают элемент
+        media_key = f'images/{media_info["filename"]}'
+        renditions_hash = hash_text(json.dumps([renditions.get(media_key), renditions.get(thumbnail_path)]))
+        input_key = hash_text('|'.join([
+            str(ITEM_FORMAT_VERSION), hashes[idx], media_info['filename'], media_sha,
+            thumbnail_path, thumb_sha, settings_hash, renditions_hash
+        ]))
+        manifest.record(row_num, hashes[idx], input_key)
+
+        fresh = incremental and row_num in existing and manifest.is_fresh(row_num, input_key)
+        entries.append((idx, media_info, media_sha, thumbnail_path, thumb_sha, fresh))
+
+    # Размеры и длительность медиафайлов и размеры иконок (кэшируются по хэшу файла)
+    probe_cache = MediaProbeCache.load()
+    probe_files = []
+    for idx, media_info, media_sha, _, thumb_sha, fresh in entries:
+        if fresh:
+            continue
+        probe_files.append((os.path.join(images_dir, media_info['filename']), media_sha))
+        if thumb_sha:
+            probe_files.append((os.path.join(icons_dir, thumbnails[idx + 1]), thumb_sha))
+    media_meta = probe_cache.probe(probe_files)
+    probe_cache.save()
+
+    # Тексты пересобираемых строк считаются пакетами, элементы отдаются по одному
+    rebuilt = 0
+    for start in range(0, len(entries), TRANSFORM_BATCH_SIZE):
+        batch = entries[start:start + TRANSFORM_BATCH_SIZE]
+        rebuild_positions = [idx for idx, _, _, _, _, fresh in batch if not fresh]
+        transformed = iter(transform_rows(df, rebuild_positions))
+        rebuilt += len(rebuild_positions)
+
+        for idx, media_info, media_sha, thumbnail_path, thumb_sha, fresh in batch:
+            row_num = idx + 1
+            if fresh:
+                yield existing[row_num]
+                continue
+            additional, title, description = next(transformed)
+            media = {
+                'filename': media_info['filename'],
+                'type': media_info['type'],
+                'path': get_media_url(media_info['filename'], media_info['type']),  # Полный файл
+                'thumbnail': get_thumbnail_url(thumbnail_path)  # Thumbnail для галереи
+            }
+            if media_info['type'] == 'video' and get_poster_url:
+                poster = get_poster_url(media['path'])
+                if poster:
+                    media['poster'] = poster
+            # Размеры нужны сайту, чтобы резервировать место до загрузки файла
+            meta = media_meta[media_sha]
+            media['width'] = meta['width']
+            media['height'] = meta['height']
+            media['bytes'] = meta['bytes']
+            if media_info['type'] == 'video':
+                media['duration'] = meta.get('duration')
+            # Галерея показывает thumbnail: его пропорции нужны, чтобы резервировать место под иконку
+            # (без иконки в icons/ thumbnail - сам медиафайл)
+            thumbnail_meta = media_meta[thumb_sha] if thumb_sha else meta
+            media['thumbnail_width'] = thumbnail_meta['width']
+            media['thumbnail_height'] = thumbnail_meta['height']
+            media_renditions = renditions.get(f'images/{media_info["filename"]}')
+            if media_renditions:
+                media['srcset'] = rendition_list(media_renditions, get_rendition_url)
+            thumbnail_renditions = renditions.get(thumbnail_path)
+            if thumbnail_renditions:
+                media['thumbnail_srcset'] = rendition_list(thumbnail_renditions, get_rendition_url)
+            yield {
+                'id': row_num,
+                'media': media,
+                'title': title,
+                'description': description,
+                'additional': additional
+            }
+
+    if incremental:
+        print(f"Инкрементальная сборка: пересобрано {rebuilt} из {len(entries)} элементов")
@@ -0,0 +1,209 @@
+"""
+Переписывание URL медиа в portfolio_data.json за один проход
+Раньше update_cloudinary_paths.py, fix_cloudinary_paths.py, fix_thumbnail_urls.py и
+sync_cloudinary_names.py каждый читали весь файл, меняли media.path/media.thumbnail и
+записывали его заново. Теперь их логика - правила (RewriteRule), которые движок применяет
+по порядку к media каждой работы: одно чтение и одна атомарная запись (PortfolioStore).
+Движок считает срабатывания каждого правила, проверяет идемпотентность (повторный прогон
+цепочки по результату ничего не меняет) и в режиме --dry-run показывает diff без записи
+"""
+import argparse
+import os
+import sys
+from collections import Counter
+
+from portfolio_store import DEFAULT_PATH, PortfolioSchemaError, PortfolioStore
+
+# Правила в каноническом порядке; synced-names обращается к Admin API и включается только явно
+RULE_NAMES = ('cloudinary-paths', 'public-ids', 'thumbnail-hosts', 'synced-names', 'delivery-urls')
+# cloudinary-paths не входит в цепочку по умолчанию: public-ids перезаписывает те же path и thumbnail
+DEFAULT_RULES = ('public-ids', 'thumbnail-hosts', 'delivery-urls')
+
+# Сколько изменений показывать при записи (в --dry-run показываются все)
+SAMPLE_CHANGES = 5
+
+
+class RewriteRule:
+    """
+    Правило переписывания media
+    rewrite(media, stats) возвращает {поле: новое значение} для полей, которые правило хочет
+    установить, и не меняет media. В stats (Counter правила) можно считать свои события,
+    например не найденные в Cloudinary файлы
+    """
+
+    def __init__(self, name, rewrite, description=''):
+        self.name = name
+        self.rewrite = rewrite
+        self.description = description
+
+
+class RewriteEngine:
+    """Применяет цепочку правил к media работ и собирает изменения и счетчики"""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        # Счетчики основного прохода: rewritten - сколько полей правило изменило по сравнению
+        # с исходным media (поле засчитывается последнему правилу, которое его установило)
+        self.stats = {rule.name: Counter() for rule in self.rules}
+        # Правила, которые что-то изменили при повторном прогоне по результату
+        self.unstable_rules = Counter()
+        self.changes = []
+        self.unstable = []
+        self.items = 0
+
+    def apply(self, media, stats):
+        """
+        Возвращает новый media после всех правил по порядку
+        Промежуточные значения, которые следующее правило заменило или вернуло к исходному,
+        не засчитываются: иначе на уже каноническом файле правила отчитывались бы о сотнях правок
+        """
+        result = dict(media)
+        setters = {}
+        for rule in self.rules:
+            for field, value in (rule.rewrite(result, stats[rule.name]) or {}).items():
+                if value is not None and result.get(field) != value:
+                    result[field] = value
+                    setters[field] = rule.name
+        for field, name in setters.items():
+            if media.get(field) != result[field]:
+                stats[name]['rewritten'] += 1
+        return result
+
+    def run(self, items):
+        """
+        Переписывает media всех работ на месте
+        Изменения - (id, поле, было, стало); неидемпотентные - то же для повторного прогона
+        """
+        for item in items:
+            self.items += 1
+            media = item.get('media')
+            if not isinstance(media, dict):
+                continue
+            rewritten = self.apply(media, self.stats)
+            for field, value in rewritten.items():
+                if media.get(field) != value:
+                    self.changes.append((item.get('id'), field, media.get(field), value))
+
+            recheck = {rule.name: Counter() for rule in self.rules}
+            again = self.apply(rewritten, recheck)
+            for field, value in again.items():
+                if rewritten.get(field) != value:
+                    self.unstable.append((item.get('id'), field, rewritten.get(field), value))
+            for name, counter in recheck.items():
+                self.unstable_rules[name] += counter['rewritten']
+
+            item['media'] = rewritten
+        return items
+
+    def print_summary(self):
+        print(f"Rules applied to {self.items} projects:")
+        for rule in self.rules:
+            stats = self.stats[rule.name]
+            extra = ', '.join(f'{key}: {value}' for key, value in sorted(stats.items()) if key != 'rewritten')
+            print(f"  {rule.name}: rewrote {stats['rewritten']} fields" + (f" ({extra})" if extra else ''))
+        print(f"  Net changes: {len(self.changes)} fields in {len({change[0] for change in self.changes})} projects")
+        if self.unstable:
+            names = ', '.join(name for name, count in self.unstable_rules.items() if count)
+            print(f"⚠ Not idempotent: a second pass would change {len(self.unstable)} more fields "
+                  f"(rules: {names})")
+            for item_id, field, old, new in self.unstable[:SAMPLE_CHANGES]:
+                print(f"    id {item_id} {field}: {old} -> {new}")
+
+
+def format_diff(changes, path):
+    """Diff изменений по полям в стиле unified diff"""
+    lines = [f"--- {path}", f"+++ {path} (rewritten)"]
+    current = object()
+    for item_id, field, old, new in changes:
+        if item_id != current:
+            lines.append(f"@@ id {item_id} @@")
+            current = item_id
+        lines.append(f"-media.{field}: {old}")
+        lines.append(f"+media.{field}: {new}")
+    return '\n'.join(lines)
+
+
+def rewrite_portfolio(rules, path=DEFAULT_PATH, dry_run=False):
+    """
+    Читает portfolio_data.json, применяет правила за один проход и записывает результат,
+    если что-то изменилось. Возвращает движок (изменения и счетчики) или None,
+    если файла нет или он не проходит проверку схемы
+    """
+    if not os.path.exists(path):
+        print(f"ERROR: {path} not found!")
+        return None
+
+    print(f"Reading {path}...")
+    try:
+        store = PortfolioStore.load(path)
+    except PortfolioSchemaError as e:
+        print(f"ERROR: {e}")
+        return None
+    engine = RewriteEngine(rules)
+    engine.run(store.items)
+    engine.print_summary()
+
+    if dry_run:
+        if engine.changes:
+            print(format_diff(engine.changes, path))
+        print("Dry run: nothing written")
+        return engine
+
+    for item_id, field, old, new in engine.changes[:SAMPLE_CHANGES]:
+        print(f"  id {item_id} {field}: {str(old)[:70]} -> {str(new)[:70]}")
+    if engine.changes:
+        print(f"Saving updated {path}...")
+        store.save()
+    else:
+        print(f"{path} is already up to date")
+    return engine
+
+
+def load_rule(name, args):
+    """Создает правило по имени; скрипты импортируются только при выборе их правила"""
+    if name == 'cloudinary-paths':
+        from update_cloudinary_paths import CLOUDINARY_PATHS_RULE
+        return CLOUDINARY_PATHS_RULE
+    if name == 'public-ids':
+        from fix_cloudinary_paths import PUBLIC_ID_PATHS_RULE
+        return PUBLIC_ID_PATHS_RULE
+    if name == 'thumbnail-hosts':
+        from fix_thumbnail_urls import THUMBNAIL_HOSTS_RULE
+        return THUMBNAIL_HOSTS_RULE
+    if name == 'synced-names':
+        from sync_cloudinary_names import load_all_cloudinary_files, require_credentials, synced_names_rule
+        require_credentials()
+        return synced_names_rule(load_all_cloudinary_files(full_refresh=args.full_refresh))
+    if name == 'delivery-urls':
+        from cloudinary_urls import DELIVERY_URLS_RULE
+        return DELIVERY_URLS_RULE
+    raise ValueError(f"Unknown rule {name}, available: {', '.join(RULE_NAMES)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rewrite media URLs in portfolio_data.json in a single pass')
+    parser.add_argument('--rules', default=','.join(DEFAULT_RULES),
+                        help=f"comma-separated rules, applied in the given order (available: {', '.join(RULE_NAMES)})")
+    parser.add_argument('--path', default=DEFAULT_PATH, help='portfolio file to rewrite')
+    parser.add_argument('--dry-run', action='store_true', help='print the diff without writing the file')
+    parser.add_argument('--check', action='store_true',
+                        help='do not write; exit with code 1 if the rules would change the file or are not idempotent')
+    parser.add_argument('--full-refresh', action='store_true',
+                        help='synced-names: reload the whole file list from Cloudinary (picks up renamed files)')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.rules.split(',') if name.strip()]
+    unknown = [name for name in names if name not in RULE_NAMES]
+    if unknown:
+        parser.error(f"unknown rules: {', '.join(unknown)} (available: {', '.join(RULE_NAMES)})")
+
+    rules = [load_rule(name, args) for name in names]
+    engine = rewrite_portfolio(rules, args.path, dry_run=args.dry_run or args.check)
+    if engine is None:
+        sys.exit(1)
+    if args.check and (engine.changes or engine.unstable):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
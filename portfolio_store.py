@@ -0,0 +1,125 @@
+"""
+Общий доступ к portfolio_data.json для скриптов
+PortfolioStore.load читает файл один раз (через orjson, если он установлен, см. portfolio_writer),
+сразу проверяет схему элементов и строит индекс по id. save записывает файл атомарно
+(временный файл + переименование, как write_portfolio) вместе с индексом и шардами сайта,
+поэтому сбой во время записи не оставляет обрезанный portfolio_data.json
+"""
+import os
+
+from portfolio_artifacts import write_artifacts
+from portfolio_writer import DEFAULT_FORMAT, iter_portfolio
+
+DEFAULT_PATH = 'portfolio_data.json'
+MEDIA_TYPES = ('image', 'video')
+# Необязательные поля media со строкой URL и со списками версий [{url, ...}]
+MEDIA_URL_FIELDS = ('path', 'thumbnail', 'poster')
+MEDIA_SRCSET_FIELDS = ('srcset', 'thumbnail_srcset')
+# Сколько ошибок схемы показывать в сообщении
+SCHEMA_ERRORS_SHOWN = 10
+
+
+class PortfolioSchemaError(ValueError):
+    """Элементы portfolio_data.json не соответствуют схеме"""
+
+    def __init__(self, path, errors):
+        shown = '\n'.join(f'  - {error}' for error in errors[:SCHEMA_ERRORS_SHOWN])
+        more = f'\n  ... и еще {len(errors) - SCHEMA_ERRORS_SHOWN}' if len(errors) > SCHEMA_ERRORS_SHOWN else ''
+        super().__init__(f"{path}: ошибок схемы - {len(errors)}\n{shown}{more}")
+        self.path = path
+        self.errors = errors
+
+
+def item_errors(item, position):
+    """Ошибки схемы одного элемента (пустой список, если элемент корректен)"""
+    if not isinstance(item, dict):
+        return [f"элемент #{position}: ожидается объект, а не {type(item).__name__}"]
+    item_id = item.get('id')
+    label = f"элемент id {item_id}" if item_id is not None else f"элемент #{position}"
+    errors = []
+    if not isinstance(item_id, int) or isinstance(item_id, bool):
+        errors.append(f"{label}: id должен быть целым числом")
+    for field in ('title', 'description'):
+        if field in item and not isinstance(item[field], str):
+            errors.append(f"{label}: {field} должно быть строкой")
+
+    media = item.get('media')
+    if not isinstance(media, dict):
+        return errors + [f"{label}: media должно быть объектом"]
+    if not isinstance(media.get('filename'), str):
+        errors.append(f"{label}: media.filename должно быть строкой")
+    if media.get('type') not in MEDIA_TYPES:
+        errors.append(f"{label}: media.type должно быть одним из: {', '.join(MEDIA_TYPES)}")
+    for field in MEDIA_URL_FIELDS:
+        if field in media and not isinstance(media[field], str):
+            errors.append(f"{label}: media.{field} должно быть строкой")
+    for field in MEDIA_SRCSET_FIELDS:
+        renditions = media.get(field)
+        if renditions is None:
+            continue
+        if not isinstance(renditions, list) or not all(
+                isinstance(rendition, dict) and isinstance(rendition.get('url'), str) for rendition in renditions):
+            errors.append(f"{label}: media.{field} должно быть списком объектов с url")
+    return errors
+
+
+class PortfolioStore:
+    """Элементы портфолио в памяти с индексом по id"""
+
+    def __init__(self, items, path=DEFAULT_PATH):
+        self.path = path
+        self.items = list(items)
+        self.by_id = {item['id']: item for item in self.items if isinstance(item, dict) and 'id' in item}
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH, validate=True):
+        """
+        Читает файл (JSON-массив или NDJSON) и проверяет схему всех элементов за один проход
+        При ошибках выбрасывает PortfolioSchemaError со списком всех ошибок
+        """
+        items = []
+        errors = []
+        seen = set()
+        for position, item in enumerate(iter_portfolio(path)):
+            items.append(item)
+            if not validate:
+                continue
+            errors += item_errors(item, position)
+            # Повторы ищутся только среди корректных id: список или словарь в id
+            # уже отмечен ошибкой выше и не может быть ключом множества
+            item_id = item.get('id') if isinstance(item, dict) else None
+            if not isinstance(item_id, int) or isinstance(item_id, bool):
+                continue
+            if item_id in seen:
+                errors.append(f"элемент id {item_id}: id повторяется")
+            seen.add(item_id)
+        if errors:
+            raise PortfolioSchemaError(path, errors)
+        return cls(items, path)
+
+    @classmethod
+    def load_if_exists(cls, path=DEFAULT_PATH, validate=True):
+        """Как load, но для отсутствующего файла возвращает None"""
+        if not os.path.exists(path):
+            return None
+        return cls.load(path, validate)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def get(self, item_id, default=None):
+        return self.by_id.get(item_id, default)
+
+    def save(self, path=None, fmt=None):
+        """
+        Атомарно записывает элементы вместе с индексом и шардами сайта (write_artifacts)
+        Формат по умолчанию - ndjson для .ndjson файлов, иначе минифицированный JSON
+        Возвращает количество элементов
+        """
+        path = path or self.path
+        if fmt is None:
+            fmt = 'ndjson' if str(path).endswith('.ndjson') else DEFAULT_FORMAT
+        return write_artifacts(self.items, path, fmt)
@@ -0,0 +1,77 @@
+"""
+Теги работ портфолио и обратный индекс тегов (portfolio_tags.json)
+Правила совпадают с extractTags() в script.js: теги берутся из колонок C, D, E таблицы
+(col_2, col_3, col_4), URL, одиночные буквы и слишком длинные значения пропускаются
+"""
+import hashlib
+import json
+
+TAG_COLUMNS = ('col_2', 'col_3', 'col_4')
+MIN_TAG_LENGTH = 2
+MAX_TAG_LENGTH = 100
+
+TAG_INDEX_VERSION = 1
+TAG_INDEX_PATH = 'portfolio_tags.json'
+
+
+def js_length(text):
+    """Длина строки как в JavaScript (в UTF-16 единицах)"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def is_tag(value):
+    """Проверяет, что значение колонки подходит как тег"""
+    return (MIN_TAG_LENGTH <= js_length(value) < MAX_TAG_LENGTH and
+            not value.startswith('http') and
+            not value.startswith('www.') and
+            value != 'с')
+
+
+def item_tags(item):
+    """Возвращает уникальные теги элемента в порядке колонок"""
+    tags = []
+    additional = item.get('additional') or {}
+    for col_key in TAG_COLUMNS:
+        value = additional.get(col_key)
+        if isinstance(value, str):
+            value = value.strip()
+            if is_tag(value) and value not in tags:
+                tags.append(value)
+    return tags
+
+
+def js_sort_key(text):
+    """Ключ сортировки, совпадающий с Array.prototype.sort() (по UTF-16 единицам)"""
+    return text.encode('utf-16-be')
+
+
+def build_tag_index(entries):
+    """
+    Строит обратный индекс тегов
+    entries - пары (id элемента, теги элемента)
+
+    Результат:
+    - tags: уникальные теги, отсортированные как в script.js
+    - postings: тег -> id элементов с этим тегом (в порядке элементов)
+    - counts: тег -> количество элементов
+    - revision: хэш содержимого, меняется при любом изменении тегов
+    """
+    postings = {}
+    for item_id, tags in entries:
+        for tag in tags:
+            ids = postings.setdefault(tag, [])
+            if item_id not in ids[-1:]:
+                ids.append(item_id)
+
+    tags = sorted(postings, key=js_sort_key)
+    sorted_postings = {tag: postings[tag] for tag in tags}
+    revision = hashlib.sha256(
+        json.dumps(sorted_postings, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    ).hexdigest()[:12]
+    return {
+        'version': TAG_INDEX_VERSION,
+        'revision': revision,
+        'tags': tags,
+        'postings': sorted_postings,
+        'counts': {tag: len(ids) for tag, ids in sorted_postings.items()}
+    }
@@ -0,0 +1,134 @@
+"""
+Потоковая запись и чтение portfolio_data
+Элементы записываются по одному по мере их получения, без сборки всего списка в памяти
+
+Форматы:
+- json   - минифицированный JSON-массив (по умолчанию, его загружает браузер)
+- pretty - JSON-массив с отступами (indent=2), как раньше, для ручного просмотра
+- ndjson - один элемент на строку (удобно для очень больших каталогов)
+
+Если установлен orjson, он кодирует и разбирает json/ndjson в несколько раз быстрее стандартного json
+(pretty всегда пишется стандартным json, чтобы отступы не менялись). Элементы с числами, которые orjson
+записывает иначе, чем json (NaN, Infinity, экспоненциальная запись вроде 1e-05), кодируются стандартным json,
+поэтому файл совпадает байт-в-байт при любом кодировщике
+"""
+import json
+import os
+import re
+
+try:
+    import orjson
+except ImportError:  # стандартный json дает тот же результат, только медленнее
+    orjson = None
+
+FORMATS = ('json', 'pretty', 'ndjson')
+DEFAULT_FORMAT = 'json'
+# Экспонента в выводе orjson (1e16, 1.5e-7); регулярка с буквы в начале ищет быстро
+_ORJSON_EXPONENT = re.compile(rb'e[-+]?[0-9]')
+
+
+def output_path_for(fmt, base_name='portfolio_data'):
+    """Возвращает имя выходного файла для формата"""
+    return f'{base_name}.ndjson' if fmt == 'ndjson' else f'{base_name}.json'
+
+
+def _orjson_compatible(value):
+    """
+    orjson запишет значение так же, как json.dumps
+    Отличаются только float: NaN/Infinity (orjson пишет null) и экспоненциальная запись
+    (json - 1e-05 и 1e+16, orjson - 0.00001 и 1e16), в том числе в ключах словарей
+    """
+    if isinstance(value, float):
+        # NaN и бесконечность не проходят ни одно сравнение
+        return value == 0 or 1e-4 <= abs(value) < 1e16
+    if isinstance(value, dict):
+        return all(_orjson_compatible(key) and _orjson_compatible(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return all(map(_orjson_compatible, value))
+    return True
+
+
+def _encode(item, fmt):
+    if fmt == 'pretty':
+        # Отступ элемента внутри массива, как у json.dump(..., indent=2)
+        return '  ' + json.dumps(item, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+    if orjson is not None:
+        try:
+            encoded = orjson.dumps(item, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # Типы, которые orjson не кодирует (например, целые больше 64 бит) - через json
+            encoded = None
+        # Полная проверка значений нужна, только если в выводе может быть такое число:
+        # null (NaN/Infinity), экспонента или малое число вроде 0.00001
+        if encoded is not None and (
+                (b'null' not in encoded and b'.0000' not in encoded and not _ORJSON_EXPONENT.search(encoded))
+                or _orjson_compatible(item)):
+            return encoded.decode('utf-8')
+    return json.dumps(item, ensure_ascii=False, separators=(',', ':'))
+
+
+def _decode(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def write_portfolio(items, path, fmt=DEFAULT_FORMAT):
+    """
+    Записывает элементы в файл по одному и возвращает их количество
+    items может быть генератором. Запись идет во временный файл, который
+    заменяет path только после успешного завершения
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат {fmt}, доступны: {', '.join(FORMATS)}")
+
+    path = str(path)
+    tmp_path = path + '.tmp'
+    count = 0
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            if fmt == 'ndjson':
+                for item in items:
+                    f.write(_encode(item, fmt))
+                    f.write('\n')
+                    count += 1
+            else:
+                separator = ',\n' if fmt == 'pretty' else ','
+                f.write('[')
+                for item in items:
+                    if count:
+                        f.write(separator)
+                    elif fmt == 'pretty':
+                        f.write('\n')
+                    f.write(_encode(item, fmt))
+                    count += 1
+                f.write('\n]' if fmt == 'pretty' and count else ']')
+            # Данные должны быть на диске до переименования: иначе после сбоя питания
+            # на месте файла может оказаться пустой или обрезанный
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def iter_portfolio(path):
+    """Читает элементы из JSON-массива или NDJSON файла"""
+    with open(path, 'rb') as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        if first == b'[':
+            f.seek(0)
+            yield from _decode(f.read())
+            return
+        f.seek(0)
+        for line in f:
+            if line.strip():
+                yield _decode(line)
+
+
+def read_portfolio(path):
+    """Читает все элементы портфолио в список"""
+    return list(iter_portfolio(path))
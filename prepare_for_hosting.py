@@ -3,13 +3,21 @@
 Генерирует версию portfolio_data.json с поддержкой внешних URL
 Использует переменные окружения из .env файла
 """
-import pandas as pd
+import argparse
 import json
 import os
-import re
 from pathlib import Path
 from dotenv import load_dotenv
 
+from cloudinary_urls import DEFAULT_DELIVERY, MEDIA, THUMBNAIL, build_url, poster_url
+from compress_assets import compress_assets
+from generate_thumbnails import generate_thumbnails
+from portfolio_artifacts import write_artifacts
+from portfolio_build import build_portfolio
+from portfolio_writer import DEFAULT_FORMAT, FORMATS, output_path_for
+from renditions import generate_renditions, load_renditions
+from spreadsheet_cache import read_excel_cached
+
 # Загружаем переменные окружения
 load_dotenv()
 
@@ -30,149 +38,99 @@ USE_LOCAL_PATHS = not USE_CLOUDINARY or not CLOUDINARY_IMAGE_URL
 LOCAL_BASE_PATH = "images/"
 
 def get_media_url(filename, media_type):
-    """Генерирует URL для медиафайла в зависимости от настроек"""
+    """Генерирует URL для медиафайла в зависимости от настроек (f_auto, q_auto через build_url)"""
     if USE_CLOUDINARY and CLOUDINARY_IMAGE_URL:
         if media_type == 'video':
-            return f"{CLOUDINARY_VIDEO_URL}{filename}" if CLOUDINARY_VIDEO_URL else f"{CLOUDINARY_IMAGE_URL}{filename}"
+            return build_url(filename, 'video', MEDIA, base_url=CLOUDINARY_VIDEO_URL or CLOUDINARY_IMAGE_URL)
         else:
-            return f"{CLOUDINARY_IMAGE_URL}{filename}"
+            return build_url(filename, 'image', MEDIA, base_url=CLOUDINARY_IMAGE_URL)
     return f"{LOCAL_BASE_PATH}{filename}"
 
 def get_thumbnail_url(thumbnail_path):
-    """Генерирует URL для thumbnail"""
+    """Генерирует URL для thumbnail (с ограничением ширины через build_url)"""
     if USE_CLOUDINARY and CLOUDINARY_IMAGE_URL:
         if thumbnail_path.startswith('icons/'):
             icon_name = thumbnail_path.replace('icons/', '')
-            return f"{CLOUDINARY_IMAGE_URL}icons/{icon_name}"
+            return build_url(f"icons/{icon_name}", 'image', THUMBNAIL, base_url=CLOUDINARY_IMAGE_URL)
         elif thumbnail_path.startswith('images/'):
             img_name = thumbnail_path.replace('images/', '')
-            return f"{CLOUDINARY_IMAGE_URL}{img_name}"
+            return build_url(img_name, 'image', THUMBNAIL, base_url=CLOUDINARY_IMAGE_URL)
         else:
-            return f"{CLOUDINARY_IMAGE_URL}{thumbnail_path}"
+            return build_url(thumbnail_path, 'image', THUMBNAIL, base_url=CLOUDINARY_IMAGE_URL)
     return thumbnail_path
 
-# Читаем Excel файл
-df = pd.read_excel(EXCEL_PATH, header=None)
-
-# Получаем список всех медиафайлов
-media_files = {}
-if IMAGES_DIR.exists():
-    for file in os.listdir(IMAGES_DIR):
-        match = re.search(r'(\d+)', file)
-        if match:
-            num = int(match.group(1))
-            file_ext = os.path.splitext(file)[1].lower()
-            media_type = 'video' if file_ext in ['.mp4', '.mov', '.MOV', '.MP4'] else 'image'
-            media_files[num] = {
-                'filename': file,
-                'type': media_type,
-                'extension': file_ext
-            }
-
-# Получаем список thumbnails
-thumbnails = {}
-if ICONS_DIR.exists():
-    for file in os.listdir(ICONS_DIR):
-        match = re.search(r'(\d+)', file)
-        if match:
-            num = int(match.group(1))
-            thumbnails[num] = file
-
-# Создаем структуру данных
-portfolio_data = []
-
-for idx, row in df.iterrows():
-    row_num = idx + 1
-    
-    media_info = media_files.get(row_num)
-    
-    if media_info:
-        # Определяем путь к thumbnail
-        thumbnail_path = None
-        if row_num in thumbnails:
-            thumbnail_path = f'icons/{thumbnails[row_num]}'
-        else:
-            # Если нет thumbnail, используем оригинальный файл (fallback)
-            thumbnail_path = f'images/{media_info["filename"]}'
-        
-        item = {
-            'id': row_num,
-            'media': {
-                'filename': media_info['filename'],
-                'type': media_info['type'],
-                'path': get_media_url(media_info['filename'], media_info['type']),
-                'thumbnail': get_thumbnail_url(thumbnail_path)
-            },
-            'title': '',
-            'description': '',
-            'additional': {}
-        }
-        
-        texts = []
-        for col_idx, col in enumerate(df.columns):
-            value = row[col]
-            if pd.notna(value):
-                value_str = str(value).strip()
-                if value_str:
-                    texts.append(value_str)
-                    item['additional'][f'col_{col_idx}'] = value_str
-        
-        if len(texts) > 0:
-            sorted_texts = sorted(texts, key=len)
-            item['title'] = sorted_texts[0] if sorted_texts else ''
-            item['description'] = sorted_texts[-1] if sorted_texts else ''
-            
-            if item['title'] == item['description']:
-                first_col_key = 'col_0' if 'col_0' in item['additional'] else None
-                if first_col_key:
-                    item['title'] = item['additional'][first_col_key]
-                    desc_parts = []
-                    for col_idx in range(1, len(df.columns)):
-                        col_key = f'col_{col_idx}'
-                        if col_key in item['additional']:
-                            desc_parts.append(item['additional'][col_key])
-                    if desc_parts:
-                        item['description'] = '\n\n'.join(desc_parts)
-                    elif len(texts) > 1:
-                        item['description'] = '\n\n'.join(texts[1:])
-            
-            if len(item['description']) < 50 and len(texts) > 1:
-                item['description'] = '\n\n'.join([t for t in texts if t != item['title']])
-        
-        portfolio_data.append(item)
-
-# Сохраняем в JSON
-output_path = 'portfolio_data.json'
-with open(output_path, 'w', encoding='utf-8') as f:
-    json.dump(portfolio_data, f, ensure_ascii=False, indent=2)
-
-print(f"Обработано {len(portfolio_data)} элементов портфолио")
-print(f"Данные сохранены в {output_path}")
-
-if USE_CLOUDINARY:
-    print(f"\n✓ Используется Cloudinary:")
-    print(f"  Image URL: {CLOUDINARY_IMAGE_URL}")
-    print(f"  Video URL: {CLOUDINARY_VIDEO_URL}")
-else:
-    print(f"\n⚠ Используются локальные пути (для разработки)")
-    print(f"Для использования Cloudinary:")
-    print("1. Установите USE_CLOUDINARY=true в файле .env")
-    print("2. Убедитесь, что CLOUDINARY_IMAGE_URL и CLOUDINARY_VIDEO_URL указаны")
-    print("3. Запустите скрипт снова")
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+def get_poster_url(media_url):
+    """Постер видео (кадр so_N) для URL Cloudinary; для локальных путей постера нет"""
+    return poster_url(media_url)
+
+def main():
+    parser = argparse.ArgumentParser(description='Подготовка portfolio_data.json для хостинга')
+    parser.add_argument('--incremental', action='store_true',
+                        help='пересобрать только элементы, у которых изменились строка таблицы или медиафайлы')
+    parser.add_argument('--refresh-cache', action='store_true',
+                        help='перечитать Excel файл, даже если он не менялся с прошлой сборки')
+    parser.add_argument('--thumbnails', action='store_true',
+                        help='перед сборкой создать иконки для работ без иконки в icons/')
+    parser.add_argument('--renditions', action='store_true',
+                        help='перед сборкой создать адаптивные версии изображений (AVIF/WebP) в renditions/')
+    parser.add_argument('--format', choices=FORMATS, default=DEFAULT_FORMAT,
+                        help='формат вывода: json (минифицированный), pretty (с отступами) или ndjson')
+    parser.add_argument('--compress', action='store_true',
+                        help='создать .gz и .br версии файлов сайта и вывести отчет о размерах')
+    args = parser.parse_args()
+    output_path = output_path_for(args.format)
+
+    # Читаем Excel файл
+    df = read_excel_cached(EXCEL_PATH, header=None, refresh=args.refresh_cache)
+
+    # Настройки URL (в том числе трансформации доставки) входят в ключ инкрементальной сборки:
+    # при их изменении все элементы пересобираются
+    settings = json.dumps([USE_CLOUDINARY, CLOUDINARY_IMAGE_URL, CLOUDINARY_VIDEO_URL, DEFAULT_DELIVERY])
+
+    if args.thumbnails:
+        generate_thumbnails(IMAGES_DIR, ICONS_DIR)
+
+    # Адаптивные версии нужны только для локальных путей:
+    # Cloudinary сам отдает нужный размер и формат по трансформациям в URL
+    if args.renditions and USE_LOCAL_PATHS:
+        generate_renditions({'images': IMAGES_DIR, 'icons': ICONS_DIR})
+    elif args.renditions:
+        print("Версии изображений не создаются: используется Cloudinary")
+
+    portfolio_data = build_portfolio(
+        df, IMAGES_DIR, ICONS_DIR,
+        get_media_url=get_media_url,
+        get_thumbnail_url=get_thumbnail_url,
+        get_poster_url=get_poster_url,
+        settings=settings,
+        incremental=args.incremental,
+        output_path=output_path,
+        renditions=load_renditions() if USE_LOCAL_PATHS else None
+    )
+
+    # Элементы записываются по одному по мере сборки,
+    # в том же проходе пишутся индекс для первого экрана и шарды с полными данными
+    count = write_artifacts(portfolio_data, output_path, args.format)
+    # Манифест сохраняется только после записи: при сбое записи элементы не считаются актуальными
+    portfolio_data.save_manifest()
+
+    print(f"Обработано {count} элементов портфолио")
+    print(f"Данные сохранены в {output_path}")
+
+    if args.compress:
+        compress_assets()
+
+    if USE_CLOUDINARY:
+        print(f"\n✓ Используется Cloudinary:")
+        print(f"  Image URL: {CLOUDINARY_IMAGE_URL}")
+        print(f"  Video URL: {CLOUDINARY_VIDEO_URL}")
+    else:
+        print(f"\n⚠ Используются локальные пути (для разработки)")
+        print(f"Для использования Cloudinary:")
+        print("1. Установите USE_CLOUDINARY=true в файле .env")
+        print("2. Убедитесь, что CLOUDINARY_IMAGE_URL и CLOUDINARY_VIDEO_URL указаны")
+        print("3. Запустите скрипт снова")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,19 @@
 Скрипт для обработки координат фигур из Excel файла
 Создает JSON файл с координатами для каждой фигуры
 """
-import pandas as pd
+import argparse
 import json
 import os
 
+from spreadsheet_cache import read_excel_cached
+
 # Путь к Excel файлу с координатами
 shapes_excel_path = r"C:\Users\user\Desktop\progects\portfolio\shapes_coordinates.xlsx"
 
-def process_shapes_coordinates():
+def process_shapes_coordinates(refresh=False):
     """
     Обрабатывает Excel файл с координатами фигур
+    refresh=True - перечитать Excel файл, даже если он не менялся
     Ожидаемый формат Excel:
     - Лист для каждой фигуры (star, sphere, pattern, text)
     - Колонки: index, x, y (опционально z)
@@ -37,13 +40,11 @@ def process_shapes_coordinates():
         return None
     
     try:
-        # Читаем все листы
-        excel_file = pd.ExcelFile(shapes_excel_path)
+        # Читаем все листы за один разбор книги (или из кэша, если книга не менялась)
+        sheets = read_excel_cached(shapes_excel_path, sheet_name=None, refresh=refresh)
         
-        for sheet_name in excel_file.sheet_names:
+        for sheet_name, df in sheets.items():
             if sheet_name.lower() in shapes_data:
-                df = pd.read_excel(shapes_excel_path, sheet_name=sheet_name)
-                
                 # Проверяем наличие нужных колонок
                 required_cols = ['index', 'x', 'y']
                 if not all(col in df.columns for col in required_cols):
@@ -82,21 +83,8 @@ def process_shapes_coordinates():
         return None
 
 if __name__ == "__main__":
-    process_shapes_coordinates()
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+    parser = argparse.ArgumentParser(description='Обработка координат фигур из Excel файла')
+    parser.add_argument('--refresh-cache', action='store_true',
+                        help='перечитать Excel файл, даже если он не менялся')
+    args = parser.parse_args()
+    process_shapes_coordinates(refresh=args.refresh_cache)
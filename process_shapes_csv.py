@@ -1,8 +1,13 @@
 """
 Скрипт для обработки координат фигур из CSV файлов
 Обрабатывает CSV файлы с координатами и создает JSON для сайта
+Координаты обрабатываются целыми колонками (массивы NumPy float64): преобразование типов,
+масштабирование, Z по умолчанию, сортировка по index и нормализация Z сферы не обходят строки
+по одной, поэтому облака из сотен тысяч точек обрабатываются за доли секунды
+(сравнение с прежним построчным вариантом - benchmark_shapes.py)
 """
 import pandas as pd
+import numpy as np
 import json
 import os
 import glob
@@ -10,182 +15,302 @@ import glob
 # Путь к папке с CSV файлами
 csv_dir = r"C:\Users\user\Desktop\progects\portfolio"
 
-def process_csv_shapes():
+SHAPE_NAMES = ('star', 'sphere', 'pattern', 'text')
+
+# Маппинг файлов к именам фигур
+FILE_MAPPING = {
+    'sphere.csv': 'sphere',
+    'star.csv': 'star',
+    'art.csv': 'text',  # art -> text (слово АРТ)
+    'pattern1.csv': 'pattern',
+    'pattern.csv': 'pattern'
+}
+
+# Фигуры, координаты которых умножаются на 10
+SCALED_SHAPES = ('sphere', 'star', 'text')
+SCALE_FACTOR = 10
+# По умолчанию средняя глубина
+DEFAULT_Z = 0.5
+# Сколько пропущенных строк показывать в сообщении
+SKIPPED_SHOWN = 5
+
+INT64_LIMIT = 2.0 ** 63
+
+
+def detect_columns(columns):
+    """
+    Определяет колонки (index, x, y, z) по заголовкам CSV
+    x, y или z равны None, если колонки нет
+    """
+    index_col = None
+    x_col = None
+    y_col = None
+    z_col = None
+
+    # Ищем колонку index
+    for col in columns:
+        if 'index' in col.lower():
+            index_col = col
+            break
+
+    # Ищем колонки координат
+    # Вариант 1: P(0), P(1), P(2)
+    if 'P(0)' in columns:
+        x_col = 'P(0)'
+        y_col = 'P(1)'
+        if 'P(2)' in columns:
+            z_col = 'P(2)'
+    # Вариант 2: x, y, z
+    elif 'x' in columns:
+        x_col = 'x'
+        y_col = 'y'
+        if 'z' in columns:
+            z_col = 'z'
+    # Вариант 3: первая колонка после index
+    else:
+        cols = [c for c in columns if c != index_col]
+        if len(cols) >= 1:
+            x_col = cols[0]
+        if len(cols) >= 2:
+            y_col = cols[1]
+        if len(cols) >= 3:
+            z_col = cols[2]
+
+    return index_col, x_col, y_col, z_col
+
+
+def _is_numeric(series):
+    """Обычная числовая колонка NumPy (а не текст или nullable-тип pandas)"""
+    return isinstance(series.dtype, np.dtype) and series.dtype.kind in 'iufb'
+
+
+def _convert_each(values, convert, dtype):
+    """Поэлементное преобразование для текстовых колонок; возвращает (массив, маска успешных)"""
+    result = []
+    ok = np.ones(len(values), dtype=bool)
+    for position, value in enumerate(values):
+        try:
+            result.append(convert(value))
+        except (TypeError, ValueError, OverflowError):
+            result.append(0)
+            ok[position] = False
+    try:
+        return np.array(result, dtype=dtype), ok
+    except OverflowError:
+        # Целые больше int64 остаются объектами Python
+        return np.array(result, dtype=object), ok
+
+
+def index_column(series):
+    """Колонка index как int(значение) для каждой строки; возвращает (массив, маска успешных)"""
+    values = series.to_numpy()
+    if _is_numeric(series):
+        if values.dtype.kind != 'f':
+            return values.astype(np.int64) if values.dtype.kind == 'b' else values, np.ones(len(values), dtype=bool)
+        # int() отбрасывает дробную часть, NaN и бесконечность - ошибка строки
+        ok = np.isfinite(values)
+        if not (np.abs(values[ok]) >= INT64_LIMIT).any():
+            return np.where(ok, np.trunc(values), 0).astype(np.int64), ok
+    return _convert_each(series.tolist(), int, np.int64)
+
+
+def float_column(series):
+    """Колонка как float(значение); NaN сохраняется, нечисловой текст - ошибка строки"""
+    if _is_numeric(series):
+        return series.to_numpy(dtype=np.float64), np.ones(len(series), dtype=bool)
+    return _convert_each(series.tolist(), float, np.float64)
+
+
+def z_column(series):
+    """Колонка Z: пустые значения заменяются на DEFAULT_Z, нечисловой текст - ошибка строки"""
+    if _is_numeric(series):
+        values = series.to_numpy(dtype=np.float64)
+        return np.where(np.isnan(values), DEFAULT_Z, values), np.ones(len(values), dtype=bool)
+    return _convert_each(series.tolist(), lambda value: float(value) if pd.notna(value) else DEFAULT_Z,
+                         np.float64)
+
+
+def shape_arrays(df, shape_name):
+    """
+    Координаты фигуры из DataFrame: словарь массивов index, x, y, z, отсортированных по index
+    Строки, которые не удалось преобразовать в числа, пропускаются.
+    Возвращает (массивы, номера пропущенных строк) или (None, None), если нет нужных колонок
+    """
+    index_col, x_col, y_col, z_col = detect_columns(df.columns)
+    if not index_col or not x_col or not y_col:
+        return None, None
+
+    n_rows = len(df)
+    # Колонки, которых нет в CSV (например, P(1) при наличии P(0)), делают ошибочными все строки
+    none_ok = np.zeros(n_rows, dtype=bool)
+    index, ok = index_column(df[index_col])
+    x, x_ok = float_column(df[x_col]) if x_col in df.columns else (np.zeros(n_rows), none_ok)
+    y, y_ok = float_column(df[y_col]) if y_col in df.columns else (np.zeros(n_rows), none_ok)
+    if z_col and z_col in df.columns:
+        z, z_ok = z_column(df[z_col])
+    else:
+        z, z_ok = np.full(n_rows, DEFAULT_Z), np.ones(n_rows, dtype=bool)
+    ok = ok & x_ok & y_ok & z_ok
+
+    # Множитель для масштабирования координат
+    scale_factor = SCALE_FACTOR if shape_name in SCALED_SHAPES else 1
+
+    # Устойчивая сортировка: точки с одинаковым index сохраняют порядок файла
+    order = np.argsort(index[ok], kind='stable')
+    arrays = {
+        'index': index[ok][order],
+        'x': x[ok][order] * scale_factor,
+        'y': y[ok][order] * scale_factor,
+        'z': z[ok][order]
+    }
+    return arrays, np.flatnonzero(~ok)
+
+
+def z_bounds(z):
+    """min и max как у встроенных min()/max() (при NaN их результат зависит от порядка точек)"""
+    if np.isnan(z).any():
+        values = z.tolist()
+        return min(values), max(values)
+    return float(z.min()), float(z.max())
+
+
+def normalize_z(z):
+    """
+    Нормализует Z от 0 до 1 (0 = ближе, 1 = дальше)
+    Для сферы: минимальное P(2) = ближе (0), максимальное = дальше (1)
+    """
+    min_z, max_z = z_bounds(z)
+    z_range = max_z - min_z if max_z != min_z else 1
+    # При бесконечных Z результат NaN, как у построчного варианта, - без предупреждений NumPy
+    with np.errstate(invalid='ignore'):
+        return (z - min_z) / z_range
+
+
+def points(arrays):
+    """Список точек {index, x, y, z} для JSON"""
+    return [
+        {'index': index, 'x': x, 'y': y, 'z': z}
+        for index, x, y, z in zip(arrays['index'].tolist(), arrays['x'].tolist(),
+                                  arrays['y'].tolist(), arrays['z'].tolist())
+    ]
+
+
+def _json_numbers(values):
+    """Числа колонки так же, как их пишет json.dump"""
+    if values.dtype.kind != 'f':
+        return list(map(int.__repr__, values.tolist()))
+    texts = list(map(float.__repr__, values.tolist()))
+    # repr дает nan/inf, а json.dump - NaN/Infinity
+    for position in np.flatnonzero(~np.isfinite(values)).tolist():
+        value = values[position]
+        texts[position] = 'NaN' if np.isnan(value) else ('Infinity' if value > 0 else '-Infinity')
+    return texts
+
+
+def shapes_json(shapes):
+    """
+    Текст shapes_coordinates.json из массивов фигур, байт-в-байт как
+    json.dump(..., ensure_ascii=False, indent=2), но без обхода словарей точек
+    """
+    parts = []
+    for shape_name, arrays in shapes.items():
+        if arrays is None or not len(arrays['index']):
+            parts.append(f'  {json.dumps(shape_name, ensure_ascii=False)}: []')
+            continue
+        columns = [_json_numbers(arrays[key]) for key in ('index', 'x', 'y', 'z')]
+        body = ',\n'.join(
+            f'    {{\n      "index": {index},\n      "x": {x},\n      "y": {y},\n      "z": {z}\n    }}'
+            for index, x, y, z in zip(*columns)
+        )
+        parts.append(f'  {json.dumps(shape_name, ensure_ascii=False)}: [\n{body}\n  ]')
+    return '{\n' + ',\n'.join(parts) + '\n}'
+
+
+def process_csv_shapes(csv_dir=csv_dir, output_path='shapes_coordinates.json'):
     """
     Обрабатывает CSV файлы с координатами фигур
     Ожидаемый формат CSV:
     - Файлы: sphere.csv, star.csv, art.csv, pattern1.csv (или pattern.csv)
     - Колонки: index, P(0) (x), P(1) (y), P(2) (z, опционально)
     """
-    
-    shapes_data = {
-        'star': [],
-        'sphere': [],
-        'pattern': [],
-        'text': []
-    }
-    
-    # Маппинг файлов к именам фигур
-    file_mapping = {
-        'sphere.csv': 'sphere',
-        'star.csv': 'star',
-        'art.csv': 'text',  # art -> text (слово АРТ)
-        'pattern1.csv': 'pattern',
-        'pattern.csv': 'pattern'
-    }
-    
+
+    shapes = {shape_name: None for shape_name in SHAPE_NAMES}
+
     # Ищем CSV файлы
     csv_files = glob.glob(os.path.join(csv_dir, '*.csv'))
-    
+
     if not csv_files:
         print(f"CSV файлы не найдены в {csv_dir}")
         return None
-    
+
     print(f"Найдено {len(csv_files)} CSV файлов")
-    
+
     for csv_file in csv_files:
         filename = os.path.basename(csv_file)
-        shape_name = file_mapping.get(filename)
-        
+        shape_name = FILE_MAPPING.get(filename)
+
         if not shape_name:
             print(f"Пропускаем {filename} - неизвестный файл")
             continue
-        
+
         try:
             # Читаем CSV файл
             df = pd.read_csv(csv_file)
-            
+
             print(f"\nОбработка {filename} -> {shape_name}")
             print(f"Колонки: {df.columns.tolist()}")
             print(f"Строк: {len(df)}")
-            
-            # Определяем колонки
-            index_col = None
-            x_col = None
-            y_col = None
-            z_col = None
-            
-            # Ищем колонку index
-            for col in df.columns:
-                if 'index' in col.lower():
-                    index_col = col
-                    break
-            
-            # Ищем колонки координат
-            # Вариант 1: P(0), P(1), P(2)
-            if 'P(0)' in df.columns:
-                x_col = 'P(0)'
-                y_col = 'P(1)'
-                if 'P(2)' in df.columns:
-                    z_col = 'P(2)'
-            # Вариант 2: x, y, z
-            elif 'x' in df.columns:
-                x_col = 'x'
-                y_col = 'y'
-                if 'z' in df.columns:
-                    z_col = 'z'
-            # Вариант 3: первая колонка после index
-            else:
-                cols = [c for c in df.columns if c != index_col]
-                if len(cols) >= 1:
-                    x_col = cols[0]
-                if len(cols) >= 2:
-                    y_col = cols[1]
-                if len(cols) >= 3:
-                    z_col = cols[2]
-            
-            if not index_col or not x_col or not y_col:
+
+            arrays, skipped = shape_arrays(df, shape_name)
+            if arrays is None:
                 print(f"Ошибка: не найдены нужные колонки в {filename}")
                 continue
-            
-            # Преобразуем в массив координат
-            coordinates = []
-            # Множитель для масштабирования координат
-            scale_factor = 10 if shape_name in ['sphere', 'star', 'text'] else 1
-            
-            for _, row in df.iterrows():
-                try:
-                    index_val = int(row[index_col])
-                    x_val = float(row[x_col]) * scale_factor
-                    y_val = float(row[y_col]) * scale_factor
-                    
-                    coord = {
-                        'index': index_val,
-                        'x': x_val,
-                        'y': y_val
-                    }
-                    
-                    # Добавляем Z если есть
-                    if z_col and z_col in df.columns:
-                        z_val = row[z_col]
-                        if pd.notna(z_val):
-                            z_float = float(z_val)
-                            coord['z'] = z_float
-                        else:
-                            coord['z'] = 0.5
-                    else:
-                        coord['z'] = 0.5  # По умолчанию средняя глубина
-                    
-                    coordinates.append(coord)
-                except Exception as e:
-                    print(f"Ошибка обработки строки {row.get(index_col, 'unknown')}: {e}")
-                    continue
-            
-            # Сортируем по index
-            coordinates.sort(key=lambda c: c['index'])
-            
-            shapes_data[shape_name] = coordinates
-            print(f"Обработано {len(coordinates)} координат для фигуры '{shape_name}'")
-            
+            if len(skipped):
+                rows = ', '.join(str(row + 2) for row in skipped[:SKIPPED_SHOWN])
+                print(f"Пропущено {len(skipped)} строк с нечисловыми значениями (строки CSV: {rows}"
+                      f"{', ...' if len(skipped) > SKIPPED_SHOWN else ''})")
+
+            shapes[shape_name] = arrays
+            print(f"Обработано {len(arrays['index'])} координат для фигуры '{shape_name}'")
+
             # Для sphere показываем диапазон Z
-            if z_col and shape_name == 'sphere':
-                z_values = [c['z'] for c in coordinates if 'z' in c]
-                if z_values:
-                    print(f"  Z диапазон: {min(z_values):.4f} до {max(z_values):.4f}")
-        
+            z_col = detect_columns(df.columns)[3]
+            if z_col and shape_name == 'sphere' and len(arrays['z']):
+                min_z, max_z = z_bounds(arrays['z'])
+                print(f"  Z диапазон: {min_z:.4f} до {max_z:.4f}")
+
         except Exception as e:
             print(f"Ошибка при обработке {filename}: {e}")
             import traceback
             traceback.print_exc()
             continue
-    
+
     # Нормализуем Z координаты для sphere (если есть)
-    if shapes_data['sphere']:
-        z_values = [c['z'] for c in shapes_data['sphere'] if 'z' in c]
-        if z_values:
-            min_z = min(z_values)
-            max_z = max(z_values)
-            z_range = max_z - min_z if max_z != min_z else 1
-            
-            # Нормализуем Z от 0 до 1 (0 = ближе, 1 = дальше)
-            # Для сферы: минимальное P(2) = ближе (0), максимальное = дальше (1)
-            for coord in shapes_data['sphere']:
-                if 'z' in coord:
-                    normalized_z = (coord['z'] - min_z) / z_range
-                    coord['z'] = normalized_z
-    
+    sphere = shapes['sphere']
+    if sphere is not None and len(sphere['z']):
+        sphere['z'] = normalize_z(sphere['z'])
+
     # Сохраняем в JSON
-    output_path = 'shapes_coordinates.json'
     with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(shapes_data, f, ensure_ascii=False, indent=2)
-    
+        f.write(shapes_json(shapes))
+
     print(f"\nКоординаты сохранены в {output_path}")
-    
+
     # Статистика
+    shapes_data = {shape_name: points(arrays) if arrays is not None else []
+                   for shape_name, arrays in shapes.items()}
     total_coords = sum(len(coords) for coords in shapes_data.values())
     print(f"\nСтатистика:")
-    for shape_name, coords in shapes_data.items():
-        if coords:
+    for shape_name, arrays in shapes.items():
+        if arrays is not None and len(arrays['index']):
             z_info = ""
-            if shape_name == 'sphere' and coords:
-                z_vals = [c.get('z', 0.5) for c in coords]
-                if z_vals:
-                    z_info = f" (Z: {min(z_vals):.2f} - {max(z_vals):.2f})"
-            print(f"  {shape_name}: {len(coords)} координат{z_info}")
+            if shape_name == 'sphere':
+                min_z, max_z = z_bounds(arrays['z'])
+                z_info = f" (Z: {min_z:.2f} - {max_z:.2f})"
+            print(f"  {shape_name}: {len(arrays['index'])} координат{z_info}")
     print(f"  Всего: {total_coords} координат")
-    
+
     return shapes_data
 
 if __name__ == "__main__":
     process_csv_shapes()
-
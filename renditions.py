@@ -0,0 +1,197 @@
+"""
+Адаптивные версии изображений (renditions) для сайта
+Для каждого изображения из images/ и icons/ создаются уменьшенные копии нескольких
+ширин в форматах AVIF и WebP. Имя файла содержит хэш исходника
+(renditions/images/12-3fa9c1d2e4-960w.webp), поэтому его можно кэшировать навсегда.
+Список версий хранится в renditions/manifest.json и попадает в portfolio_data.json
+как media.srcset / media.thumbnail_srcset - сайт выбирает самый маленький подходящий файл.
+Нужен Pillow (AVIF - Pillow 11.3+ или плагин pillow-avif-plugin)
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from media_index import MediaIndex
+from media_probe import MediaProbeCache
+
+RENDITIONS_VERSION = 1
+RENDITIONS_DIR = 'renditions'
+MANIFEST_PATH = os.path.join(RENDITIONS_DIR, 'manifest.json')
+
+# Ширины версий: полные изображения открываются в модальном окне, иконки - в галерее
+IMAGE_WIDTHS = (480, 960, 1440, 1920, 2560)
+ICON_WIDTHS = (120, 240, 400)
+SOURCE_WIDTHS = {'images': IMAGE_WIDTHS, 'icons': ICON_WIDTHS}
+
+# Формат -> (расширение, MIME тип, параметры сохранения Pillow)
+FORMATS = {
+    'avif': ('avif', 'image/avif', {'quality': 60}),
+    'webp': ('webp', 'image/webp', {'quality': 80}),
+}
+
+
+def available_formats():
+    """Форматы из FORMATS, которые умеет сохранять установленный Pillow"""
+    try:
+        from PIL import features
+    except ImportError:
+        return []
+    return [fmt for fmt in FORMATS if features.check(fmt)]
+
+
+def target_widths(source_width, widths):
+    """Ширины версий без увеличения: меньшие исходника плюс сам исходник (не шире максимальной)"""
+    result = [width for width in widths if width < source_width]
+    if source_width <= max(widths):
+        result.append(source_width)
+    return result or [max(widths)]
+
+
+def render_source(task):
+    """
+    Создает все версии одного файла. task - (ключ, путь, sha256, папка вывода, ширины, форматы)
+    Возвращает (ключ, список версий, текст ошибки или None)
+    """
+    key, path, sha, out_dir, widths, formats = task
+    from PIL import Image, ImageOps
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    renditions = []
+    try:
+        with Image.open(path) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+            for width in target_widths(image.width, widths):
+                height = max(1, round(image.height * width / image.width))
+                resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+                for fmt in formats:
+                    extension, mime, options = FORMATS[fmt]
+                    name = f'{stem}-{sha[:10]}-{width}w.{extension}'
+                    resized.save(os.path.join(out_dir, name), fmt.upper(), **options)
+                    renditions.append({
+                        'file': f'{os.path.basename(out_dir)}/{name}',
+                        'width': width,
+                        'height': height,
+                        'type': mime,
+                        'bytes': os.path.getsize(os.path.join(out_dir, name))
+                    })
+    except (OSError, ValueError) as e:
+        return key, [], str(e)
+    return key, renditions, None
+
+
+def load_renditions(manifest_path=MANIFEST_PATH):
+    """Возвращает карту: путь исходника ("images/12.png") -> список версий"""
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠ Не удалось прочитать {manifest_path}: {e}")
+        return {}
+    if data.get('version') != RENDITIONS_VERSION:
+        return {}
+    return {key: source['renditions'] for key, source in data.get('sources', {}).items()}
+
+
+def generate_renditions(directories=None, workers=None, renditions_dir=RENDITIONS_DIR, media_index=None):
+    """
+    Создает версии для новых и измененных изображений, удаляет версии удаленных
+    directories - карта: префикс ключа ("images", "icons") -> папка с исходниками
+    Возвращает количество обработанных файлов
+    """
+    formats = available_formats()
+    if not formats:
+        print("⚠ Pillow не установлен или не поддерживает WebP/AVIF, версии изображений не созданы "
+              "(pip install Pillow)")
+        return 0
+    if directories is None:
+        directories = {prefix: prefix for prefix in SOURCE_WIDTHS}
+    if media_index is None:
+        media_index = MediaIndex.load()
+
+    manifest_path = os.path.join(renditions_dir, 'manifest.json')
+    sources = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') == RENDITIONS_VERSION and data.get('formats') == formats:
+            sources = data.get('sources', {})
+
+    # Хэши файлов пересчитываются только при изменении размера или mtime
+    hash_cache = MediaProbeCache.load()
+    tasks = []
+    current = {}
+    for prefix, directory in directories.items():
+        out_dir = os.path.join(renditions_dir, prefix)
+        os.makedirs(out_dir, exist_ok=True)
+        for entry in media_index.entries(directory):
+            if entry['type'] != 'image':
+                continue
+            key = f"{prefix}/{entry['filename']}"
+            path = os.path.join(directory, entry['filename'])
+            sha = hash_cache.file_hash(path)
+            current[key] = sha
+            source = sources.get(key)
+            if source and source['sha256'] == sha and all(
+                    os.path.exists(os.path.join(renditions_dir, r['file'])) for r in source['renditions']):
+                continue
+            tasks.append((key, path, sha, out_dir, SOURCE_WIDTHS.get(prefix, IMAGE_WIDTHS), formats))
+    hash_cache.save()
+    media_index.save()
+
+    if tasks:
+        print(f"Создание версий для {len(tasks)} изображений ({', '.join(formats)})...")
+        if len(tasks) == 1:
+            results = [render_source(tasks[0])]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(render_source, tasks))
+        # Нечитаемые файлы тоже запоминаются (с пустым списком), чтобы не пробовать их снова,
+        # пока не изменится содержимое
+        failed = []
+        for key, renditions, error in results:
+            sources[key] = {'sha256': current[key], 'renditions': renditions}
+            if error:
+                failed.append(f'{key} ({error})')
+        if failed:
+            print(f"⚠ Не удалось обработать {len(failed)} изображений:")
+            for line in failed[:10]:
+                print(f"  {line}")
+            if len(failed) > 10:
+                print(f"  ... и еще {len(failed) - 10}")
+
+    # Версии удаленных и измененных исходников больше не нужны
+    sources = {key: sources[key] for key in sorted(sources) if key in current}
+    referenced = {r['file'] for source in sources.values() for r in source['renditions']}
+    removed = 0
+    for prefix in directories:
+        out_dir = os.path.join(renditions_dir, prefix)
+        for name in os.listdir(out_dir):
+            if f'{prefix}/{name}' not in referenced:
+                os.remove(os.path.join(out_dir, name))
+                removed += 1
+
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'version': RENDITIONS_VERSION, 'formats': formats, 'sources': sources},
+                  f, ensure_ascii=False, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    total_bytes = sum(r['bytes'] for source in sources.values() for r in source['renditions'])
+    print(f"Версии изображений: обработано {len(tasks)}, всего {len(referenced)} файлов "
+          f"({total_bytes / 1024 / 1024:.1f} MB), удалено устаревших: {removed}")
+    return len(tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Создание адаптивных версий изображений (AVIF/WebP)')
+    parser.add_argument('--workers', type=int, default=None, help='количество процессов (по умолчанию - все ядра)')
+    args = parser.parse_args()
+    generate_renditions(workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,14 @@
 Скрипт для перезагрузки файлов в Cloudinary с правильными именами (public_id)
 Это исправит проблему с переименованными файлами (250_xxx.png -> 250)
 """
+import argparse
 import cloudinary
-import cloudinary.uploader
 import os
 from pathlib import Path
 from dotenv import load_dotenv
 
+from cloudinary_upload import InvalidationQueue, UploadEngine, UploadManifest, collect_tasks
+
 # Загружаем переменные окружения
 load_dotenv()
 
@@ -25,62 +27,41 @@ cloudinary.config(
     api_secret=API_SECRET
 )
 
-def reupload_file(file_path, cloudinary_folder, public_id_name):
-    """Перезагружает файл с правильным public_id"""
-    try:
-        ext = file_path.suffix.lower()
-        if ext in ['.mp4', '.mov', '.MOV', '.MP4', '.avi', '.webm']:
-            resource_type = "video"
-        else:
-            resource_type = "image"
-        
-        # Формируем public_id: folder/name (без расширения)
-        if cloudinary_folder:
-            public_id = f"{cloudinary_folder}/{public_id_name}"
-        else:
-            public_id = public_id_name
-        
-        # Загружаем с явным указанием public_id
-        result = cloudinary.uploader.upload(
-            str(file_path),
-            public_id=public_id,
-            resource_type=resource_type,
-            overwrite=True,
-            invalidate=True
-        )
-        
-        print(f"  OK: {public_id} (from {file_path.name})")
-        return True
-    except Exception as e:
-        print(f"  ERROR: {file_path.name}: {str(e)}")
-        return False
-
-def reupload_folder(folder_path, cloudinary_folder):
+def reupload_folder(folder_path, cloudinary_folder, engine):
     """Перезагружает все файлы из папки с правильными именами"""
-    folder = Path(folder_path)
-    
-    if not folder.exists():
+    if not Path(folder_path).exists():
         print(f"WARNING: Folder {folder_path} not found, skipping...")
-        return 0, 0
-    
-    uploaded = 0
-    failed = 0
-    
+        return 0, 0, 0
+
     print(f"\nReuploading files from {folder_path} with correct names...")
-    
-    for file_path in folder.rglob('*'):
-        if file_path.is_file():
-            # Используем имя файла БЕЗ расширения как public_id
-            public_id_name = file_path.stem  # Например, "250" из "250.png"
-            
-            if reupload_file(file_path, cloudinary_folder, public_id_name):
-                uploaded += 1
-            else:
-                failed += 1
-    
-    return uploaded, failed
+
+    # public_id: folder/name, где name - имя файла БЕЗ расширения (например, "250" из "250.png")
+    tasks = collect_tasks(folder_path, cloudinary_folder)
+
+    def on_result(task, result, error):
+        if error is None:
+            print(f"  OK: {task.public_id} (from {task.path.name})")
+        else:
+            print(f"  ERROR: {task.path.name}: {str(error)}")
+
+    stats = engine.run(tasks, on_result)
+    print(f"  {stats.summary()}")
+    return stats.files, stats.failed, stats.skipped
 
 def main():
+    parser = argparse.ArgumentParser(description='Reupload files to Cloudinary with correct public_id')
+    parser.add_argument('--force', action='store_true',
+                        help='reupload every file, even if it has not changed since the last upload')
+    args = parser.parse_args()
+
+    # Файлы, уже загруженные под тем же public_id и не изменившиеся с тех пор, пропускаются
+    manifest = UploadManifest.load()
+    if args.force:
+        manifest.resources = {}
+    # Кэш CDN сбрасывается в конце и только для перезаписанных файлов, а не при каждой загрузке
+    invalidations = InvalidationQueue.load()
+    engine = UploadEngine(upload_options={'overwrite': True}, manifest=manifest, invalidations=invalidations)
+
     print("="*60)
     print("Reuploading files to Cloudinary with correct public_id")
     print("This will fix the issue with renamed files (250_xxx -> 250)")
@@ -88,6 +69,7 @@ def main():
     
     total_uploaded = 0
     total_failed = 0
+    total_skipped = 0
     
     folders_to_reupload = [
         ("images", "images"),
@@ -96,14 +78,23 @@ def main():
     ]
     
     for local_folder, cloudinary_folder in folders_to_reupload:
-        uploaded, failed = reupload_folder(local_folder, cloudinary_folder)
+        uploaded, failed, skipped = reupload_folder(local_folder, cloudinary_folder, engine)
         total_uploaded += uploaded
         total_failed += failed
+        total_skipped += skipped
+    
+    overwritten = len(invalidations.pending)
+    purged, purge_failed = invalidations.flush()
     
     print("\n" + "="*60)
     print(f"Reupload complete!")
     print(f"  Uploaded: {total_uploaded} files")
+    print(f"  Unchanged (skipped): {total_skipped} files")
     print(f"  Failed: {total_failed} files")
+    print(f"  CDN invalidations: {purged} of {overwritten} overwritten files "
+          f"(per-upload invalidation would have made {invalidations.uploads})")
+    if purge_failed:
+        print(f"  WARNING: {purge_failed} invalidations failed, they will be retried on the next run")
     print("="*60)
     
     if total_failed == 0:
@@ -72,23 +72,26 @@ let squareBlinkState = new Map(); // Состояние мигания кажд
 let allTags = []; // Все уникальные теги
 let tags = []; // Массив объектов тегов с позициями
 let activeTag = null; // Активный тег (null = все иконки)
+let tagPostings = null; // Индекс тегов из portfolio_tags.json: тег -> Set id проектов
+let tagIndexUrl = 'portfolio_tags.json';
 let tagElements = []; // DOM элементы тегов
 let isTagAnimationRunning = false; // Флаг для отслеживания анимации тегов
+
+// Шарды с полными данными проектов (null = загружен полный portfolio_data.json)
+let portfolioDetails = null;
+const detailShardRequests = new Map(); // URL шарда -> Promise с его содержимым
 const MIN_ICON_DISTANCE = 150; // Минимальное расстояние между иконками
 
 // ========== ЗАГРУЗКА ДАННЫХ ==========
 async function loadPortfolioData() {
     try {
         console.log('Начинаем загрузку данных портфолио...');
-        // Загружаем данные портфолио
-        const response = await fetch('portfolio_data.json');
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        portfolioData = await response.json();
+        // Загружаем компактный индекс портфолио (полные данные подгружаются при открытии проекта)
+        portfolioData = await loadPortfolioItems();
         console.log(`Данные портфолио загружены: ${portfolioData.length} элементов`);
         
-        // Извлекаем теги из данных
+        // Загружаем готовый индекс тегов (если есть) и извлекаем теги
+        await loadTagIndex();
         extractTags();
         
         // Пытаемся загрузить координаты фигур (если есть)
@@ -118,31 +121,126 @@ async function loadPortfolioData() {
     }
 }
 
+// Загружает portfolio_index.json (id, thumbnail, название, теги),
+// а если его нет - полный portfolio_data.json
+async function loadPortfolioItems() {
+    try {
+        const indexResponse = await fetch('portfolio_index.json');
+        if (indexResponse.ok) {
+            const index = await indexResponse.json();
+            portfolioDetails = { shardSize: index.shard_size, dir: index.details_dir };
+            if (index.tags_path) {
+                tagIndexUrl = `${index.tags_path}?v=${index.tags_revision}`;
+            }
+            console.log(`Загружен индекс портфолио, полные данные будут подгружаться из ${index.details_dir}/`);
+            return index.items;
+        }
+    } catch (e) {
+        console.log('Индекс portfolio_index.json недоступен, загружаем полный portfolio_data.json');
+    }
+
+    const response = await fetch('portfolio_data.json');
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return response.json();
+}
+
+// Путь к шарду с полными данными проекта (шарды разбиты по диапазонам id)
+function getDetailShardUrl(id) {
+    const start = Math.floor((id - 1) / portfolioDetails.shardSize) * portfolioDetails.shardSize + 1;
+    const end = start + portfolioDetails.shardSize - 1;
+    return `${portfolioDetails.dir}/${start}-${end}.json`;
+}
+
+// Подгружает полные данные проекта (путь к файлу, описание) и дописывает их в item
+async function loadProjectDetails(item) {
+    if (!portfolioDetails || item.media.path) {
+        return item;
+    }
+
+    const url = getDetailShardUrl(item.id);
+    if (!detailShardRequests.has(url)) {
+        const request = fetch(url).then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            return response.json();
+        });
+        // При ошибке даем возможность повторить загрузку
+        request.catch(() => detailShardRequests.delete(url));
+        detailShardRequests.set(url, request);
+    }
+
+    const shard = await detailShardRequests.get(url);
+    const details = shard.find(entry => entry.id === item.id);
+    if (details) {
+        Object.assign(item, details);
+    }
+    return item;
+}
+
 // ========== СИСТЕМА ТЕГОВ ==========
+// Загружает portfolio_tags.json: отсортированные теги и id проектов по каждому тегу
+async function loadTagIndex() {
+    try {
+        const response = await fetch(tagIndexUrl);
+        if (!response.ok) {
+            return;
+        }
+        const index = await response.json();
+        tagPostings = new Map(Object.entries(index.postings).map(([tag, ids]) => [tag, new Set(ids)]));
+        allTags = index.tags;
+        console.log(`Индекс тегов загружен (ревизия ${index.revision}): ${allTags.length} тегов`);
+    } catch (e) {
+        console.log('Индекс тегов portfolio_tags.json не найден, теги будут извлечены из данных');
+    }
+}
+
+// Теги элемента: из индекса (посчитаны при сборке) или из колонок col_2, col_3, col_4
+function getItemTags(item) {
+    if (Array.isArray(item.tags)) {
+        return item.tags;
+    }
+    const itemTags = [];
+    if (item.additional) {
+        ['col_2', 'col_3', 'col_4'].forEach(colKey => {
+            const tag = item.additional[colKey];
+            if (tag && typeof tag === 'string') {
+                const trimmedTag = tag.trim();
+                // Игнорируем пустые значения, URL и очень короткие строки (меньше 2 символов)
+                if (trimmedTag.length >= 2 && 
+                    !trimmedTag.startsWith('http') && 
+                    !trimmedTag.startsWith('www.') &&
+                    trimmedTag !== 'с' && // Игнорируем одиночные буквы
+                    trimmedTag.length < 100 && // Игнорируем слишком длинные значения (вероятно описания)
+                    !itemTags.includes(trimmedTag)) {
+                    itemTags.push(trimmedTag);
+                }
+            }
+        });
+    }
+    return itemTags;
+}
+
 function extractTags() {
+    // Теги уже посчитаны при сборке
+    if (tagPostings) {
+        return;
+    }
+
     const tagSet = new Set();
     let processedItems = 0;
     let foundTagsCount = 0;
     
     // Извлекаем все теги из col_2, col_3, col_4 (колонки C, D, E в Excel)
     portfolioData.forEach((item, itemIndex) => {
-        if (item.additional) {
-            ['col_2', 'col_3', 'col_4'].forEach(colKey => {
-                const tag = item.additional[colKey];
-                if (tag && typeof tag === 'string') {
-                    const trimmedTag = tag.trim();
-                    // Игнорируем пустые значения, URL и очень короткие строки (меньше 2 символов)
-                    if (trimmedTag.length >= 2 && 
-                        !trimmedTag.startsWith('http') && 
-                        !trimmedTag.startsWith('www.') &&
-                        trimmedTag !== 'с' && // Игнорируем одиночные буквы
-                        trimmedTag.length < 100) { // Игнорируем слишком длинные значения (вероятно описания)
-                        tagSet.add(trimmedTag);
-                        foundTagsCount++;
-                        if (foundTagsCount <= 5) { // Показываем первые 5 найденных тегов для отладки
-                            console.log(`Найден тег в item ${item.id}, ${colKey}: "${trimmedTag}"`);
-                        }
-                    }
+        if (item.tags || item.additional) {
+            getItemTags(item).forEach(tag => {
+                tagSet.add(tag);
+                foundTagsCount++;
+                if (foundTagsCount <= 5) { // Показываем первые 5 найденных тегов для отладки
+                    console.log(`Найден тег в item ${item.id}: "${tag}"`);
                 }
             });
             processedItems++;
@@ -381,23 +479,15 @@ function filterIconsByTag(selectedTag) {
     
     // Нормализуем выбранный тег для сравнения (убираем лишние пробелы)
     const normalizedSelectedTag = selectedTag.trim();
+    // id проектов с этим тегом из индекса тегов (null - индекса нет)
+    const taggedIds = tagPostings ? (tagPostings.get(normalizedSelectedTag) || new Set()) : null;
     
     icons.forEach((icon, index) => {
         const item = icon.item;
-        let hasTag = false;
-        
-        if (item.additional) {
-            ['col_2', 'col_3', 'col_4'].forEach(colKey => {
-                const tag = item.additional[colKey];
-                if (tag && typeof tag === 'string') {
-                    // Простое сравнение с нормализацией пробелов
-                    const normalizedTag = tag.trim();
-                    if (normalizedTag === normalizedSelectedTag) {
-                        hasTag = true;
-                    }
-                }
-            });
-        }
+        // Поиск по индексу тегов, без него - простое сравнение с нормализацией пробелов
+        const hasTag = taggedIds
+            ? taggedIds.has(item.id)
+            : getItemTags(item).includes(normalizedSelectedTag);
         
         if (hasTag) {
             // Проверяем, что проект с таким ID еще не добавлен (избегаем дубликатов)
@@ -735,18 +825,79 @@ function getCloudinaryUrlWithFallback(baseUrl, fileNumber, folder) {
 }
 
 // Функция для оптимизации Cloudinary URL с параметрами трансформации
+// ========== АДАПТИВНЫЕ ВЕРСИИ ИЗОБРАЖЕНИЙ ==========
+// Форматы, которые поддерживает браузер (AVIF проверяется асинхронно при загрузке)
+const supportedImageTypes = new Set(['image/webp']);
+const AVIF_TEST_IMAGE = 'data:image/avif;base64,AAAAIGZ0eXBhdmlmAAAAAGF2aWZtaWYxbWlhZk1BMUIAAADybWV0YQAAAAAAAAAoaGRscgAAAAAAAAAAcGljdAAAAAAAAAAAAAAAAGxpYmF2aWYAAAAADnBpdG0AAAAAAAEAAAAeaWxvYwAAAABEAAABAAEAAAABAAABGgAAAB0AAAAoaWluZgAAAAAAAQAAABppbmZlAgAAAAABAABhdjAxQ29sb3IAAAAAamlwcnAAAABLaXBjbwAAABRpc3BlAAAAAAAAAAIAAAACAAAAEHBpeGkAAAAAAwgICAAAAAxhdjFDgQ0MAAAAABNjb2xybmNseAACAAIAAYAAAAAXaXBtYQAAAAAAAAABAAEEAQKDBAAAACVtZGF0EgAKCBgANogQEAwgMg8f8D///8WfhwB8+ErK42A=';
+
+(function detectImageSupport() {
+    const canvas = document.createElement('canvas');
+    if (!canvas.toDataURL('image/webp').startsWith('data:image/webp')) {
+        supportedImageTypes.delete('image/webp');
+    }
+    const avif = new Image();
+    avif.onload = () => supportedImageTypes.add('image/avif');
+    avif.src = AVIF_TEST_IMAGE;
+})();
+
+// Выбирает самую маленькую версию, которая не меньше нужной ширины (с учетом плотности экрана)
+// Возвращает null, если версий нет или браузер не поддерживает их форматы
+function pickRendition(renditions, displayWidth) {
+    if (!renditions || renditions.length === 0) return null;
+    const preferred = ['image/avif', 'image/webp'].find(type =>
+        supportedImageTypes.has(type) && renditions.some(r => r.type === type));
+    if (!preferred) return null;
+
+    const needed = displayWidth * (window.devicePixelRatio || 1);
+    const candidates = renditions
+        .filter(r => r.type === preferred)
+        .sort((a, b) => a.width - b.width);
+    const fitting = candidates.find(r => r.width >= needed);
+    return (fitting || candidates[candidates.length - 1]).url;
+}
+
+// Параметры трансформаций Cloudinary (w_400, c_fill, e_grayscale, $var_...): по ним сегмент
+// трансформаций отличается от папки public_id вроде my_folder. Тот же список - в cloudinary_urls.py
+const CLOUDINARY_TRANSFORMATION_PARAM = /^(?:a|ac|af|ar|b|bo|br|c|co|cs|d|dl|dn|dpr|du|e|eo|f|fl|fn|fps|g|h|if|ki|l|o|p|pg|q|r|so|sp|t|u|vc|vs|w|x|y|z|\$\w+)_[^/]*$/;
+
+// Трансформации сразу после /upload/ без параметров доставки из portfolio_data.json: f_, q_
+// и c_limit,w_N у thumbnail (как custom_transformations в cloudinary_urls.py). Обрезка и эффекты
+// (c_fill,w_200, e_grayscale) остаются; возвращает [сегменты трансформаций, остаток пути]
+function splitCloudinaryTransformations(path) {
+    const segments = path.split('/');
+    const kept = [];
+    while (segments.length > 1 &&
+           segments[0].split(',').every(component => CLOUDINARY_TRANSFORMATION_PARAM.test(component))) {
+        const components = segments.shift().split(',');
+        const thumbnailLimit = components.includes('c_limit');
+        const custom = components.filter(component => !(
+            component.startsWith('f_') || component.startsWith('q_') ||
+            (thumbnailLimit && (component === 'c_limit' || component.startsWith('w_')))
+        ));
+        if (custom.length) kept.push(custom.join(','));
+    }
+    return [kept, segments.join('/')];
+}
+
 function optimizeCloudinaryUrl(url, width = 80, height = 80) {
-    if (!url || !url.includes('cloudinary.com')) {
+    if (!url || !url.includes('cloudinary.com') || !url.includes('/upload/')) {
         return url;
     }
     
-    // Проверяем, есть ли уже трансформации в URL
-    if (url.includes('/upload/') && !url.includes('/upload/w_')) {
-        // Добавляем оптимизацию: w_80, h_80, c_fill (обрезка), q_auto (авто качество), f_webp (WebP формат)
-        url = url.replace('/upload/', `/upload/w_${width},h_${height},c_fill,q_auto,f_webp/`);
-    }
-    
-    return url;
+    // Заменяем доставку из данных на размер иконки, а не добавляем второе звено цепочки:
+    // w_80, h_80, c_fill (обрезка), q_auto (авто качество), f_webp (WebP формат)
+    const position = url.indexOf('/upload/') + '/upload/'.length;
+    const [custom, rest] = splitCloudinaryTransformations(url.slice(position));
+    const icon = `w_${width},h_${height},c_fill,q_auto,f_webp`;
+    return url.slice(0, position) + [...custom, icon, rest].join('/');
+}
+
+// URL миниатюры иконки: для локальных файлов подходящая адаптивная версия (AVIF/WebP),
+// если ее нет - thumbnail или оригинал, оптимизированный для Cloudinary (уменьшаем размер и используем WebP).
+// Тот же URL берет предзагрузка, чтобы браузер не скачивал оригинал и версию дважды
+function iconThumbnailUrl(media) {
+    return pickRendition(media.thumbnail_srcset, iconSize) ||
+        optimizeCloudinaryUrl(media.thumbnail || media.path, iconSize, iconSize);
 }
 
 function createIconElement(icon) {
@@ -762,12 +913,9 @@ function createIconElement(icon) {
 
     // Создаем медиа элемент с использованием thumbnails для галереи
     let mediaElement;
-    let thumbnailPath = icon.item.media.thumbnail || icon.item.media.path;
+    const thumbnailPath = iconThumbnailUrl(icon.item.media);
     let fullPath = icon.item.media.path;
     
-    // Оптимизируем thumbnail URL для Cloudinary (уменьшаем размер и используем WebP)
-    thumbnailPath = optimizeCloudinaryUrl(thumbnailPath, iconSize, iconSize);
-    
     // Извлекаем номер файла для возможного fallback
     const fileNumberMatch = icon.item.media.filename.match(/^(\d+)/);
     const fileNumber = fileNumberMatch ? fileNumberMatch[1] : null;
@@ -779,7 +927,9 @@ function createIconElement(icon) {
         mediaElement.dataset.src = thumbnailPath;
         mediaElement.alt = getTitle(icon.item) || 'Работа';
         mediaElement.decoding = 'async';
-        mediaElement.dataset.fullVideo = fullPath; // Сохраняем путь к полному видео
+        if (fullPath) {
+            mediaElement.dataset.fullVideo = fullPath; // Сохраняем путь к полному видео
+        }
         mediaElement.dataset.isVideo = 'true';
         
         // Обработчик ошибки загрузки - пробуем альтернативные варианты
@@ -798,7 +948,9 @@ function createIconElement(icon) {
         mediaElement.dataset.src = thumbnailPath;
         mediaElement.alt = getTitle(icon.item) || 'Работа';
         mediaElement.decoding = 'async';
-        mediaElement.dataset.fullImage = fullPath; // Сохраняем путь к полному изображению
+        if (fullPath) {
+            mediaElement.dataset.fullImage = fullPath; // Сохраняем путь к полному изображению
+        }
         
         // Обработчик ошибки загрузки
         mediaElement.onerror = function() {
@@ -919,11 +1071,7 @@ function preloadVisibleIcons() {
         const icon = icons[index];
         if (!icon || !icon.item || !icon.item.media) return;
         
-        const thumbnailPath = optimizeCloudinaryUrl(
-            icon.item.media.thumbnail || icon.item.media.path, 
-            iconSize, 
-            iconSize
-        );
+        const thumbnailPath = iconThumbnailUrl(icon.item.media);
         
         // Избегаем дубликатов
         if (preloadedUrls.has(thumbnailPath)) return;
@@ -1647,6 +1795,17 @@ window.openModal = function openModal(item) {
     }
     lastModalOpenTime = now;
     
+    // В индексе нет пути к полному файлу и описания - подгружаем их из шарда
+    if (!item.media.path) {
+        loadProjectDetails(item)
+            .then(renderModal)
+            .catch(error => console.error('Ошибка загрузки данных проекта:', error));
+        return;
+    }
+    renderModal(item);
+}
+
+function renderModal(item) {
     console.log('openModal: открываем модальное окно для', item.id);
     
     const modal = document.getElementById('modal');
@@ -1659,9 +1818,14 @@ window.openModal = function openModal(item) {
     modalVideo.style.display = 'none';
 
     // В модальном окне загружаем полные файлы в хорошем качестве
-    const fullPath = item.media.path;
+    // (адаптивную версию по ширине окна, если она есть)
+    const fullPath = item.media.type === 'video'
+        ? item.media.path
+        : pickRendition(item.media.srcset, window.innerWidth) || item.media.path;
     
     if (item.media.type === 'video') {
+        // Кадр-постер из Cloudinary показывается, пока видео загружается
+        modalVideo.poster = item.media.poster || '';
         modalVideo.src = fullPath;
         modalVideo.style.display = 'block';
         modalVideo.load(); // Принудительно загружаем видео
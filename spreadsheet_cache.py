@@ -0,0 +1,138 @@
+"""
+Кэш разобранных Excel файлов
+pd.read_excel через openpyxl - самый медленный шаг сборки. Разобранные листы сохраняются
+в бинарном колоночном формате (Parquet, если установлен pyarrow, иначе pickle) с ключом
+по хэшу содержимого книги, поэтому неизмененная книга загружается за миллисекунды
+"""
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from build_manifest import hash_file
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = '.spreadsheet_cache'
+
+# Parquet доступен только с установленным pyarrow
+HAS_PARQUET = importlib.util.find_spec('pyarrow') is not None
+
+
+def _snapshot_key(workbook_hash, sheet_name, header):
+    options = json.dumps([CACHE_VERSION, repr(sheet_name), repr(header)])
+    return hashlib.sha256(f'{workbook_hash}|{options}'.encode('utf-8')).hexdigest()[:24]
+
+
+def _write_sheet(df, base_path):
+    """
+    Сохраняет лист в Parquet, если он читается обратно без изменений, иначе в pickle
+    (Parquet не поддерживает колонки со смешанными типами и нестроковые имена колонок)
+    Возвращает имя файла
+    """
+    if HAS_PARQUET:
+        columnar = df.copy()
+        columnar.columns = [str(col) for col in df.columns]
+        try:
+            columnar.to_parquet(base_path + '.parquet', index=True)
+            restored = pd.read_parquet(base_path + '.parquet')
+            restored.columns = df.columns
+            if restored.equals(df) and (restored.dtypes == df.dtypes).all():
+                return os.path.basename(base_path) + '.parquet'
+        except (TypeError, ValueError, ImportError, ArithmeticError) as e:
+            print(f"  Лист сохраняется в pickle вместо Parquet: {e}")
+        if os.path.exists(base_path + '.parquet'):
+            os.remove(base_path + '.parquet')
+    df.to_pickle(base_path + '.pkl')
+    return os.path.basename(base_path) + '.pkl'
+
+
+def _read_sheet(path, columns):
+    if path.endswith('.parquet'):
+        df = pd.read_parquet(path)
+        df.columns = columns
+        return df
+    return pd.read_pickle(path)
+
+
+def _encode_column(col):
+    # Имена колонок при header=None - числа, при header=0 - значения первой строки
+    if isinstance(col, (int, np.integer)) and not isinstance(col, bool):
+        return {'int': int(col)}
+    if isinstance(col, (float, np.floating)):
+        return {'float': float(col)}
+    return {'str': str(col)}
+
+
+def _restore_column(encoded):
+    for kind in ('int', 'float', 'str'):
+        if kind in encoded:
+            return encoded[kind]
+
+
+def _remove_snapshots(cache_dir, source, sheet_name, header):
+    if not os.path.isdir(cache_dir):
+        return
+    for name in os.listdir(cache_dir):
+        meta_path = os.path.join(cache_dir, name, 'meta.json')
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if (meta.get('source') == source and meta.get('sheet_name') == repr(sheet_name)
+                and meta.get('header') == repr(header)):
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+
+
+def read_excel_cached(path, sheet_name=0, header=0, refresh=False, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Аналог pd.read_excel(path, sheet_name=sheet_name, header=header) с кэшем
+    sheet_name=None возвращает словарь всех листов, как pd.read_excel
+    refresh=True принудительно перечитывает книгу и обновляет кэш
+    """
+    path = str(path)
+    workbook_hash = hash_file(path)
+    key = _snapshot_key(workbook_hash, sheet_name, header)
+    snapshot_dir = os.path.join(cache_dir, key)
+    meta_path = os.path.join(snapshot_dir, 'meta.json')
+
+    if not refresh and os.path.exists(meta_path):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            sheets = {
+                sheet['name']: _read_sheet(os.path.join(snapshot_dir, sheet['file']),
+                                           [_restore_column(col) for col in sheet['columns']])
+                for sheet in meta['sheets']
+            }
+            return sheets if sheet_name is None else sheets[meta['sheets'][0]['name']]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠ Кэш таблицы {path} поврежден, книга будет перечитана: {e}")
+
+    result = pd.read_excel(path, sheet_name=sheet_name, header=header)
+    sheets = result if sheet_name is None else {sheet_name: result}
+
+    # Старые снимки этой же книги больше не нужны
+    _remove_snapshots(cache_dir, os.path.abspath(path), sheet_name, header)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    meta = {
+        'version': CACHE_VERSION,
+        'source': os.path.abspath(path),
+        'sheet_name': repr(sheet_name),
+        'header': repr(header),
+        'sheets': []
+    }
+    for position, (name, df) in enumerate(sheets.items()):
+        file_name = _write_sheet(df, os.path.join(snapshot_dir, f'sheet_{position}'))
+        meta['sheets'].append({
+            'name': name,
+            'file': file_name,
+            'columns': [_encode_column(col) for col in df.columns]
+        })
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return result
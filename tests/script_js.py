@@ -0,0 +1,35 @@
+"""
+Запуск функций из script.js в node для сравнения с Python-частью сборки
+Функции берутся из script.js как есть; без node тесты с ними пропускаются
+"""
+import json
+import os
+import shutil
+import subprocess
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'script.js')
+NODE = shutil.which('node')
+
+
+def script_function(name):
+    """Исходный код функции верхнего уровня из script.js"""
+    with open(SCRIPT_PATH, 'r', encoding='utf-8') as f:
+        source = f.read()
+    start = source.index(f'function {name}(')
+    return source[start:source.index('\n}\n', start) + 2]
+
+
+def script_constant(name):
+    """Объявление константы верхнего уровня из script.js (одна строка)"""
+    with open(SCRIPT_PATH, 'r', encoding='utf-8') as f:
+        source = f.read()
+    start = source.index(f'const {name} = ')
+    return source[start:source.index('\n', start) + 1]
+
+
+def run_node(code, data):
+    """Выполняет код в node; data доступна как DATA, результат - JSON из stdout"""
+    program = f'const DATA = JSON.parse(require("fs").readFileSync(0, "utf8"));\n{code}'
+    result = subprocess.run([NODE, '-e', program], input=json.dumps(data), capture_output=True,
+                            text=True, encoding='utf-8', check=True)
+    return json.loads(result.stdout)
@@ -0,0 +1,82 @@
+"""Сверка локальных файлов, инвентаря Cloudinary и URL сайта (check_cloudinary_structure.audit)"""
+import os
+import tempfile
+import unittest
+
+from check_cloudinary_structure import audit, number_key
+from cloudinary_inventory import CloudinaryInventory
+
+BASE = 'https://res.cloudinary.com/demo/image/upload/'
+
+
+def resource(public_id, size, created_at='2026-01-01T00:00:00Z'):
+    return {'public_id': public_id, 'bytes': size, 'created_at': created_at}
+
+
+class AuditTest(unittest.TestCase):
+    def setUp(self):
+        # audit читает локальные папки относительно текущей
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        files = {'images/1.png': 10, 'images/2.png': 20, 'images/3.png': 30, 'images/4.mp4': 40,
+                 'icons/1.png': 5}
+        for path, size in files.items():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(b'x' * size)
+
+        self.inventory = CloudinaryInventory.open(':memory:')
+        # 1 совпадает, 2 переименован Cloudinary (2_abc) и отличается размером,
+        # 3 не загружен, 4 (видео) совпадает, 9 и 1_old - лишние в Cloudinary
+        self.inventory.apply_full('images', 'image', [resource('images/1', 10), resource('images/2_abc', 21),
+                                                      resource('images/9_xyz', 90), resource('images/1_old', 10)])
+        self.inventory.apply_full('images', 'video', [resource('images/4', 40)])
+        self.inventory.apply_full('icons', 'image', [resource('icons/1', 5)])
+
+    def tearDown(self):
+        self.inventory.close()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def run_audit(self, items=()):
+        return audit(self.inventory, ['images', 'icons'], list(items))
+
+    def test_buckets(self):
+        report = self.run_audit()
+        self.assertEqual(report['missing'], [{'resource_type': 'image', 'public_id': 'images/3',
+                                              'path': 'images/3.png', 'bytes': 30}])
+        self.assertEqual([r['public_id'] for r in report['extra']], ['images/1_old', 'images/9_xyz'])
+        self.assertEqual(report['size_mismatch'], [{'resource_type': 'image', 'public_id': 'images/2_abc',
+                                                    'path': 'images/2.png', 'local_bytes': 20,
+                                                    'remote_bytes': 21}])
+        counts = report['counts']
+        self.assertEqual((counts['local_files'], counts['remote_resources'], counts['matched'], counts['renamed']),
+                         (5, 6, 4, 1))
+
+    def test_broken_urls(self):
+        items = [
+            {'id': 1, 'media': {'path': BASE + 'f_auto,q_auto/images/1.png', 'thumbnail': 'icons/1.png',
+                                'srcset': [{'url': 'renditions/1-400.webp'}]}},
+            {'id': 2, 'media': {'path': BASE + BASE + 'images/2_abc.png',
+                                'thumbnail': BASE + 'c_limit,w_400/icons/7.png'}},
+            # Ресурсы вне проверяемых папок и внешние ссылки не проверяются
+            {'id': 3, 'media': {'path': BASE + 'alisa/alisa04.png', 'thumbnail': 'https://example.com/3.png'}},
+        ]
+        report = self.run_audit(items)
+        self.assertEqual(report['counts']['portfolio_urls'], 7)
+        self.assertEqual([(url['id'], url['field'], url['reason']) for url in report['broken_urls']], [
+            (1, 'srcset', 'local file not found'),
+            (2, 'path', 'doubled Cloudinary host'),
+            (2, 'thumbnail', 'resource not in Cloudinary'),
+        ])
+
+    def test_number_key(self):
+        self.assertEqual(number_key('images/26_egl2kh'), 'images/26')
+        self.assertEqual(number_key('images/26-final'), 'images/26')
+        self.assertIsNone(number_key('images/26'))
+        self.assertIsNone(number_key('alisa/alisa04'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Общий бюджет запросов к Admin API (cloudinary_budget)"""
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import cloudinary.exceptions
+
+from cloudinary_budget import DEFAULT_LIMIT, HIGH, LOW, NORMAL, RESET_PERIOD, ApiBudget, BudgetExhausted
+
+
+class Clock:
+    """Управляемое время: sleep сдвигает часы вместо ожидания"""
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class ApiBudgetTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, '.cloudinary_api_budget.json')
+        self.clock = Clock(1_000 * RESET_PERIOD + 100)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def budget(self, max_wait=0.0):
+        return ApiBudget(self.path, max_wait=max_wait, clock=self.clock, sleep=self.clock.sleep)
+
+    def set_remaining(self, remaining):
+        budget = self.budget()
+        state = budget.state()
+        state['remaining'] = remaining
+        with budget._locked():
+            budget._write(state)
+
+    def test_state_shared_through_file(self):
+        self.budget().acquire()
+        self.budget().acquire()
+        state = self.budget().state()
+        self.assertEqual(state['remaining'], DEFAULT_LIMIT - 2)
+        self.assertEqual(state['reset_at'], 1_001 * RESET_PERIOD)
+
+    def test_reserve_by_priority(self):
+        # Резерв LOW - 20% лимита: 100 оставшихся токенов ему недоступны, HIGH - доступны
+        self.set_remaining(DEFAULT_LIMIT // 5)
+        with self.assertRaises(BudgetExhausted) as context:
+            self.budget().acquire(LOW)
+        self.assertIn('приоритетом low', str(context.exception))
+        self.assertIsInstance(context.exception, cloudinary.exceptions.RateLimited)
+        self.budget().acquire(NORMAL)
+        self.budget().acquire(HIGH)
+
+    def test_waits_for_reset(self):
+        self.set_remaining(0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.budget(max_wait=RESET_PERIOD).acquire(HIGH)
+        self.assertGreaterEqual(self.clock.now, 1_001 * RESET_PERIOD)
+        self.assertEqual(self.budget().state()['remaining'], DEFAULT_LIMIT - 1)
+
+    def test_exhausted_until_reset(self):
+        budget = self.budget()
+        budget.exhausted()
+        with self.assertRaises(BudgetExhausted) as context:
+            budget.acquire(HIGH)
+        self.assertEqual(context.exception.reset_at, 1_001 * RESET_PERIOD)
+
+    def test_call_observes_response_headers(self):
+        class Response(dict):
+            rate_limit_allowed = 1000
+            rate_limit_remaining = 42
+            rate_limit_reset_at = (2026, 10, 18, 12, 0, 0, 0, 0, 0)
+
+        budget = self.budget()
+        self.assertEqual(budget.call(lambda **kwargs: Response(kwargs), prefix='images/'), {'prefix': 'images/'})
+        state = budget.state()
+        self.assertEqual((state['limit'], state['remaining'], budget.calls), (1000, 42, 1))
+
+    def test_rate_limited_response_empties_budget(self):
+        def listing():
+            raise cloudinary.exceptions.RateLimited('Rate Limit Exceeded')
+
+        budget = self.budget()
+        with self.assertRaises(cloudinary.exceptions.RateLimited):
+            budget.call(listing)
+        self.assertEqual(budget.state()['remaining'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
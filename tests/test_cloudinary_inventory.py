@@ -0,0 +1,115 @@
+"""Локальный инвентарь ресурсов Cloudinary (cloudinary_inventory) на поддельном сервере fake_cloudinary"""
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import cloudinary
+
+from cloudinary_budget import ApiBudget
+from cloudinary_inventory import CloudinaryInventory
+from fake_cloudinary import FakeCloudinaryServer
+
+FOLDERS = ['images', 'icons']
+
+
+class InventoryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = FakeCloudinaryServer().start()
+        self.server.configure()
+        self.state = self.server.state
+        # Бюджет Admin API поддельного сервера не должен попадать в общий файл бюджета
+        budget = ApiBudget(os.path.join(self.tmp.name, '.cloudinary_api_budget.json'))
+        patches = [mock.patch.object(ApiBudget, '_shared', budget), contextlib.redirect_stdout(io.StringIO())]
+        for patch in patches:
+            patch.__enter__()
+            self.addCleanup(patch.__exit__, None, None, None)
+        for public_id in ('images/1', 'images/2_abc', 'icons/1', 'other/9'):
+            self.state.store('image', public_id, public_id.encode(), 'file.jpg')
+        self.state.store('video', 'images/3', b'video', 'file.mp4')
+        self.inventory = CloudinaryInventory.open(os.path.join(self.tmp.name, 'inventory.sqlite'))
+
+    def tearDown(self):
+        self.inventory.close()
+        self.server.stop()
+        cloudinary.reset_config()
+        self.tmp.cleanup()
+
+    def public_ids(self, folder, resource_type='image'):
+        return sorted(r['public_id'] for r in self.inventory.resources(folder, resource_type))
+
+    def list_requests(self):
+        return self.state.requests.get('resources', 0)
+
+    def test_first_refresh_is_full(self):
+        self.assertTrue(self.inventory.refresh(FOLDERS))
+        self.assertEqual(self.public_ids('images'), ['images/1', 'images/2_abc'])
+        self.assertEqual(self.public_ids('images', 'video'), ['images/3'])
+        self.assertEqual(self.public_ids('icons'), ['icons/1'])
+        self.assertEqual(self.public_ids('other'), [])
+        # Папка x тип ресурса - отдельный список
+        self.assertEqual(self.list_requests(), 4)
+        self.assertEqual(self.inventory.incremental_runs('image'), 0)
+
+    def test_incremental_refresh(self):
+        self.inventory.refresh(FOLDERS)
+        self.state.store('image', 'images/4_new', b'new', '4.jpg')
+        self.state.store('image', 'other/10', b'other', '10.jpg')
+        before = self.list_requests()
+        self.assertTrue(self.inventory.refresh(FOLDERS))
+        # Один список на тип ресурса, без prefix; чужие папки не сохраняются
+        self.assertEqual(self.list_requests() - before, 2)
+        self.assertEqual(self.public_ids('images'), ['images/1', 'images/2_abc', 'images/4_new'])
+        self.assertEqual(self.public_ids('other'), [])
+        self.assertEqual(self.inventory.incremental_runs('image'), 1)
+
+    def test_incremental_misses_renames_full_finds_them(self):
+        self.inventory.refresh(FOLDERS)
+        self.state.rename('image', 'images/1', 'images/1_renamed')
+        self.state.destroy('image', ['images/2_abc'])
+        self.inventory.refresh(FOLDERS)
+        self.assertEqual(self.public_ids('images'), ['images/1', 'images/2_abc'])
+
+        self.inventory.refresh(FOLDERS, full=True)
+        self.assertEqual(self.public_ids('images'), ['images/1_renamed'])
+        self.assertEqual(self.inventory.incremental_runs('image'), 0)
+
+    def test_periodic_full_refresh(self):
+        self.inventory.refresh(FOLDERS, full_every=2)
+        self.state.rename('image', 'images/1', 'images/1_renamed')
+        self.inventory.refresh(FOLDERS, full_every=2)
+        self.inventory.refresh(FOLDERS, full_every=2)
+        self.assertIn('images/1', self.public_ids('images'))
+        # Третье обновление после двух инкрементальных - полное
+        self.inventory.refresh(FOLDERS, full_every=2)
+        self.assertEqual(self.public_ids('images'), ['images/1_renamed', 'images/2_abc'])
+
+    def test_order_newest_first(self):
+        self.state.store('image', 'images/1_b', b'newer', '1.jpg')
+        self.state.store('image', 'images/1_a', b'newest', '1.jpg')
+        self.inventory.refresh(FOLDERS)
+        self.assertEqual([r['public_id'] for r in self.inventory.resources('images', 'image')],
+                         ['images/1_a', 'images/1_b', 'images/2_abc', 'images/1'])
+
+    def test_same_created_at_ordered_by_public_id(self):
+        resources = [{'public_id': public_id, 'created_at': '2026-01-01T00:00:00Z'}
+                     for public_id in ('images/5_b', 'images/5_a', 'images/5')]
+        self.inventory.apply_full('images', 'image', resources)
+        self.assertEqual([r['public_id'] for r in self.inventory.resources('images')],
+                         ['images/5', 'images/5_a', 'images/5_b'])
+
+    def test_failed_refresh_keeps_sync_state(self):
+        self.inventory.refresh(FOLDERS)
+        last = self.inventory.last_created_at('image')
+        self.state.store('image', 'images/4_new', b'new', '4.jpg')
+        self.state.admin_remaining = 0
+        self.assertFalse(self.inventory.refresh(FOLDERS))
+        self.assertEqual(self.inventory.last_created_at('image'), last)
+        self.assertEqual(self.inventory.incremental_runs('image'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,358 @@
+"""Загрузка в Cloudinary (cloudinary_upload) на локальном поддельном сервере fake_cloudinary"""
+import contextlib
+import hashlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import cloudinary
+import cloudinary.exceptions
+import cloudinary.uploader
+
+from cloudinary_budget import ApiBudget
+from cloudinary_upload import (MIN_CHUNK_SIZE, InvalidationQueue, UploadEngine, UploadJournal, UploadManifest,
+                               UploadTask, collect_tasks, list_remote_resources)
+from fake_cloudinary import FakeCloudinaryServer
+
+
+class FakeServerTest(unittest.TestCase):
+    """
+    Сервер на время теста, папка images/ с файлами, отдельный бюджет Admin API
+    и загрузка без задержек между повторами
+    """
+    server_options = {}
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.images = os.path.join(self.tmp.name, 'images')
+        os.makedirs(self.images)
+        for number in range(1, 6):
+            self.write_file(f'{number}.jpg', f'image {number}'.encode() * 100)
+
+        self.server = FakeCloudinaryServer(seed=1, **self.server_options).start()
+        self.server.configure()
+        # Бюджет Admin API поддельного сервера не должен попадать в общий файл бюджета
+        budget = ApiBudget(os.path.join(self.tmp.name, '.cloudinary_api_budget.json'))
+        patches = [mock.patch('cloudinary_upload.backoff_delay', return_value=0),
+                   mock.patch.object(ApiBudget, '_shared', budget),
+                   contextlib.redirect_stdout(io.StringIO())]
+        for patch in patches:
+            patch.__enter__()
+            self.addCleanup(patch.__exit__, None, None, None)
+
+    def tearDown(self):
+        self.server.stop()
+        cloudinary.reset_config()
+        self.tmp.cleanup()
+
+    def write_file(self, name, data):
+        with open(os.path.join(self.images, name), 'wb') as f:
+            f.write(data)
+
+    def tasks(self):
+        return collect_tasks(self.images, 'images')
+
+    def remote(self, public_id, resource_type='image'):
+        return self.server.state.resources.get((resource_type, public_id))
+
+    def assert_uploaded(self, tasks):
+        for task in tasks:
+            with open(task.path, 'rb') as f:
+                self.assertEqual(self.remote(task.public_id, task.resource_type)['etag'],
+                                 hashlib.md5(f.read()).hexdigest(), task.public_id)
+
+
+class UploadEngineTest(FakeServerTest):
+    def test_collect_tasks(self):
+        self.write_file('6.mp4', b'video')
+        tasks = self.tasks()
+        self.assertEqual([task.public_id for task in tasks], [f'images/{n}' for n in range(1, 7)])
+        self.assertEqual(tasks[-1].resource_type, 'video')
+
+    def test_upload_all(self):
+        results = []
+        stats = UploadEngine(workers=3).run(self.tasks(), on_result=lambda *result: results.append(result))
+        self.assertEqual((stats.files, stats.failed, stats.retries), (5, 0, 0))
+        self.assertEqual(len(results), 5)
+        self.assert_uploaded(self.tasks())
+
+    def test_byte_budget_smaller_than_file(self):
+        # Файл больше лимита одновременно отправляемых байт все равно загружается (один)
+        stats = UploadEngine(workers=3, max_inflight_bytes=10).run(self.tasks())
+        self.assertEqual(stats.files, 5)
+
+
+class RetryTest(FakeServerTest):
+    # Каждый второй ответ сервера - 500
+    server_options = {'error_rate': 0.5}
+
+    def test_transient_errors_retried(self):
+        stats = UploadEngine(workers=1, retries=20).run(self.tasks())
+        self.assertEqual((stats.files, stats.failed), (5, 0))
+        self.assertGreater(stats.retries, 0)
+        self.assertEqual(self.server.state.requests['upload'], 5 + stats.retries)
+        self.assert_uploaded(self.tasks())
+
+    def test_gives_up_after_retries(self):
+        errors = []
+        stats = UploadEngine(workers=1, retries=0).run(
+            self.tasks(), on_result=lambda task, result, error: errors.append(error))
+        self.assertEqual(stats.retries, 0)
+        self.assertEqual(stats.files + stats.failed, 5)
+        self.assertGreater(stats.failed, 0)
+        self.assertTrue(all(isinstance(error, cloudinary.exceptions.Error) for error in errors if error))
+
+
+class PermanentErrorTest(FakeServerTest):
+    def test_permanent_error_not_retried(self):
+        calls = []
+
+        def upload(path, **options):
+            calls.append(options['public_id'])
+            raise cloudinary.exceptions.NotFound('Resource not found')
+
+        stats = UploadEngine(workers=1, retries=5, upload=upload).run(self.tasks()[:2])
+        self.assertEqual((stats.files, stats.failed, stats.retries), (0, 2, 0))
+        self.assertEqual(calls, ['images/1', 'images/2'])
+
+    def test_rate_limit_stops_new_uploads(self):
+        def upload(path, **options):
+            raise cloudinary.exceptions.RateLimited('Rate Limit Exceeded')
+
+        stats = UploadEngine(workers=1, retries=0, upload=upload).run(self.tasks())
+        self.assertTrue(stats.aborted)
+        self.assertLess(stats.failed, 5)
+
+
+class SkipUnchangedTest(FakeServerTest):
+    def setUp(self):
+        super().setUp()
+        self.manifest_path = os.path.join(self.tmp.name, '.upload_manifest.json')
+
+    def run_engine(self):
+        manifest = UploadManifest.load(self.manifest_path)
+        return UploadEngine(workers=2, manifest=manifest).run(self.tasks())
+
+    def uploads(self):
+        return self.server.state.requests.get('upload', 0)
+
+    def test_second_run_skips_everything(self):
+        self.run_engine()
+        stats = self.run_engine()
+        self.assertEqual((stats.files, stats.skipped), (0, 5))
+        self.assertEqual(self.uploads(), 5)
+
+    def test_changed_file_uploaded(self):
+        self.run_engine()
+        self.write_file('3.jpg', b'new content')
+        stats = self.run_engine()
+        self.assertEqual((stats.files, stats.skipped), (1, 4))
+        self.assert_uploaded(self.tasks())
+
+    def test_touched_file_skipped(self):
+        self.run_engine()
+        # mtime изменился, содержимое нет: MD5 совпадает, загрузка не нужна
+        os.utime(os.path.join(self.images, '2.jpg'), ns=(1_000_000_000, 1_000_000_000))
+        stats = self.run_engine()
+        self.assertEqual(stats.skipped, 5)
+        self.assertEqual(UploadManifest.load(self.manifest_path).resources['image/images/2']['mtime'],
+                         1_000_000_000)
+
+    def test_reconcile_remote(self):
+        self.run_engine()
+        # В Cloudinary файл удален, другой перезаписан другим содержимым
+        self.server.state.destroy('image', ['images/1'])
+        self.server.state.store('image', 'images/2', b'changed remotely', '2.jpg')
+        # Третий загружен без манифеста (например, с другого компьютера)
+        manifest = UploadManifest.load(self.manifest_path)
+        del manifest.resources['image/images/3']
+
+        remote = list_remote_resources(['images'])
+        self.assertEqual(manifest.reconcile_remote(self.tasks(), remote), (2, 1))
+        manifest.save()
+        stats = self.run_engine()
+        self.assertEqual((stats.files, stats.skipped), (2, 3))
+        self.assert_uploaded(self.tasks())
+
+
+class UploadJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'upload_journal.jsonl')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_lines(self, lines):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(''.join(lines))
+
+    def test_missing_journal(self):
+        journal = UploadJournal.read(self.path)
+        self.assertEqual(journal.done, {})
+        self.assertFalse(journal.finished)
+
+    def test_record_and_read(self):
+        journal = UploadJournal.open(self.path)
+        journal.record('image/a', {'public_id': 'a'})
+        journal.folder_done('images')
+        journal.close()
+
+        restored = UploadJournal.read(self.path)
+        self.assertEqual(restored.done, {'image/a': {'public_id': 'a'}})
+        self.assertEqual(restored.folders_done, {'images'})
+        self.assertFalse(restored.finished)
+
+    def test_torn_last_line_ignored(self):
+        done = json.dumps({'event': 'done', 'key': 'image/a', 'record': {'public_id': 'a'}})
+        self.write_lines([json.dumps({'event': 'start'}) + '\n', done + '\n', done[:20]])
+        journal = UploadJournal.read(self.path)
+        self.assertEqual(list(journal.done), ['image/a'])
+
+    def test_resume_drops_torn_line(self):
+        done = json.dumps({'event': 'done', 'key': 'image/a', 'record': {'public_id': 'a'}})
+        self.write_lines([done + '\n', done[:20]])
+        journal = UploadJournal.open(self.path, resume=True)
+        journal.record('image/b', {'public_id': 'b'})
+        journal.close()
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            events = [json.loads(line) for line in f]
+        self.assertEqual([event.get('key') for event in events if event['event'] == 'done'],
+                         ['image/a', 'image/b'])
+
+    def test_new_run_discards_previous(self):
+        journal = UploadJournal.open(self.path)
+        journal.record('image/a', {'public_id': 'a'})
+        journal.close()
+        UploadJournal.open(self.path).close()
+        self.assertEqual(UploadJournal.read(self.path).done, {})
+
+    def test_finished_with_failures(self):
+        journal = UploadJournal.open(self.path)
+        journal.record('image/a', {'public_id': 'a'})
+        journal.close(failed=2)
+
+        restored = UploadJournal.read(self.path)
+        self.assertTrue(restored.finished)
+        self.assertEqual(restored.failed, 2)
+        # --resume продолжает такой журнал как обычный, строка end не переносится
+        resumed = UploadJournal.open(self.path, resume=True)
+        resumed.close()
+        self.assertFalse(UploadJournal.read(self.path).finished)
+
+    def test_completed_removes_journal(self):
+        journal = UploadJournal.open(self.path)
+        journal.record('image/a', {'public_id': 'a'})
+        journal.close(completed=True)
+        self.assertFalse(os.path.exists(self.path))
+
+
+class JournalUploadTest(FakeServerTest):
+    def test_engine_records_each_upload(self):
+        path = os.path.join(self.tmp.name, '.upload_journal.jsonl')
+        journal = UploadJournal.open(path)
+        UploadEngine(workers=2, journal=journal).run(self.tasks())
+        journal.close(failed=0)
+
+        restored = UploadJournal.read(path)
+        self.assertEqual(sorted(restored.done), [f'image/images/{n}' for n in range(1, 6)])
+        self.assertEqual(restored.done['image/images/1']['etag'], self.remote('images/1')['etag'])
+
+
+class ChunkedUploadTest(FakeServerTest):
+    def setUp(self):
+        super().setUp()
+        # Три части: две по MIN_CHUNK_SIZE и остаток
+        self.data = os.urandom(2 * MIN_CHUNK_SIZE + 12345)
+        self.write_file('7.mp4', self.data)
+        path = os.path.join(self.images, '7.mp4')
+        self.task = UploadTask(path, 'images/7', 'video', len(self.data))
+
+    def test_large_file_uploaded_in_parts(self):
+        parts = []
+
+        def upload_part(file, http_headers=None, **options):
+            parts.append(http_headers['Content-Range'])
+            return cloudinary.uploader.upload_large_part(file, http_headers=http_headers, **options)
+
+        engine = UploadEngine(large_file_threshold=MIN_CHUNK_SIZE, chunk_size=MIN_CHUNK_SIZE,
+                              upload_part=upload_part)
+        self.assertEqual(engine.inflight_cost(self.task), MIN_CHUNK_SIZE)
+        stats = engine.run([self.task])
+        self.assertEqual((stats.files, stats.failed), (1, 0))
+        size = len(self.data)
+        self.assertEqual(parts, [f'bytes 0-{MIN_CHUNK_SIZE - 1}/{size}',
+                                 f'bytes {MIN_CHUNK_SIZE}-{2 * MIN_CHUNK_SIZE - 1}/{size}',
+                                 f'bytes {2 * MIN_CHUNK_SIZE}-{size - 1}/{size}'])
+        self.assertEqual(self.remote('images/7', 'video')['etag'], hashlib.md5(self.data).hexdigest())
+
+    def test_failed_part_retried_alone(self):
+        parts = []
+
+        def upload_part(file, http_headers=None, **options):
+            parts.append((http_headers['Content-Range'], http_headers['X-Unique-Upload-Id']))
+            if len(parts) == 2:
+                raise cloudinary.exceptions.GeneralError('Server returned unexpected status code - 502')
+            return cloudinary.uploader.upload_large_part(file, http_headers=http_headers, **options)
+
+        engine = UploadEngine(large_file_threshold=MIN_CHUNK_SIZE, chunk_size=MIN_CHUNK_SIZE,
+                              upload_part=upload_part)
+        stats = engine.run([self.task])
+        self.assertEqual((stats.files, stats.retries), (1, 1))
+        # Повторяется только вторая часть, с тем же id загрузки
+        self.assertEqual(len(parts), 4)
+        self.assertEqual(parts[1], parts[2])
+        self.assertEqual(len({upload_id for _, upload_id in parts}), 1)
+        self.assertEqual(self.remote('images/7', 'video')['etag'], hashlib.md5(self.data).hexdigest())
+
+    def test_small_file_not_chunked(self):
+        engine = UploadEngine(large_file_threshold=len(self.data), chunk_size=MIN_CHUNK_SIZE,
+                              upload_part=mock.Mock(side_effect=AssertionError('не должно вызываться')))
+        self.assertEqual(engine.run([self.task]).files, 1)
+        self.assertEqual(self.remote('images/7', 'video')['bytes'], len(self.data))
+
+
+class InvalidationQueueTest(FakeServerTest):
+    def setUp(self):
+        super().setUp()
+        self.queue_path = os.path.join(self.tmp.name, '.cdn_invalidation_queue.json')
+
+    def upload(self, tasks):
+        queue = InvalidationQueue.load(self.queue_path)
+        UploadEngine(workers=2, upload_options={'overwrite': True}, invalidations=queue).run(tasks)
+        return queue
+
+    def test_only_overwritten_files_queued(self):
+        tasks = self.tasks()
+        self.upload(tasks[:3])
+        queue = self.upload(tasks)
+        self.assertEqual(queue.uploads, 5)
+        self.assertEqual(sorted(queue.pending), [('image', 'images/1'), ('image', 'images/2'), ('image', 'images/3')])
+        # Очередь сохранена: прерванный запуск сбросит кэш при следующем
+        self.assertEqual(InvalidationQueue.load(self.queue_path).pending, queue.pending)
+
+    def test_flush_purges_each_resource_once(self):
+        tasks = self.tasks()
+        self.upload(tasks)
+        queue = self.upload(tasks)
+        queue = self.upload(tasks[:2])
+        self.assertEqual(queue.flush(), (5, 0))
+        self.assertEqual(self.server.state.requests['explicit'], 5)
+        self.assertEqual(self.server.state.invalidations, 5)
+        self.assertFalse(os.path.exists(self.queue_path))
+        self.assertEqual(queue.flush(), (0, 0))
+
+    def test_failed_purge_kept_for_next_run(self):
+        queue = InvalidationQueue(self.queue_path)
+        queue.pending = {('image', 'images/1'), ('image', 'images/missing')}
+        self.upload(self.tasks()[:1])
+        self.assertEqual(queue.flush(retries=0), (1, 1))
+        self.assertEqual(InvalidationQueue.load(self.queue_path).pending, {('image', 'images/missing')})
+
+
+if __name__ == '__main__':
+    unittest.main()
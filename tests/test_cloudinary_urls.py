@@ -0,0 +1,151 @@
+"""Разбор и канонические URL доставки Cloudinary (cloudinary_urls)"""
+import unittest
+
+from script_js import NODE, run_node, script_constant, script_function
+from cloudinary_urls import (MEDIA, POSTER, THUMBNAIL, Delivery, build_url, custom_transformations,
+                             delivery_urls, normalize_url, parse_url, poster_url)
+
+DELIVERY = Delivery(format='auto', quality='auto', thumbnail_width=400, poster_offset='0')
+BASE = 'https://res.cloudinary.com/demo/image/upload/'
+VIDEO_BASE = 'https://res.cloudinary.com/demo/video/upload/'
+
+
+class ParseUrlTest(unittest.TestCase):
+    def test_plain(self):
+        parsed = parse_url(BASE + 'v1712345/folder/photo 1.jpg')
+        self.assertEqual(parsed.cloud_name, 'demo')
+        self.assertEqual(parsed.resource_type, 'image')
+        self.assertEqual(parsed.transformations, ())
+        self.assertEqual(parsed.version, 'v1712345')
+        self.assertEqual(parsed.public_id, 'folder/photo 1')
+        self.assertEqual(parsed.extension, 'jpg')
+        self.assertFalse(parsed.doubled)
+
+    def test_transformations(self):
+        parsed = parse_url(BASE + 'c_fill,g_face,w_200/e_grayscale/f_auto,q_auto/icons/icon')
+        self.assertEqual(parsed.transformations, ('c_fill,g_face,w_200', 'e_grayscale', 'f_auto,q_auto'))
+        self.assertEqual(parsed.public_id, 'icons/icon')
+        self.assertIsNone(parsed.extension)
+        self.assertIsNone(parsed.version)
+
+    def test_doubled_host(self):
+        parsed = parse_url('https://res.cloudinary.com/demo/image/upload/' + VIDEO_BASE + 'clip.mp4')
+        self.assertTrue(parsed.doubled)
+        self.assertEqual(parsed.resource_type, 'video')
+        self.assertEqual(parsed.public_id, 'clip')
+
+    def test_folder_is_not_transformation(self):
+        # my_folder похож на параметр по форме, но my - не ключ трансформации Cloudinary
+        parsed = parse_url(BASE + 'my_folder/sub_dir/photo.jpg')
+        self.assertEqual(parsed.transformations, ())
+        self.assertEqual(parsed.public_id, 'my_folder/sub_dir/photo')
+        parsed = parse_url(BASE + 'f_auto,q_auto/my_folder/photo.jpg')
+        self.assertEqual(parsed.transformations, ('f_auto,q_auto',))
+        self.assertEqual(parsed.public_id, 'my_folder/photo')
+        self.assertEqual(normalize_url(BASE + 'my_folder/photo.jpg', MEDIA, DELIVERY),
+                         BASE + 'f_auto,q_auto/my_folder/photo.jpg')
+
+    def test_public_id_only(self):
+        # Единственный сегмент - всегда public_id, даже если похож на трансформацию
+        self.assertEqual(parse_url(BASE + 'w_100.png').public_id, 'w_100')
+
+    def test_not_cloudinary(self):
+        for value in (None, 42, '', 'images/photo.jpg', 'https://example.com/image/upload/a.jpg',
+                      'https://res.cloudinary.com/demo/raw/fetch/a.jpg'):
+            self.assertIsNone(parse_url(value), value)
+
+
+class NormalizeUrlTest(unittest.TestCase):
+    def test_media(self):
+        self.assertEqual(normalize_url(BASE + 'v1/photo.jpg', MEDIA, DELIVERY),
+                         BASE + 'f_auto,q_auto/v1/photo.jpg')
+
+    def test_thumbnail_replaces_delivery(self):
+        url = BASE + 'c_limit,w_800,f_jpg,q_80/icons/icon.png'
+        self.assertEqual(normalize_url(url, THUMBNAIL, DELIVERY),
+                         BASE + 'c_limit,w_400,f_auto,q_auto/icons/icon.png')
+
+    def test_custom_transformations_kept(self):
+        url = BASE + 'c_fill,w_200/e_grayscale/f_png/photo.jpg'
+        self.assertEqual(normalize_url(url, THUMBNAIL, DELIVERY),
+                         BASE + 'c_fill,w_200/e_grayscale/c_limit,w_400,f_auto,q_auto/photo.jpg')
+        self.assertEqual(custom_transformations(('w_800,f_auto',), MEDIA), ('w_800',))
+
+    def test_idempotent(self):
+        urls = [BASE + 'v1/photo.jpg', BASE + BASE + 'c_fill,w_200/photo.jpg', VIDEO_BASE + 'clip.mp4']
+        for url in urls:
+            for kind in (MEDIA, THUMBNAIL, POSTER):
+                once = normalize_url(url, kind, DELIVERY)
+                self.assertEqual(normalize_url(once, kind, DELIVERY), once)
+
+    def test_build_url_is_fixed_point(self):
+        for kind in (MEDIA, THUMBNAIL):
+            url = build_url('icons/icon', 'image', kind, DELIVERY, base_url=BASE)
+            self.assertEqual(normalize_url(url, kind, DELIVERY), url)
+
+    def test_local_path_unchanged(self):
+        self.assertEqual(normalize_url('images/photo.jpg', MEDIA, DELIVERY), 'images/photo.jpg')
+
+    def test_empty_delivery(self):
+        delivery = Delivery(format='', quality='', thumbnail_width=0, poster_offset='0')
+        self.assertEqual(normalize_url(BASE + 'f_auto,q_auto/photo.jpg', THUMBNAIL, delivery),
+                         BASE + 'photo.jpg')
+
+
+class PosterTest(unittest.TestCase):
+    def test_poster(self):
+        self.assertEqual(poster_url(VIDEO_BASE + 'f_auto,q_auto/v2/clip.mp4', DELIVERY),
+                         VIDEO_BASE + 'so_0,f_auto,q_auto/v2/clip.jpg')
+
+    def test_no_poster_for_images(self):
+        self.assertIsNone(poster_url(BASE + 'photo.jpg', DELIVERY))
+        self.assertIsNone(poster_url('images/clip.mp4', DELIVERY))
+
+    def test_delivery_urls_rule(self):
+        changes = delivery_urls({'type': 'video', 'path': VIDEO_BASE + 'clip.mp4',
+                                 'thumbnail': 'icons/clip.jpg'}, {})
+        self.assertEqual(set(changes), {'path', 'poster'})
+
+
+@unittest.skipUnless(NODE, 'node не установлен')
+class OptimizeCloudinaryUrlTest(unittest.TestCase):
+    """optimizeCloudinaryUrl в script.js заменяет только доставку, как normalize_url"""
+
+    def optimize(self, urls):
+        return run_node(script_constant('CLOUDINARY_TRANSFORMATION_PARAM') +
+                        script_function('splitCloudinaryTransformations') +
+                        script_function('optimizeCloudinaryUrl') +
+                        'console.log(JSON.stringify(DATA.map(url => optimizeCloudinaryUrl(url, 80, 80))));',
+                        urls)
+
+    def test_replaces_delivery_only(self):
+        icon = 'w_80,h_80,c_fill,q_auto,f_webp'
+        cases = {
+            BASE + 'c_limit,w_400,f_auto,q_auto/v1/icons/icon.png': BASE + icon + '/v1/icons/icon.png',
+            BASE + 'e_grayscale/c_limit,w_400,f_auto,q_auto/photo.jpg':
+                BASE + 'e_grayscale/' + icon + '/photo.jpg',
+            BASE + 'c_fill,w_200,f_png/photo.jpg': BASE + 'c_fill,w_200/' + icon + '/photo.jpg',
+            BASE + 'my_folder/photo.jpg': BASE + icon + '/my_folder/photo.jpg',
+            BASE + 'w_100.png': BASE + icon + '/w_100.png',
+            'images/photo.jpg': 'images/photo.jpg',
+        }
+        self.assertEqual(self.optimize(list(cases)), list(cases.values()))
+
+    def test_matches_custom_transformations(self):
+        urls = [BASE + 'c_fill,g_face,w_200/e_grayscale/c_limit,w_400,f_auto,q_auto/icons/icon',
+                BASE + 'f_auto,q_auto/my_folder/sub_dir/photo.jpg',
+                BASE + '$w_100,l_logo/fl_layer_apply/v12/photo.jpg']
+        icon = 'w_80,h_80,c_fill,q_auto,f_webp'
+        expected = []
+        for url in urls:
+            parsed = parse_url(url)
+            segments = custom_transformations(parsed.transformations, THUMBNAIL) + (icon,)
+            if parsed.version:
+                segments += (parsed.version,)
+            path = parsed.public_id + (f'.{parsed.extension}' if parsed.extension else '')
+            expected.append(BASE + '/'.join(segments + (path,)))
+        self.assertEqual(self.optimize(urls), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""Предварительное сжатие файлов сайта (compress_assets)"""
+import contextlib
+import gzip
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import compress_assets
+
+
+class CompressAssetsTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        os.makedirs('portfolio_details')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def write_file(self, path, data=b'[{"id":1}]' * 100):
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def compress(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return compress_assets.compress_assets(workers=1)
+
+    def test_compresses_assets_and_shards(self):
+        for path in ('portfolio_data.ndjson', 'portfolio_index.json', 'portfolio_details/1-50.json'):
+            self.write_file(path)
+        results = self.compress()
+        self.assertEqual(sorted(result[0] for result in results),
+                         ['portfolio_data.ndjson', 'portfolio_details/1-50.json', 'portfolio_index.json'])
+        with gzip.open('portfolio_data.ndjson.gz', 'rb') as f:
+            self.assertEqual(f.read(), b'[{"id":1}]' * 100)
+
+    def test_gzip_is_deterministic(self):
+        self.write_file('portfolio_index.json')
+        self.compress()
+        with open('portfolio_index.json.gz', 'rb') as f:
+            first = f.read()
+        self.compress()
+        with open('portfolio_index.json.gz', 'rb') as f:
+            self.assertEqual(f.read(), first)
+
+    def test_removes_stale_compressed_files(self):
+        self.write_file('portfolio_data.json')
+        # Сжатые версии удаленного ndjson и удаленного шарда, старый .br без пакета brotli
+        for path in ('portfolio_data.ndjson.gz', 'portfolio_data.ndjson.br',
+                     'portfolio_details/51-100.json.gz', 'portfolio_data.json.br'):
+            self.write_file(path, b'old')
+        with mock.patch.object(compress_assets, 'brotli', None):
+            self.compress()
+        self.assertEqual(sorted(os.listdir('.')), ['portfolio_data.json', 'portfolio_data.json.gz',
+                                                   'portfolio_details'])
+        self.assertEqual(os.listdir('portfolio_details'), [])
+
+    def test_summarize_shards(self):
+        results = [('portfolio_index.json', 10, 5, None),
+                   (os.path.join('portfolio_details', '1-50.json'), 100, 40, None),
+                   (os.path.join('portfolio_details', '51-100.json'), 50, 20, None)]
+        with mock.patch.object(compress_assets, 'brotli', None):
+            summary = compress_assets.summarize_shards(results)
+        self.assertEqual(summary, [results[0], ('portfolio_details/*.json', 150, 60, None)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""Кэшированный индекс папок с медиафайлами (media_index)"""
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from media_index import MediaIndex
+
+
+class MediaIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.images = os.path.join(self.tmp.name, 'images')
+        self.cache_path = os.path.join(self.tmp.name, '.media_index.json')
+        os.makedirs(self.images)
+        for name in ('1.png', '2_final.mp4', '2.jpg', '10.MOV', 'notes.txt'):
+            self.touch(name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def touch(self, name):
+        with open(os.path.join(self.images, name), 'wb') as f:
+            f.write(b'data')
+
+    def set_dir_mtime(self, mtime_ns):
+        os.utime(self.images, ns=(mtime_ns, mtime_ns))
+
+    def test_by_number(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            numbered = MediaIndex(self.cache_path).by_number(self.images)
+        self.assertEqual(sorted(numbered), [1, 2, 10])
+        self.assertEqual(numbered[10]['type'], 'video')
+        self.assertEqual(numbered[10]['extension'], '.mov')
+        # Конфликт номеров: берется первый по имени, о втором выводится предупреждение
+        self.assertEqual(numbered[2]['filename'], '2.jpg')
+        self.assertIn('2.jpg, 2_final.mp4', output.getvalue())
+
+    def test_cache_round_trip(self):
+        index = MediaIndex(self.cache_path)
+        entries = index.entries(self.images)
+        index.save()
+        self.assertFalse(index.dirty)
+
+        restored = MediaIndex.load(self.cache_path)
+        self.assertEqual(restored.entries(self.images), entries)
+        self.assertFalse(restored.dirty)
+
+    def test_unchanged_directory_not_rescanned(self):
+        self.set_dir_mtime(1_000_000_000)
+        index = MediaIndex(self.cache_path)
+        index.entries(self.images)
+        index.save()
+        # Новый файл без изменения mtime папки не виден: папка не пересканируется
+        self.touch('3.png')
+        self.set_dir_mtime(1_000_000_000)
+        self.assertNotIn(3, MediaIndex.load(self.cache_path).by_number(self.images))
+
+    def test_directory_mtime_invalidates(self):
+        self.set_dir_mtime(1_000_000_000)
+        index = MediaIndex(self.cache_path)
+        index.entries(self.images)
+        index.save()
+        os.remove(os.path.join(self.images, '1.png'))
+        self.touch('3.png')
+        self.set_dir_mtime(2_000_000_000)
+        restored = MediaIndex.load(self.cache_path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            numbered = restored.by_number(self.images)
+        self.assertEqual(sorted(numbered), [2, 3, 10])
+        self.assertTrue(restored.dirty)
+
+    def test_missing_directory(self):
+        self.assertEqual(MediaIndex(None).entries(os.path.join(self.tmp.name, 'icons')), [])
+
+    def test_broken_cache_ignored(self):
+        with open(self.cache_path, 'w', encoding='utf-8') as f:
+            f.write('{')
+        with contextlib.redirect_stdout(io.StringIO()):
+            index = MediaIndex.load(self.cache_path)
+        self.assertEqual(index.directories, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
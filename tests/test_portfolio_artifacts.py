@@ -0,0 +1,86 @@
+"""Индекс для первого экрана и шарды с полными данными (portfolio_artifacts)"""
+import json
+import os
+import tempfile
+import unittest
+
+from portfolio_artifacts import DETAILS_DIR, SHARD_SIZE, SplitWriter, index_entry, shard_range
+from portfolio_writer import read_portfolio
+from script_js import NODE, run_node, script_function
+
+
+def make_item(item_id, **media):
+    return {'id': item_id, 'title': f'Работа {item_id}', 'description': 'Длинное описание ' * 5,
+            'additional': {'col_2': 'LED'},
+            'media': {'filename': f'{item_id}.jpg', 'type': 'image', 'path': f'images/{item_id}.jpg', **media}}
+
+
+class ShardRangeTest(unittest.TestCase):
+    def test_shard_range(self):
+        self.assertEqual(shard_range(1), (1, SHARD_SIZE))
+        self.assertEqual(shard_range(SHARD_SIZE), (1, SHARD_SIZE))
+        self.assertEqual(shard_range(SHARD_SIZE + 1), (SHARD_SIZE + 1, 2 * SHARD_SIZE))
+        self.assertEqual(shard_range(7, shard_size=3), (7, 9))
+
+    @unittest.skipUnless(NODE, 'node не установлен')
+    def test_matches_script_js(self):
+        ids = [1, 2, SHARD_SIZE - 1, SHARD_SIZE, SHARD_SIZE + 1, 2 * SHARD_SIZE, 1234]
+        expected = run_node(
+            f'let portfolioDetails = {{shardSize: {SHARD_SIZE}, dir: "{DETAILS_DIR}"}};\n' +
+            script_function('getDetailShardUrl') +
+            'console.log(JSON.stringify(DATA.map(getDetailShardUrl)));', ids)
+        actual = ['{}/{}-{}.json'.format(DETAILS_DIR, *shard_range(item_id)) for item_id in ids]
+        self.assertEqual(actual, expected)
+
+
+class SplitWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.details_dir = os.path.join(self.tmp.name, DETAILS_DIR)
+        self.index_path = os.path.join(self.tmp.name, 'portfolio_index.json')
+        self.tags_path = os.path.join(self.tmp.name, 'portfolio_tags.json')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, items, shard_size=2):
+        writer = SplitWriter(self.index_path, self.details_dir, shard_size, self.tags_path)
+        for item in items:
+            writer.add(item)
+        writer.close()
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_index_and_shards(self):
+        items = [make_item(1), make_item(2), make_item(3, thumbnail='icons/3.png')]
+        index = self.write(items)
+        self.assertEqual(index['shard_size'], 2)
+        self.assertEqual([entry['id'] for entry in index['items']], [1, 2, 3])
+        self.assertEqual(index['items'][2]['media']['thumbnail'], 'icons/3.png')
+        # Полные данные (описание, путь к файлу) только в шардах
+        self.assertNotIn('description', index['items'][0])
+        self.assertEqual(sorted(os.listdir(self.details_dir)), ['1-2.json', '3-4.json'])
+        self.assertEqual(read_portfolio(os.path.join(self.details_dir, '3-4.json')), items[2:])
+
+    def test_index_entry_thumbnail_fallback(self):
+        self.assertEqual(index_entry(make_item(5))['media']['thumbnail'], 'images/5.jpg')
+
+    def test_out_of_order_items_merged(self):
+        items = [make_item(1), make_item(3), make_item(2)]
+        self.write(items)
+        self.assertEqual([item['id'] for item in read_portfolio(os.path.join(self.details_dir, '1-2.json'))],
+                         [1, 2])
+
+    def test_stale_shards_removed(self):
+        self.write([make_item(1), make_item(5)])
+        self.write([make_item(1)])
+        self.assertEqual(os.listdir(self.details_dir), ['1-2.json'])
+
+    def test_tag_revision_in_index(self):
+        index = self.write([make_item(1)])
+        with open(self.tags_path, 'r', encoding='utf-8') as f:
+            self.assertEqual(index['tags_revision'], json.load(f)['revision'])
+
+
+if __name__ == '__main__':
+    unittest.main()
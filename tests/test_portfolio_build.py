@@ -0,0 +1,116 @@
+"""Инкрементальная сборка portfolio_data.json (portfolio_build, build_manifest)"""
+import json
+import os
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+import build_manifest
+from media_index import MediaIndex
+from portfolio_artifacts import write_artifacts
+from portfolio_build import build_portfolio
+from portfolio_writer import read_portfolio, write_portfolio
+
+
+def png_header(width, height):
+    """Начало PNG файла: сигнатура и IHDR, этого достаточно для чтения размеров"""
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I4sII', 13, b'IHDR', width, height) + b'\x08\x06\x00\x00\x00'
+
+
+class PortfolioBuildTest(unittest.TestCase):
+    def setUp(self):
+        # Сборка пишет индекс, шарды и кэши в текущую папку
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        os.makedirs('images')
+        os.makedirs('icons')
+        self.write_file('images/1.png', png_header(640, 480))
+        self.write_file('images/2.png', png_header(100, 200))
+        self.write_file('icons/1.png', png_header(40, 30))
+        self.df = pd.DataFrame([['Первая', 'Описание первой работы', 'LED'],
+                                ['Вторая', 'Описание второй работы', 'свет']])
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def write_file(self, path, data):
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def build(self, df=None, incremental=False):
+        portfolio = build_portfolio(self.df if df is None else df, 'images', 'icons', incremental=incremental,
+                                    media_index=MediaIndex(cache_path=None))
+        write_artifacts(portfolio, 'portfolio_data.json')
+        portfolio.save_manifest()
+        return read_portfolio('portfolio_data.json')
+
+    def mark_titles(self):
+        """Помечает элементы в файле: в инкрементальной сборке метка остается только у актуальных"""
+        items = read_portfolio('portfolio_data.json')
+        for item in items:
+            item['title'] = 'метка'
+        write_portfolio(items, 'portfolio_data.json')
+
+    def test_full_build(self):
+        items = self.build()
+        self.assertEqual([item['id'] for item in items], [1, 2])
+        self.assertEqual(items[0]['media']['thumbnail'], 'icons/1.png')
+        self.assertEqual(items[1]['media']['thumbnail'], 'images/2.png')
+        self.assertEqual((items[0]['media']['width'], items[0]['media']['height']), (640, 480))
+
+    def test_thumbnail_dimensions(self):
+        items = self.build()
+        self.assertEqual((items[0]['media']['thumbnail_width'], items[0]['media']['thumbnail_height']), (40, 30))
+        # Без иконки thumbnail - сам медиафайл
+        self.assertEqual((items[1]['media']['thumbnail_width'], items[1]['media']['thumbnail_height']), (100, 200))
+        with open('portfolio_index.json', 'r', encoding='utf-8') as f:
+            entry = json.load(f)['items'][0]
+        self.assertEqual((entry['media']['thumbnail_width'], entry['media']['thumbnail_height']), (40, 30))
+
+    def test_incremental_reuses_fresh_items(self):
+        self.build()
+        self.mark_titles()
+        df = self.df.copy()
+        df.iloc[1, 0] = 'Вторая (новое название)'
+        items = self.build(df, incremental=True)
+        self.assertEqual(items[0]['title'], 'метка')
+        self.assertNotEqual(items[1]['title'], 'метка')
+
+    def test_incremental_rebuilds_changed_media(self):
+        self.build()
+        self.mark_titles()
+        self.write_file('icons/1.png', png_header(80, 60))
+        items = self.build(incremental=True)
+        self.assertNotEqual(items[0]['title'], 'метка')
+        self.assertEqual(items[1]['title'], 'метка')
+
+    def test_full_build_ignores_previous_items(self):
+        self.build()
+        self.mark_titles()
+        self.assertNotIn('метка', [item['title'] for item in self.build()])
+
+    def test_full_build_reuses_file_hashes(self):
+        self.build()
+        with mock.patch('build_manifest.hash_file', wraps=build_manifest.hash_file) as hash_file:
+            self.build()
+        hash_file.assert_not_called()
+
+    def test_manifest_saved_only_after_write(self):
+        portfolio = build_portfolio(self.df, 'images', 'icons', media_index=MediaIndex(cache_path=None))
+        # Запись не удалась: папки для выходного файла нет
+        with self.assertRaises(OSError):
+            write_artifacts(portfolio, os.path.join('missing', 'portfolio_data.json'))
+        portfolio.save_manifest()
+        self.assertFalse(os.path.exists(build_manifest.DEFAULT_MANIFEST_PATH))
+
+        self.build()
+        self.assertTrue(os.path.exists(build_manifest.DEFAULT_MANIFEST_PATH))
+
+
+if __name__ == '__main__':
+    unittest.main()
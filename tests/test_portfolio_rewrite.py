@@ -0,0 +1,89 @@
+"""Цепочка правил переписывания URL в portfolio_data.json (portfolio_rewrite)"""
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from portfolio_rewrite import RewriteEngine, RewriteRule, format_diff, rewrite_portfolio
+from portfolio_writer import read_portfolio
+
+UPPER = RewriteRule('upper', lambda media, stats: {'path': media['path'].upper()})
+LOWER = RewriteRule('lower', lambda media, stats: {'path': media['path'].lower()})
+
+
+class RewriteEngineTest(unittest.TestCase):
+    def test_counts_only_net_changes(self):
+        engine = RewriteEngine([UPPER, LOWER])
+        items = [{'id': 1, 'media': {'path': 'images/a.jpg'}}, {'id': 2, 'media': {'path': 'IMAGES/B.JPG'}}]
+        engine.run(items)
+        # Первое правило вернуло значение, которое второе привело к исходному - не засчитывается
+        self.assertEqual(engine.stats['upper']['rewritten'], 0)
+        self.assertEqual(engine.stats['lower']['rewritten'], 1)
+        self.assertEqual(engine.changes, [(2, 'path', 'IMAGES/B.JPG', 'images/b.jpg')])
+        self.assertEqual(engine.unstable, [])
+        self.assertEqual(items[1]['media']['path'], 'images/b.jpg')
+
+    def test_rule_stats_and_none_values(self):
+        def not_found(media, stats):
+            stats['not_found'] += 1
+            return {'thumbnail': None}
+
+        engine = RewriteEngine([RewriteRule('lookup', not_found)])
+        engine.run([{'id': 1, 'media': {'thumbnail': 'icons/1.png'}}])
+        # Повторный прогон (проверка идемпотентности) считается отдельно
+        self.assertEqual(engine.stats['lookup']['not_found'], 1)
+        self.assertEqual(engine.changes, [])
+
+    def test_unstable_rule_detected(self):
+        engine = RewriteEngine([RewriteRule('suffix', lambda media, stats: {'path': media['path'] + '!'})])
+        engine.run([{'id': 1, 'media': {'path': 'a'}}, {'id': 2}])
+        self.assertEqual(engine.items, 2)
+        self.assertEqual(engine.unstable, [(1, 'path', 'a!', 'a!!')])
+        self.assertEqual(engine.unstable_rules['suffix'], 1)
+
+    def test_format_diff(self):
+        diff = format_diff([(1, 'path', 'a', 'b'), (1, 'thumbnail', 'c', 'd')], 'portfolio_data.json')
+        self.assertEqual(diff.splitlines(), ['--- portfolio_data.json', '+++ portfolio_data.json (rewritten)',
+                                             '@@ id 1 @@', '-media.path: a', '+media.path: b',
+                                             '-media.thumbnail: c', '+media.thumbnail: d'])
+
+
+class RewritePortfolioTest(unittest.TestCase):
+    def setUp(self):
+        # Сохранение пишет индекс и шарды сайта в текущую папку
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        self.items = [{'id': 1, 'media': {'filename': '1.jpg', 'type': 'image', 'path': 'IMAGES/1.JPG'}}]
+        with open('portfolio_data.json', 'w', encoding='utf-8') as f:
+            json.dump(self.items, f)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def rewrite(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return rewrite_portfolio([LOWER], 'portfolio_data.json', **kwargs)
+
+    def test_dry_run_writes_nothing(self):
+        engine = self.rewrite(dry_run=True)
+        self.assertEqual(len(engine.changes), 1)
+        self.assertEqual(read_portfolio('portfolio_data.json'), self.items)
+
+    def test_rewrite_and_rerun(self):
+        self.rewrite()
+        self.assertEqual(read_portfolio('portfolio_data.json')[0]['media']['path'], 'images/1.jpg')
+        self.assertTrue(os.path.exists('portfolio_index.json'))
+        self.assertEqual(self.rewrite().changes, [])
+
+    def test_schema_error(self):
+        with open('portfolio_data.json', 'w', encoding='utf-8') as f:
+            json.dump([{'id': 'x'}], f)
+        self.assertIsNone(self.rewrite())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+"""Загрузка и проверка схемы portfolio_data.json (portfolio_store)"""
+import json
+import os
+import tempfile
+import unittest
+
+from portfolio_store import PortfolioSchemaError, PortfolioStore
+
+MEDIA = {'filename': 'a.jpg', 'type': 'image'}
+
+
+class StoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, items):
+        path = os.path.join(self.tmp.name, 'portfolio_data.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(items, f, ensure_ascii=False)
+        return path
+
+    def test_load(self):
+        store = PortfolioStore.load(self.write([{'id': 1, 'title': 'Свет', 'media': MEDIA}]))
+        self.assertEqual(len(store), 1)
+        self.assertEqual(store.get(1)['title'], 'Свет')
+
+    def test_schema_errors_collected(self):
+        path = self.write([{'id': 1, 'media': MEDIA}, {'id': 1, 'media': MEDIA},
+                           {'id': [1], 'media': MEDIA}, {'id': {'a': 1}, 'media': MEDIA},
+                           {'id': True, 'media': {'filename': 1, 'type': 'gif'}}, 'строка'])
+        with self.assertRaises(PortfolioSchemaError) as context:
+            PortfolioStore.load(path)
+        errors = context.exception.errors
+        self.assertIn('элемент id 1: id повторяется', errors)
+        # Нецелые id (в том числе нехешируемые) не доходят до проверки повторов
+        self.assertEqual(sum('id должен быть целым числом' in error for error in errors), 3)
+        self.assertIn('элемент id True: media.type должно быть одним из: image, video', errors)
+        self.assertIn('элемент #5: ожидается объект, а не str', errors)
+
+    def test_load_without_validation(self):
+        self.assertEqual(len(PortfolioStore.load(self.write([{'id': 'x'}]), validate=False)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""Теги работ и обратный индекс тегов (portfolio_tags) в сравнении с extractTags() из script.js"""
+import unittest
+
+from portfolio_tags import build_tag_index, item_tags, js_length
+from script_js import NODE, run_node, script_function
+
+ITEMS = [
+    {'id': 1, 'additional': {'col_2': ' LED ', 'col_3': 'LED', 'col_4': 'инсталляция'}},
+    {'id': 2, 'additional': {'col_2': 'https://example.com', 'col_3': 'www.site.ru', 'col_4': 'с'}},
+    {'id': 3, 'additional': {'col_2': 'x', 'col_3': 'a' * 99, 'col_4': 'a' * 100}},
+    # 49 символов вне BMP - 98 UTF-16 единиц (тег), 50 - ровно 100 (не тег)
+    {'id': 4, 'additional': {'col_2': '😀' * 49, 'col_3': '😀' * 50, 'col_4': '\U0001d11e'}},
+    {'id': 5, 'additional': {'col_2': 'Zebra', 'col_3': 'apple', 'col_4': 'Ёлка'}},
+    {'id': 6, 'additional': {'col_2': '～тильда', 'col_3': '😀 smile', 'col_4': 'Видео'}},
+    {'id': 7, 'additional': {'col_1': 'Не тег', 'col_2': 42, 'col_3': None, 'col_4': '   '}},
+    {'id': 8},
+]
+
+
+class ItemTagsTest(unittest.TestCase):
+    def test_rules(self):
+        self.assertEqual(item_tags(ITEMS[0]), ['LED', 'инсталляция'])
+        self.assertEqual(item_tags(ITEMS[1]), [])
+        self.assertEqual(item_tags(ITEMS[3]), ['😀' * 49, '\U0001d11e'])
+        self.assertEqual(item_tags(ITEMS[6]), [])
+        self.assertEqual(item_tags(ITEMS[7]), [])
+
+    def test_js_length(self):
+        self.assertEqual(js_length('LED'), 3)
+        self.assertEqual(js_length('😀'), 2)
+
+
+@unittest.skipUnless(NODE, 'node не установлен')
+class ScriptParityTest(unittest.TestCase):
+    def test_item_tags(self):
+        expected = run_node(script_function('getItemTags') +
+                            'console.log(JSON.stringify(DATA.map(getItemTags)));', ITEMS)
+        self.assertEqual([item_tags(item) for item in ITEMS], expected)
+
+    def test_tag_order(self):
+        # Тот же порядок, что у Array.from(tagSet).sort() в extractTags()
+        expected = run_node(script_function('getItemTags') + """
+            const tagSet = new Set();
+            DATA.forEach(item => getItemTags(item).forEach(tag => tagSet.add(tag)));
+            console.log(JSON.stringify(Array.from(tagSet).sort()));""", ITEMS)
+        index = build_tag_index((item['id'], item_tags(item)) for item in ITEMS)
+        self.assertEqual(index['tags'], expected)
+
+
+class TagIndexTest(unittest.TestCase):
+    def test_postings_and_counts(self):
+        index = build_tag_index([(1, ['LED', 'свет']), (2, ['LED']), (3, ['свет', 'LED'])])
+        self.assertEqual(index['tags'], ['LED', 'свет'])
+        self.assertEqual(index['postings'], {'LED': [1, 2, 3], 'свет': [1, 3]})
+        self.assertEqual(index['counts'], {'LED': 3, 'свет': 2})
+
+    def test_revision_tracks_content(self):
+        revision = build_tag_index([(1, ['LED'])])['revision']
+        self.assertEqual(build_tag_index([(1, ['LED'])])['revision'], revision)
+        self.assertNotEqual(build_tag_index([(2, ['LED'])])['revision'], revision)
+
+
+if __name__ == '__main__':
+    unittest.main()
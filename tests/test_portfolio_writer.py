@@ -0,0 +1,96 @@
+"""Потоковая запись и чтение portfolio_data.json (portfolio_writer)"""
+import json
+import math
+import os
+import tempfile
+import unittest
+
+from portfolio_writer import FORMATS, output_path_for, read_portfolio, write_portfolio
+
+ITEMS = [
+    {'id': 1, 'title': 'Свет', 'media': {'filename': 'a.jpg', 'type': 'image', 'path': 'images/a.jpg'}},
+    {'id': 2, 'title': 'Видео "в кавычках"\n', 'media': {'filename': 'b.mp4', 'type': 'video'},
+     'additional': {'col_2': 'LED', 'col_3': 'генеративная графика'}, 'metrics': [1, 1.5, None, True]},
+]
+
+# Значения, которые orjson по умолчанию кодирует иначе, чем json: вывод все равно должен совпадать
+EDGE_ITEMS = [
+    {'id': 3, 'metrics': [0.0, -0.0, 0.00001, 0.0001, 1e16, 1e-7, 123456789.125, 2 ** 63,
+                          math.nan, math.inf, -math.inf], 'keys': {1: 'int key', 'null': 'e5'}},
+    # Целое больше 64 бит orjson не кодирует - элемент целиком пишется через json
+    {'id': 4, 'media': {'filename': 'c.jpg', 'type': 'image'}, 'size': 2 ** 70, 'ratio': 1e-7},
+]
+
+
+def stdlib_json(items, fmt):
+    """Вывод json.dump - эталон для всех форматов"""
+    if fmt == 'pretty':
+        return json.dumps(items, ensure_ascii=False, indent=2)
+    if fmt == 'ndjson':
+        return ''.join(json.dumps(item, ensure_ascii=False, separators=(',', ':')) + '\n' for item in items)
+    return json.dumps(items, ensure_ascii=False, separators=(',', ':'))
+
+
+class WriterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def assert_matches_json(self, items):
+        for fmt in FORMATS:
+            path = self.path(f'portfolio.{fmt}')
+            self.assertEqual(write_portfolio(iter(items), path, fmt), len(items))
+            with open(path, 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read(), stdlib_json(items, fmt), fmt)
+
+    def test_byte_identical_to_json(self):
+        self.assert_matches_json(ITEMS)
+
+    def test_edge_values_identical_to_json(self):
+        self.assert_matches_json(ITEMS + EDGE_ITEMS)
+
+    def test_empty(self):
+        self.assert_matches_json([])
+
+    def test_round_trip(self):
+        for fmt in FORMATS:
+            path = self.path(f'portfolio.{fmt}')
+            write_portfolio(ITEMS, path, fmt)
+            self.assertEqual(read_portfolio(path), ITEMS, fmt)
+
+    def test_read_with_leading_whitespace(self):
+        path = self.path('portfolio_data.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n  ' + json.dumps(ITEMS))
+        self.assertEqual(read_portfolio(path), ITEMS)
+
+    def test_failed_write_keeps_previous_file(self):
+        path = self.path('portfolio_data.json')
+        write_portfolio(ITEMS[:1], path)
+
+        def broken():
+            yield ITEMS[1]
+            raise RuntimeError('сбой сборки')
+
+        with self.assertRaises(RuntimeError):
+            write_portfolio(broken(), path)
+        self.assertEqual(read_portfolio(path), ITEMS[:1])
+        self.assertFalse(os.path.exists(path + '.tmp'))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            write_portfolio(ITEMS, self.path('portfolio.xml'), 'xml')
+
+    def test_output_path(self):
+        self.assertEqual(output_path_for('ndjson'), 'portfolio_data.ndjson')
+        self.assertEqual(output_path_for('json'), 'portfolio_data.json')
+        self.assertEqual(output_path_for('pretty'), 'portfolio_data.json')
+
+
+if __name__ == '__main__':
+    unittest.main()
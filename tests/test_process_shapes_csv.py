@@ -0,0 +1,90 @@
+"""Колоночная обработка координат фигур (process_shapes_csv): вывод байт-в-байт как у построчного варианта"""
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from benchmark_shapes import make_csvs, process_csv_shapes_iterrows
+from process_shapes_csv import detect_columns, process_csv_shapes
+
+
+class ProcessShapesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_dir = os.path.join(self.tmp.name, 'csv')
+        os.mkdir(self.csv_dir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_csv(self, name, text):
+        with open(os.path.join(self.csv_dir, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def process(self):
+        """Возвращает (вывод построчного варианта, вывод process_csv_shapes, shapes_data)"""
+        expected_path = os.path.join(self.tmp.name, 'expected.json')
+        actual_path = os.path.join(self.tmp.name, 'actual.json')
+        process_csv_shapes_iterrows(self.csv_dir, expected_path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            shapes_data = process_csv_shapes(self.csv_dir, actual_path)
+        with open(expected_path, 'rb') as f_expected, open(actual_path, 'rb') as f_actual:
+            return f_expected.read(), f_actual.read(), shapes_data
+
+    def assert_parity(self):
+        expected, actual, shapes_data = self.process()
+        self.assertEqual(actual, expected)
+        return shapes_data
+
+    def test_synthetic_clouds(self):
+        # Пропуски, нечисловой текст, дробные и повторяющиеся index во всех вариантах колонок
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                make_csvs(self.csv_dir, 500, seed=seed)
+                shapes_data = self.assert_parity()
+                self.assertTrue(all(shapes_data[name] for name in ('star', 'sphere', 'pattern', 'text')))
+
+    def test_shapes_data_matches_file(self):
+        self.write_csv('star.csv', 'index,x,y\n2,0.5,1\n1,0.25,-1\n')
+        expected, _, shapes_data = self.process()
+        self.assertEqual(shapes_data, json.loads(expected))
+        self.assertEqual(shapes_data['star'], [{'index': 1, 'x': 2.5, 'y': -10.0, 'z': 0.5},
+                                               {'index': 2, 'x': 5.0, 'y': 10.0, 'z': 0.5}])
+        self.assertEqual(shapes_data['sphere'], [])
+
+    def test_edge_values(self):
+        # Огромный index (больше int64), бесконечность, NaN в Z сферы, дробные и текстовые index
+        self.write_csv('sphere.csv', 'index,P(0),P(1),P(2)\n'
+                                     '3,1,2,\n1,inf,2,0.25\n2.9,1,2,-inf\n'
+                                     '99999999999999999999999,1,1,1\n4,1,2,nan\n')
+        self.write_csv('pattern.csv', 'index,P(0),P(1)\n3,a,1\n1,1,1\nx,1,1\n2.5,1e308,-0.0\n')
+        self.write_csv('art.csv', 'index,value\n1,2\n')
+        self.write_csv('notes.csv', 'index,x,y\n1,1,1\n')
+        shapes_data = self.assert_parity()
+        # Колонка index с текстом читается как строки: int('2.5') - ошибка, строка пропускается
+        self.assertEqual([point['index'] for point in shapes_data['pattern']], [1])
+        # В art.csv одна колонка после index - нет Y, фигура пропускается
+        self.assertEqual(shapes_data['text'], [])
+
+    def test_identical_index_keeps_file_order(self):
+        self.write_csv('star.csv', 'index,x,y\n1,3,0\n0,9,0\n1,1,0\n1,2,0\n')
+        shapes_data = self.assert_parity()
+        self.assertEqual([point['x'] for point in shapes_data['star']], [90.0, 30.0, 10.0, 20.0])
+
+    def test_no_csv_files(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertIsNone(process_csv_shapes(self.csv_dir, os.path.join(self.tmp.name, 'out.json')))
+
+
+class DetectColumnsTest(unittest.TestCase):
+    def test_variants(self):
+        self.assertEqual(detect_columns(['index', 'P(0)', 'P(1)', 'P(2)']), ('index', 'P(0)', 'P(1)', 'P(2)'))
+        self.assertEqual(detect_columns(['Index', 'x', 'y']), ('Index', 'x', 'y', None))
+        self.assertEqual(detect_columns(['point_index', 'a', 'b', 'c']), ('point_index', 'a', 'b', 'c'))
+        self.assertEqual(detect_columns(['a', 'b']), (None, 'a', 'b', None))
+
+
+if __name__ == '__main__':
+    unittest.main()
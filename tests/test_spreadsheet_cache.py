@@ -0,0 +1,109 @@
+"""Кэш разобранных Excel файлов (spreadsheet_cache)"""
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import spreadsheet_cache
+from spreadsheet_cache import read_excel_cached
+
+
+class SpreadsheetCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'сайт_портфолио.xlsx')
+        self.cache_dir = os.path.join(self.tmp.name, '.spreadsheet_cache')
+        self.df = pd.DataFrame([['Работа', 'Описание', 'LED', 1, 2.5],
+                                ['Видео', np.nan, 'свет', 2, np.nan],
+                                ['Проекция', 'Текст', 12, 3, 0.25]])
+        self.write_workbook(self.df)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_workbook(self, df, second_sheet=None):
+        with pd.ExcelWriter(self.path) as writer:
+            df.to_excel(writer, sheet_name='Лист1', header=False, index=False)
+            if second_sheet is not None:
+                second_sheet.to_excel(writer, sheet_name='Лист2', index=False)
+
+    def read(self, **kwargs):
+        with mock.patch('spreadsheet_cache.pd.read_excel', wraps=pd.read_excel) as read_excel:
+            with contextlib.redirect_stdout(io.StringIO()):
+                df = read_excel_cached(self.path, cache_dir=self.cache_dir, **kwargs)
+        return df, read_excel.call_count
+
+    def snapshots(self):
+        return os.listdir(self.cache_dir)
+
+    def assert_round_trip(self, **kwargs):
+        expected = pd.read_excel(self.path, **kwargs)
+        first, calls = self.read(**kwargs)
+        self.assertEqual(calls, 1)
+        cached, calls = self.read(**kwargs)
+        self.assertEqual(calls, 0)
+        pd.testing.assert_frame_equal(first, expected)
+        pd.testing.assert_frame_equal(cached, expected)
+
+    def test_round_trip(self):
+        self.assert_round_trip(header=None)
+
+    def test_round_trip_pickle(self):
+        with mock.patch.object(spreadsheet_cache, 'HAS_PARQUET', False):
+            self.assert_round_trip(header=None)
+
+    def test_round_trip_header(self):
+        self.assert_round_trip(header=0)
+
+    def test_all_sheets(self):
+        self.write_workbook(self.df, second_sheet=pd.DataFrame({'x': [1, 2], 'y': ['a', 'b']}))
+        self.read(sheet_name=None)
+        sheets, calls = self.read(sheet_name=None)
+        self.assertEqual(calls, 0)
+        self.assertEqual(list(sheets), ['Лист1', 'Лист2'])
+        pd.testing.assert_frame_equal(sheets['Лист2'], pd.DataFrame({'x': [1, 2], 'y': ['a', 'b']}))
+
+    def test_changed_workbook_invalidates(self):
+        self.read(header=None)
+        old_snapshots = self.snapshots()
+        changed = self.df.copy()
+        changed.iloc[0, 0] = 'Новое название'
+        self.write_workbook(changed)
+
+        df, calls = self.read(header=None)
+        self.assertEqual(calls, 1)
+        self.assertEqual(df.iloc[0, 0], 'Новое название')
+        # Снимок прежней версии книги удален
+        self.assertEqual(len(self.snapshots()), 1)
+        self.assertNotEqual(self.snapshots(), old_snapshots)
+
+    def test_options_cached_separately(self):
+        self.read(header=None)
+        self.read(header=0)
+        self.assertEqual(len(self.snapshots()), 2)
+        _, calls = self.read(header=None)
+        self.assertEqual(calls, 0)
+
+    def test_refresh(self):
+        self.read(header=None)
+        _, calls = self.read(header=None, refresh=True)
+        self.assertEqual(calls, 1)
+
+    def test_corrupted_snapshot_reread(self):
+        self.read(header=None)
+        snapshot_dir = os.path.join(self.cache_dir, self.snapshots()[0])
+        for name in os.listdir(snapshot_dir):
+            if name != 'meta.json':
+                os.remove(os.path.join(snapshot_dir, name))
+        df, calls = self.read(header=None)
+        self.assertEqual(calls, 1)
+        pd.testing.assert_frame_equal(df, pd.read_excel(self.path, header=None))
+
+
+if __name__ == '__main__':
+    unittest.main()
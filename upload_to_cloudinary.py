@@ -2,12 +2,19 @@
 Скрипт для загрузки медиафайлов в Cloudinary
 Использует переменные окружения из .env файла
 """
+import argparse
 import cloudinary
-import cloudinary.uploader
 import os
+import sys
+import time
 from pathlib import Path
 from dotenv import load_dotenv
 
+from cloudinary_budget import ApiBudget, BudgetExhausted
+from cloudinary_upload import (CHUNK_SIZE, DEFAULT_MAX_INFLIGHT_BYTES, DEFAULT_RETRIES, DEFAULT_WORKERS,
+                               LARGE_FILE_THRESHOLD, InvalidationQueue, UploadEngine, UploadJournal, UploadManifest,
+                               UploadStats, collect_tasks, list_remote_resources)
+
 # Загружаем переменные окружения из .env файла
 load_dotenv()
 
@@ -32,86 +39,197 @@ cloudinary.config(
     api_secret=API_SECRET
 )
 
-def upload_folder(folder_path, cloudinary_folder=""):
-    """Загружает все файлы из папки в Cloudinary"""
-    folder = Path(folder_path)
-    
-    if not folder.exists():
+# Параметры загрузки: перезаписываем файл; кэш CDN сбрасывается в конце запуска
+# только для перезаписанных файлов (InvalidationQueue, запрос explicit на файл), а не при каждой загрузке
+UPLOAD_OPTIONS = {'overwrite': True}
+
+def upload_folder(folder_path, cloudinary_folder="", engine=None):
+    """Загружает все файлы из папки в Cloudinary параллельно"""
+    if not Path(folder_path).exists():
         print(f"⚠️  Папка {folder_path} не найдена, пропускаем...")
-        return 0, 0
-    
-    uploaded = 0
-    failed = 0
-    
+        return UploadStats()
+
     print(f"\n📤 Загрузка файлов из {folder_path}...")
-    
-    # Получаем все файлы из папки (рекурсивно)
-    for file_path in folder.rglob('*'):
-        if file_path.is_file():
-            relative_path = file_path.relative_to(folder)
-            # Сохраняем структуру папок в Cloudinary
-            cloudinary_path = f"{cloudinary_folder}/{relative_path}".replace('\\', '/') if cloudinary_folder else str(relative_path).replace('\\', '/')
-            
-            try:
-                # Определяем тип файла
-                ext = file_path.suffix.lower()
-                if ext in ['.mp4', '.mov', '.MOV', '.MP4', '.avi', '.webm']:
-                    resource_type = "video"
-                else:
-                    resource_type = "image"
-                
-                # Используем оригинальное имя файла БЕЗ расширения как public_id
-                # Cloudinary использует public_id в URL, поэтому важно сохранить оригинальное имя
-                file_name_without_ext = file_path.stem  # имя без расширения (например, "250" из "250.png")
-                
-                # Формируем public_id с учетом папки
-                if cloudinary_folder:
-                    public_id = f"{cloudinary_folder}/{file_name_without_ext}"
-                else:
-                    public_id = file_name_without_ext
-                
-                # Загружаем файл с явным указанием public_id для сохранения оригинального имени
-                result = cloudinary.uploader.upload(
-                    str(file_path),
-                    public_id=public_id,  # Явно указываем public_id для сохранения имени
-                    resource_type=resource_type,
-                    overwrite=True,
-                    invalidate=True  # Инвалидируем кэш
-                )
-                
-                print(f"  ✓ {cloudinary_path}")
-                uploaded += 1
-            except Exception as e:
-                print(f"  ✗ Ошибка при загрузке {file_path.name}: {str(e)}")
-                failed += 1
-    
-    return uploaded, failed
+
+    # Используем оригинальное имя файла БЕЗ расширения как public_id
+    # Cloudinary использует public_id в URL, поэтому важно сохранить оригинальное имя
+    tasks = collect_tasks(folder_path, cloudinary_folder)
+
+    def on_result(task, result, error):
+        if error is None:
+            print(f"  ✓ {task.public_id}{task.path.suffix}")
+        else:
+            print(f"  ✗ Ошибка при загрузке {task.path.name}: {str(error)}")
+
+    engine = engine or UploadEngine(upload_options=UPLOAD_OPTIONS)
+    stats = engine.run(tasks, on_result)
+    print(f"  {stats.summary()}")
+    return stats
+
+def dry_run(folders_to_upload, manifest, invalidations):
+    """Показывает, что будет загружено и сколько сбросов кэша CDN сэкономит отложенная инвалидация"""
+    new_files = changed_files = unchanged = 0
+    for local_folder, cloudinary_folder in folders_to_upload:
+        for task in collect_tasks(local_folder, cloudinary_folder):
+            if manifest.is_uploaded(task):
+                unchanged += 1
+            elif UploadManifest.key(task) in manifest.resources:
+                # Файл уже загружался под этим public_id - загрузка перезапишет его
+                changed_files += 1
+            else:
+                new_files += 1
+    uploads = new_files + changed_files
+    purges = changed_files + len(invalidations.pending)
+    print("🔎 Пробный запуск (ничего не загружается)")
+    print(f"   Будет загружено: {uploads} файлов (новых: {new_files}, измененных: {changed_files}), "
+          f"без изменений: {unchanged}")
+    if invalidations.pending:
+        print(f"   В очереди от прошлого запуска: {len(invalidations.pending)} сбросов кэша")
+    print(f"   Сбросов кэша CDN (запрос explicit на файл): {purges} вместо {uploads} "
+          f"при invalidate=True на каждую загрузку "
+          f"(сэкономлено {max(uploads - purges, 0)})")
+    print("   Новые файлы, которых нет в манифесте, но есть в Cloudinary, тоже будут перезаписаны "
+          "(уточнить: --verify-remote)")
+
 
 def main():
     """Основная функция загрузки"""
-    print("🚀 Начало загрузки файлов в Cloudinary...")
-    print(f"☁️  Cloud Name: {CLOUD_NAME}\n")
-    
-    total_uploaded = 0
-    total_failed = 0
-    
+    parser = argparse.ArgumentParser(description='Загрузка медиафайлов в Cloudinary')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'количество одновременных загрузок (по умолчанию {DEFAULT_WORKERS})')
+    parser.add_argument('--max-inflight-mb', type=int, default=DEFAULT_MAX_INFLIGHT_BYTES // 1024 // 1024,
+                        help='максимальный объем одновременно отправляемых данных, MB')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help='количество повторов при временных ошибках (сеть, 5xx, лимит запросов)')
+    parser.add_argument('--large-file-mb', type=int, default=LARGE_FILE_THRESHOLD // 1024 // 1024,
+                        help='файлы больше этого размера (MB) загружаются частями')
+    parser.add_argument('--chunk-mb', type=int, default=CHUNK_SIZE // 1024 // 1024,
+                        help='размер части при загрузке больших файлов, MB (не меньше 5)')
+    parser.add_argument('--force', action='store_true',
+                        help='загрузить все файлы заново, даже если они не менялись')
+    parser.add_argument('--verify-remote', action='store_true',
+                        help='сверить манифест загрузок с etag файлов в Cloudinary (Admin API)')
+    parser.add_argument('--resume', action='store_true',
+                        help='продолжить прерванную загрузку с места остановки')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='только показать, сколько файлов будет загружено и сколько сбросов кэша CDN '
+                             'сэкономит отложенная инвалидация')
+    args = parser.parse_args()
+
     # Загружаем папки
     folders_to_upload = [
         ("images", "images"),
         ("icons", "icons"),
         ("alisa", "alisa")
     ]
+
+    # Журнал прошлого запуска: все, что успело загрузиться до падения или Ctrl-C
+    previous = UploadJournal.read()
+    if (previous.done or previous.finished) and not args.resume:
+        if previous.finished:
+            print(f"⚠ Предыдущая загрузка завершилась с ошибками ({previous.failed} файлов не загружено), "
+                  f"чтобы повторить только их, используйте --resume")
+        else:
+            print(f"⚠ Предыдущая загрузка была прервана ({len(previous.done)} файлов загружено), "
+                  f"для продолжения используйте --resume")
+
+    # Манифест загрузок: неизмененные с прошлой загрузки файлы пропускаются
+    manifest = UploadManifest.load()
+    if args.force:
+        manifest.resources = {}
+    if args.resume or not args.force:
+        # Загрузки из журнала могли не попасть в манифест, если процесс упал
+        manifest.resources.update(previous.done)
+    if args.verify_remote and not args.force:
+        print("🔎 Сверка с Cloudinary...")
+        tasks = [task for local_folder, cloudinary_folder in folders_to_upload
+                 for task in collect_tasks(local_folder, cloudinary_folder)]
+        try:
+            remote = list_remote_resources([cloudinary_folder for _, cloudinary_folder in folders_to_upload])
+        except BudgetExhausted as e:
+            print(f"   ⚠ Сверка пропущена: {e}")
+        else:
+            dropped, adopted = manifest.reconcile_remote(tasks, remote)
+            manifest.save()
+            print(f"   В Cloudinary: {len(remote)} файлов; устаревших записей: {dropped}, "
+                  f"уже загруженных файлов найдено: {adopted}")
+        print(f"   {ApiBudget.shared().summary()}")
+
+    # Перезаписанные файлы (в том числе оставшиеся от прерванного запуска) - кэш CDN сбрасывается в конце
+    invalidations = InvalidationQueue.load()
+
+    if args.dry_run:
+        dry_run(folders_to_upload, manifest, invalidations)
+        return
+
+    journal = UploadJournal.open(resume=args.resume)
+    engine = UploadEngine(
+        workers=args.workers,
+        max_inflight_bytes=args.max_inflight_mb * 1024 * 1024,
+        retries=args.retries,
+        upload_options=UPLOAD_OPTIONS,
+        manifest=manifest,
+        journal=journal,
+        large_file_threshold=args.large_file_mb * 1024 * 1024,
+        chunk_size=args.chunk_mb * 1024 * 1024,
+        invalidations=invalidations
+    )
+
+    print("🚀 Начало загрузки файлов в Cloudinary...")
+    print(f"☁️  Cloud Name: {CLOUD_NAME}")
+    print(f"   Потоков: {args.workers}, лимит одновременной передачи: {args.max_inflight_mb} MB\n")
     
-    for local_folder, cloudinary_folder in folders_to_upload:
-        uploaded, failed = upload_folder(local_folder, cloudinary_folder)
-        total_uploaded += uploaded
-        total_failed += failed
+    total_uploaded = 0
+    total_failed = 0
+    total_skipped = 0
+    aborted = False
+    started = time.monotonic()
+    
+    try:
+        for local_folder, cloudinary_folder in folders_to_upload:
+            if args.resume and cloudinary_folder in journal.folders_done:
+                print(f"\n⏭  Папка {local_folder} уже загружена в прерванном запуске, пропускаем...")
+                continue
+            stats = upload_folder(local_folder, cloudinary_folder, engine)
+            total_uploaded += stats.files
+            total_failed += stats.failed
+            total_skipped += stats.skipped
+            if stats.aborted:
+                aborted = True
+                break
+            if stats.failed == 0:
+                journal.folder_done(cloudinary_folder)
+    except KeyboardInterrupt:
+        journal.close()
+        print("\n⛔ Загрузка прервана. Для продолжения запустите: python upload_to_cloudinary.py --resume")
+        if invalidations.pending:
+            print(f"   Кэш CDN {len(invalidations.pending)} перезаписанных файлов будет сброшен при следующем запуске")
+        sys.exit(130)
+
+    # Один сброс кэша на каждый перезаписанный файл вместо invalidate=True при каждой загрузке
+    overwritten = len(invalidations.pending)
+    purged, purge_failed = invalidations.flush(args.workers, args.retries)
+
+    # Журнал удаляется только если все файлы загружены; если запуск дошел до конца с ошибками,
+    # журнал помечается завершенным, чтобы следующий запуск не называл его прерванным
+    journal.close(completed=total_failed == 0 and not aborted, failed=None if aborted else total_failed)
     
     # Итоги
+    elapsed = time.monotonic() - started
     print("\n" + "="*50)
-    print(f"✅ Загрузка завершена!")
+    if aborted:
+        print("⛔ Загрузка остановлена: исчерпан лимит запросов Cloudinary")
+        print("   Для продолжения позже запустите: python upload_to_cloudinary.py --resume")
+    else:
+        print(f"✅ Загрузка завершена!")
     print(f"   Загружено: {total_uploaded} файлов")
+    print(f"   Без изменений (пропущено): {total_skipped} файлов")
     print(f"   Ошибок: {total_failed} файлов")
+    print(f"   Сброс кэша CDN: {purged} из {overwritten} перезаписанных файлов "
+          f"(при сбросе на каждую загрузку было бы {invalidations.uploads})")
+    if purge_failed:
+        print(f"   ⚠ Не удалось сбросить кэш {purge_failed} файлов, повтор при следующем запуске")
+    print(f"   Время: {elapsed:.1f} с")
     print("="*50)
     
     if total_failed == 0:
@@ -120,4 +238,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-